@@ -0,0 +1,18 @@
+from backend.dataroom.audit_log import current_author
+
+
+class AuditLogAuthorMixin:
+    """Record the user of the request as the author of the audit log entries of its writes"""
+
+    _audit_log_author_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._audit_log_author_token = current_author.set(request.user.email if request.user.is_authenticated else None)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # the author must not leak to the next request handled by the same thread
+        if self._audit_log_author_token is not None:
+            current_author.reset(self._audit_log_author_token)
+            self._audit_log_author_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -5,6 +5,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from backend.api.audit_log import AuditLogAuthorMixin
 from backend.api.datasets.serializers import (
     DatasetCreateSerializer,
     DatasetPreviewImageSerializer,
@@ -13,10 +14,11 @@ from backend.api.datasets.serializers import (
     DatasetUpdateImagesResponseSerializer,
     DatasetUpdateImagesSerializer,
 )
+from backend.api.refresh import get_request_refresh
 from backend.dataroom.models.dataset import Dataset
 
 
-class DatasetViewSet(ModelViewSet):
+class DatasetViewSet(AuditLogAuthorMixin, ModelViewSet):
     ordering = ['slug', '-version']
     lookup_field = 'slug_version'
     lookup_value_regex = r'[^/.]+\/[0-9]+'
@@ -82,11 +84,12 @@ class DatasetViewSet(ModelViewSet):
 
             serializer = DatasetUpdateImagesSerializer(data=request.data)
             serializer.is_valid(raise_exception=True)
+            refresh = get_request_refresh(request, bulk=True)
 
             if request.method == 'POST':
-                num_updated = dataset.add_images(serializer.validated_data['image_ids'])
+                num_updated = dataset.add_images(serializer.validated_data['image_ids'], refresh=refresh)
             elif request.method == 'DELETE':
-                num_updated = dataset.remove_images(serializer.validated_data['image_ids'])
+                num_updated = dataset.remove_images(serializer.validated_data['image_ids'], refresh=refresh)
 
             response_serializer = DatasetUpdateImagesResponseSerializer(
                 data={
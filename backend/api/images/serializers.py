@@ -1,4 +1,5 @@
 import httpx
+from django.conf import settings
 from drf_spectacular.utils import extend_schema_serializer
 from rest_framework import serializers
 
@@ -14,7 +15,8 @@ from backend.api.images.fields import (
 )
 from backend.api.pagination import API_MAX_PAGE_SIZE, API_PAGE_SIZE
 from backend.api.tags.fields import TagNameField
-from backend.dataroom.models.os_image import OSAttributes, OSImage
+from backend.dataroom.exceptions import ImageDownloadError
+from backend.dataroom.models.os_image import OSAttributes, OSImage, OSLatent, OSLatents
 from backend.dataroom.utils.download_image import download_image_from_url
 
 
@@ -170,6 +172,41 @@ class ListOSImageParamsSerializer(RetrieveOSImageParamsSerializer):
             return [cursor]
 
 
+class AuditLogParamsSerializer(serializers.Serializer):
+    page_size = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=API_MAX_PAGE_SIZE,
+        default=API_PAGE_SIZE,
+        help_text="The number of entries to return per page.",
+    )
+    cursor = serializers.RegexField(r'^-?[0-9]+:[0-9a-f]+$', required=False)
+
+    def get_page_size(self):
+        return self.validated_data.get('page_size', API_PAGE_SIZE)
+
+    def get_search_after(self):
+        cursor = self.validated_data.get('cursor')
+        if cursor:
+            date, entry_id = cursor.split(':')
+            return [int(date), entry_id]
+
+
+class AuditLogEntrySerializer(serializers.Serializer):
+    entry_id = serializers.CharField()
+    image_id = serializers.CharField()
+    action = serializers.CharField()
+    fields = serializers.ListField(child=serializers.CharField())
+    author = serializers.CharField(allow_null=True)
+    date = serializers.DateTimeField()
+    changes = serializers.DictField()
+
+
+class PaginatedAuditLogSerializer(serializers.Serializer):
+    next = serializers.CharField(required=True, allow_null=True)
+    results = AuditLogEntrySerializer(required=True, many=True)
+
+
 class RandomOSImageParamsSerializer(RetrieveOSImageParamsSerializer):
     page_size = serializers.IntegerField(
         required=False,
@@ -244,10 +281,20 @@ class OSImageCreateSerializer(serializers.Serializer):
         if image_url:
             del data['image_url']
             data['original_url'] = image_url
+            # images can be downloaded upfront in parallel, e.g. in bulk create
+            downloaded_images = self.context.get('downloaded_images', {})
             try:
-                data['image'] = download_image_from_url(image_url)
+                if image_url in downloaded_images:
+                    image_or_error = downloaded_images[image_url]
+                    if isinstance(image_or_error, Exception):
+                        raise image_or_error
+                    data['image'] = image_or_error
+                else:
+                    data['image'] = download_image_from_url(image_url)
             except httpx.HTTPError as e:
                 raise serializers.ValidationError('Unable to download image from URL') from e
+            except ImageDownloadError as e:
+                raise serializers.ValidationError(f'Unable to download image from URL: {e.message}') from e
             else:
                 # if image_id is not provided, use the image hash as the image ID
                 image_hash = OSImage.get_image_hash_without_prefix(data['image'])
@@ -270,8 +317,11 @@ class OSImageCreateSerializer(serializers.Serializer):
     def update(self, instance, validated_data):
         raise NotImplementedError('This serializer should not be used for updates')
 
-    def create(self, validated_data, bulk_index=None):
-        os_image = OSImage(
+    def build(self, validated_data):
+        """
+        Build the OSImage instance without saving it.
+        """
+        return OSImage(
             id=validated_data['id'],
             image_file=validated_data['image'],
             source=validated_data['source'],
@@ -283,15 +333,93 @@ class OSImageCreateSerializer(serializers.Serializer):
             related_images=validated_data.get('related_images', None),
             datasets=validated_data.get('datasets', None),
         )
-        os_image.create(bulk_index=bulk_index)
+
+    def create(self, validated_data, bulk_index=None):
+        os_image = self.build(validated_data)
+        os_image.create(
+            bulk_index=bulk_index,
+            refresh=self.context.get('refresh', settings.OPENSEARCH_DEFAULT_REFRESH),
+        )
         return os_image
 
 
+class DirectUploadLatentSerializer(serializers.Serializer):
+    latent_type = LatentTypeField(required=True)
+    filename = serializers.CharField(required=True)
+    content_type = serializers.CharField(required=False, allow_blank=True)
+
+
+class DirectUploadImageSerializer(serializers.Serializer):
+    id = ImageIdField(required=True)
+    filename = serializers.CharField(required=True)
+    content_type = serializers.CharField(required=False, allow_blank=True)
+    latents = DirectUploadLatentSerializer(required=False, many=True)
+
+
+class DirectUploadLatentCommitSerializer(serializers.Serializer):
+    latent_type = LatentTypeField(required=True)
+    filename = serializers.CharField(required=True)
+    size = serializers.IntegerField(required=True, min_value=0)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)
+
+
+class OSImageDirectUploadCommitSerializer(OSImageCreateSerializer):
+    id = ImageIdField(required=True)
+    image = None
+    image_url = None
+    upload_id = serializers.RegexField(r'^[0-9a-f]{32}$', required=True)
+    filename = serializers.CharField(required=True)
+    size = serializers.IntegerField(required=True, min_value=0)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False)
+    latents = DirectUploadLatentCommitSerializer(required=False, many=True)
+
+    def validate(self, data):
+        latent_types = [latent['latent_type'] for latent in data.get('latents', [])]
+        if len(latent_types) != len(set(latent_types)):
+            raise serializers.ValidationError('Duplicate latent types')
+        return data
+
+    def build(self, validated_data):
+        """
+        Build the OSImage instance for files that were uploaded directly to storage, without saving it. The paths of
+        the files are the paths of the uploads, see OSImage.move_uploaded_files.
+        """
+        upload_id = validated_data['upload_id']
+        latents = {
+            latent['latent_type']: OSLatent(
+                latent_type=latent['latent_type'],
+                file=OSImage.get_direct_upload_storage_path(
+                    upload_id=upload_id,
+                    filename=latent['filename'],
+                    name=f"latent_{latent['latent_type']}",
+                ),
+            )
+            for latent in validated_data.get('latents', [])
+        }
+        return OSImage(
+            id=validated_data['id'],
+            image=OSImage.get_direct_upload_storage_path(
+                upload_id=upload_id, filename=validated_data['filename'], name='original'
+            ),
+            source=validated_data['source'],
+            author=validated_data['author'],
+            attributes=OSAttributes.from_json(validated_data.get('attributes', None)),
+            tags=validated_data.get('tags', None),
+            latents=OSLatents(latents=latents),
+            related_images=validated_data.get('related_images', None),
+            datasets=validated_data.get('datasets', None),
+        )
+
+
 class ImageLatentCreateSerializer(serializers.Serializer):
     latent_type = LatentTypeField(required=True)
     file = serializers.FileField(required=True)
 
 
+class ImageLatentBulkCreateSerializer(ImageLatentCreateSerializer):
+    image_id = ImageIdField(required=True)
+
+
 class OSImageUpdateSerializer(serializers.Serializer):
     source = serializers.CharField(required=False, allow_null=False, allow_blank=False)
     attributes = AttributesJSONField(required=False)
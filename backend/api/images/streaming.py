@@ -0,0 +1,74 @@
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.http.multipartparser import FIELD, FILE, ChunkIter, LazyStream, Parser, exhaust
+from django.utils.http import parse_header_parameters
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class MultipartStreamError(Exception):
+    """Raised when a streamed multipart request can't be parsed"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def iter_multipart_parts(request, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Parse a multipart/form-data request part by part while it is being received, instead of buffering the whole
+    body like request.data does. Files are spooled to temporary files on disk, so memory stays bounded no matter
+    how large the request is. request.data must not be accessed before or after calling this.
+
+    @param request: DRF request
+    @param chunk_size: size of the chunks read from the request stream
+    @return: generator of (name, value) tuples, value is a str for fields and a TemporaryUploadedFile for files.
+        The caller is responsible for closing the files.
+    """
+    content_type, params = parse_header_parameters(request.META.get('CONTENT_TYPE', ''))
+    if content_type != 'multipart/form-data':
+        raise MultipartStreamError('Expected a multipart/form-data request')
+    boundary = params.get('boundary')
+    if not boundary:
+        raise MultipartStreamError('Missing multipart boundary')
+
+    stream = LazyStream(ChunkIter(request.stream, chunk_size))
+    for item_type, meta_data, field_stream in Parser(stream, boundary.encode('ascii')):
+        try:
+            disposition = meta_data['content-disposition'][1]
+            name = disposition['name'].strip()
+        except (KeyError, IndexError, AttributeError):
+            exhaust(field_stream)
+            continue
+
+        if item_type == FIELD:
+            # same limit Django applies to non-file fields
+            value = field_stream.read(settings.DATA_UPLOAD_MAX_MEMORY_SIZE + 1)
+            if len(value) > settings.DATA_UPLOAD_MAX_MEMORY_SIZE:
+                raise MultipartStreamError(f'Field "{name}" is too large')
+            exhaust(field_stream)
+            yield name, value.decode('utf-8')
+
+        elif item_type == FILE:
+            filename = os.path.basename(disposition.get('filename', '').replace('\\', '/')).strip()
+            file_content_type = meta_data.get('content-type', ('',))[0].strip()
+            uploaded_file = TemporaryUploadedFile(
+                name=filename,
+                content_type=file_content_type,
+                size=0,
+                charset=None,
+            )
+            try:
+                for chunk in field_stream:
+                    uploaded_file.write(chunk)
+                    uploaded_file.size += len(chunk)
+            except BaseException:
+                uploaded_file.close()
+                raise
+            uploaded_file.seek(0)
+            yield name, uploaded_file
+
+        else:
+            exhaust(field_stream)
@@ -3,14 +3,19 @@ import json
 import logging
 import random
 import string
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urlunparse
 
 from ddtrace import tracer
 from django.conf import settings
+from django.db import IntegrityError, connections
 from django.http import Http404
 from drf_spectacular.utils import extend_schema
 from httpx import HTTPError
 from opensearchpy import RequestError
+from opensearchpy.helpers import BulkIndexError
 from rest_framework import exceptions, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ParseError
@@ -18,13 +23,19 @@ from rest_framework.pagination import _positive_int
 from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
+from backend.api.audit_log import AuditLogAuthorMixin
+from backend.api.authentication import APITokenAuthentication
 from backend.api.cache import cache_response
 from backend.api.images.filters import InvalidFilterError, OSFilterBackend, os_image_filter_params
 from backend.api.images.serializers import (
+    AuditLogEntrySerializer,
+    AuditLogParamsSerializer,
     CountSerializer,
+    DirectUploadImageSerializer,
     ImageAttributesSerializer,
     ImageIdSerializer,
     ImageIdWithAttributesSerializer,
+    ImageLatentBulkCreateSerializer,
     ImageLatentCreateSerializer,
     ImageLatentTypeSerializer,
     ListOSImageParamsSerializer,
@@ -33,9 +44,11 @@ from backend.api.images.serializers import (
     OSImageBucketSerializer,
     OSImageBulkUpdateSerializer,
     OSImageCreateSerializer,
+    OSImageDirectUploadCommitSerializer,
     OSImageSegmentationSerializer,
     OSImageSerializer,
     OSImageUpdateSerializer,
+    PaginatedAuditLogSerializer,
     PaginatedOSImageSerializer,
     RandomOSImageParamsSerializer,
     RelatedOSImageListSerializer,
@@ -46,11 +59,22 @@ from backend.api.images.serializers import (
     SimilarToTextSerializer,
     SimilarToVectorSerializer,
 )
+from backend.api.images.streaming import MultipartStreamError, iter_multipart_parts
+from backend.api.ingestion.serializers import IngestionTicketSerializer
+from backend.api.ingestion.utils import get_request_async
+from backend.api.refresh import get_request_refresh
+from backend.dataroom.audit_log import audit_log
+from backend.dataroom.choices import IngestionOperation
 from backend.dataroom.exceptions import LatentTypeValidationError, MissingEmbeddingError, SaveConflictError
 from backend.dataroom.models.attributes import AttributesFieldNotFoundError
 from backend.dataroom.models.dataset import Dataset
+from backend.dataroom.models.ingestion import IngestionItem, IngestionTicket
 from backend.dataroom.models.os_image import OSAttributes, OSImage, OSLatent, OSLatents
+from backend.dataroom.models.tag import Tag
 from backend.dataroom.opensearch import OS, OSBulkIndex
+from backend.dataroom.utils.bulk_delete import delete_files
+from backend.dataroom.utils.direct_upload import generate_upload_url, is_direct_upload_supported
+from backend.dataroom.utils.download_image import download_images_from_urls
 from backend.dataroom.utils.fetch_embedding import fetch_coca_embedding_for_text
 from backend.dataroom.utils.ramsam import get_ramsam_segmentation
 from backend.dataroom.utils.vectors import normalize_similarity, normalize_vector
@@ -61,8 +85,55 @@ BULK_ADD_ATTRIBUTES_LIMIT = 100
 
 BULK_IMAGES_LIMIT = 50
 
+ASYNC_UPDATE_FIELDS = ['source', 'attributes', 'tags', 'coca_embedding']
 
-class ImageViewSet(ViewSet):
+BULK_STREAM_IMAGES_LIMIT = 5000
+BULK_STREAM_BATCH_SIZE = 100
+BULK_STREAM_MAX_PENDING_BATCHES = 4
+
+BULK_LATENTS_LIMIT = 1000
+
+BULK_DIRECT_UPLOAD_LIMIT = 1000
+
+
+def get_bulk_created(images, os_bulk):
+    """
+    Split images indexed with OSImage.create in a bulk request, those created by another request since the existence
+    checks or that failed to index were not created.
+
+    @return: tuple of (created image IDs, list of failures)
+    """
+    created = []
+    failed = []
+    for image in images:
+        result = os_bulk.results.get(image.id)
+        if result == 'created':
+            created.append(image.id)
+        elif result == 'conflict':
+            failed.append({'id': image.id, 'error': f"Image with ID '{image.id}' already exists"})
+        else:
+            failed.append({'id': image.id, 'error': str(result or 'Image was not indexed')})
+    return created, failed
+
+
+def get_queued_image_ids(images):
+    """
+    Find the new images with the ID or hash of an asynchronous create that is still queued. These images don't exist
+    in OpenSearch yet, but their files are already in storage and must not be overwritten by another create.
+
+    @param images: list of (image ID, image hash) of the new images
+    @return: set of the IDs of the new images that conflict with a queued create
+    """
+    queued = IngestionItem.objects.find_queued_creates(
+        image_ids=[image_id for image_id, _ in images],
+        image_hashes=[image_hash for _, image_hash in images],
+    )
+    queued_ids = {image_id for image_id, _ in queued}
+    queued_hashes = {image_hash for _, image_hash in queued}
+    return {image_id for image_id, image_hash in images if image_id in queued_ids or image_hash in queued_hashes}
+
+
+class ImageViewSet(AuditLogAuthorMixin, ViewSet):
     search_after_param = 'cursor'
     partitions_count_param = 'partitions_count'
     partition_param = 'partition'
@@ -128,6 +199,13 @@ class ImageViewSet(ViewSet):
     def get_object(self, fields=None):
         return self._get_object(self.kwargs['pk'], fields=fields)
 
+    def _update_with_retry(self, update, fields=None, **kwargs):
+        image_id = self.kwargs['pk']
+        try:
+            return OSImage.update_with_retry(image_id, update, fields=fields, **kwargs)
+        except OSImage.DoesNotExist as e:
+            raise Http404(f'OSImage with id "{image_id}" does not exist') from e
+
     def get_search(self, fields=None, search_after=None, sort=None):
         return OSImage.objects.search(fields=fields, search_after=search_after, sort=sort)
 
@@ -307,9 +385,9 @@ class ImageViewSet(ViewSet):
 
     @tracer.wrap()
     def _handle_bulk_create(self, request, *args, **kwargs):
-        serializers = []
-        image_ids = []
-        image_hashes = []
+        refresh = get_request_refresh(request, create=True)
+        asynchronous = get_request_async(request)
+        items = []
         for key, value in request.data.items():
             if key.startswith('json_'):
                 index = key[5:]
@@ -325,8 +403,23 @@ class ImageViewSet(ViewSet):
                 if image_file:
                     data['image'] = image_file
 
+                items.append(data)
+
+        # download all images given by URL in parallel
+        downloaded_images = download_images_from_urls(
+            [data['image_url'] for data in items if data.get('image_url') and not data.get('image')]
+        )
+
+        try:
+            serializers = []
+            image_ids = []
+            image_hashes = []
+            for data in items:
                 # validate serializer
-                serializer = OSImageCreateSerializer(data=data, context={'valid_datasets': self.valid_datasets})
+                serializer = OSImageCreateSerializer(
+                    data=data,
+                    context={'valid_datasets': self.valid_datasets, 'downloaded_images': downloaded_images},
+                )
                 serializer.is_valid(raise_exception=True)
                 serializers.append(serializer)
 
@@ -353,47 +446,474 @@ class ImageViewSet(ViewSet):
                 image_ids.append(serializer.validated_data['id'])
                 image_hashes.append(serializer.validated_data['image_hash'])
 
-        # check if any images with the given IDs already exist
-        existing = OSImage.all_objects.get_multiple(
-            [s.validated_data['id'] for s in serializers],
-            fields=['id'],
-            number=BULK_IMAGES_LIMIT,
-        )
-        if existing:
-            existing_str = ', '.join([f"'{e.id}'" for e in existing])
+            # check if any images with the given IDs or hashes already exist
+            existing = OSImage.all_objects.find_existing(
+                ids=image_ids,
+                image_hashes=image_hashes,
+                fields=['id'],
+            )
+            if existing['id']:
+                existing_str = ', '.join([f"'{e.id}'" for e in existing['id']])
+                return Response(
+                    {
+                        'error': f'Images with IDs {existing_str} already exist',
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+            if existing['image_hash']:
+                existing_str = ', '.join([f"'{e.id}'" for e in existing['image_hash']])
+                return Response(
+                    {
+                        'error': f'Image hashes with IDs {existing_str} already exist',
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+            # images of asynchronous creates that are not indexed yet, checked before their files are overwritten
+            queued_ids = get_queued_image_ids(list(zip(image_ids, image_hashes, strict=True)))
+            if queued_ids:
+                queued_str = ', '.join([f"'{image_id}'" for image_id in image_ids if image_id in queued_ids])
+                return Response(
+                    {
+                        'error': f'Images with IDs {queued_str} are already queued to be created',
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            # upload the original files concurrently, a failed upload doesn't fail the whole batch
+            images = [serializer.build(serializer.validated_data) for serializer in serializers]
+            uploaded_images, failed = OSImage.upload_image_files(images)
+            failed = [{'id': image_id, 'error': error} for image_id, error in failed.items()]
+
+            if asynchronous:
+                # the files are in storage, the documents are queued and indexed in batches by the task runner
+                try:
+                    ticket = IngestionTicket.objects.enqueue(
+                        IngestionOperation.CREATE,
+                        [(image.id, {'doc': image.to_doc()}) for image in uploaded_images],
+                        author=request.user,
+                    )
+                except IntegrityError:
+                    # queued by a concurrent request since the check above
+                    return Response(
+                        {'error': 'Images with the same IDs or hashes are already queued to be created'},
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                return Response(
+                    {
+                        **IngestionTicketSerializer(ticket).data,
+                        'accepted': [image.id for image in uploaded_images],
+                        'failed': failed,
+                    },
+                    status=status.HTTP_202_ACCEPTED,
+                )
+
+            # save images in bulk once all uploads are done
+            Tag.objects.ensure_exist(tag for image in uploaded_images for tag in image.tags)
+            with OSBulkIndex(refresh=refresh) as os_bulk:
+                for image in uploaded_images:
+                    image.create(bulk_index=os_bulk)
+            created, conflicts = get_bulk_created(uploaded_images, os_bulk)
+
             return Response(
                 {
-                    'error': f'Images with IDs {existing_str} already exist',
+                    'created': created,
+                    'failed': failed + conflicts,
                 },
-                status=status.HTTP_409_CONFLICT,
+                status=status.HTTP_200_OK,
             )
+        finally:
+            # the downloads are temporary files, deleted when closed
+            for image_file in downloaded_images.values():
+                if not isinstance(image_file, Exception):
+                    image_file.close()
 
-        # check if any images with the same hash already exist
-        existing = OSImage.all_objects.get_multiple_by_hash(
-            [s.validated_data['image_hash'] for s in serializers],
-            fields=['id'],
-            number=BULK_IMAGES_LIMIT,
-        )
-        if existing:
-            existing_str = ', '.join([f"'{e.id}'" for e in existing])
+    @tracer.wrap()
+    @extend_schema(request=None)
+    @action(detail=False, methods=['post'], authentication_classes=[APITokenAuthentication])
+    def bulk_create_stream(self, request):
+        """
+        Create a large number of images in a single streamed multipart request.
+
+        The parts are parsed while the request is being received, the files are spooled to disk and every
+        BULK_STREAM_BATCH_SIZE images are validated, uploaded and indexed in the background while the next batch is
+        still being received. Invalid or conflicting images are reported under "failed" and don't fail the request.
+
+        Send "image_<i>" before "json_<i>" for each image, images with an "image_url" have no "image_<i>" part.
+        """
+        self._check_api_writes_disabled()
+        self._prefetch_valid_datasets()
+        refresh = get_request_refresh(request, create=True)
+
+        created = []
+        failed = []
+        seen = {'ids': set(), 'hashes': set(), 'lock': threading.Lock()}
+        pending_files = {}
+        batch = []
+        futures = []
+        count = 0
+
+        def collect(future):
+            batch_created, batch_failed = future.result()
+            created.extend(batch_created)
+            failed.extend(batch_failed)
+
+        if request.stream is None:
+            return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        executor = ThreadPoolExecutor(max_workers=BULK_STREAM_MAX_PENDING_BATCHES)
+        try:
+            for name, value in iter_multipart_parts(request):
+                if name.startswith('image_'):
+                    pending_files[name[6:]] = value
+                    continue
+                if not name.startswith('json_'):
+                    continue
+
+                index = name[5:]
+                image_file = pending_files.pop(index, None)
+                try:
+                    data = json.loads(value)
+                    if not isinstance(data, dict):
+                        raise TypeError
+                except (ValueError, TypeError):
+                    failed.append({'id': None, 'error': f'Invalid JSON for {name}'})
+                    if image_file:
+                        image_file.close()
+                    continue
+                if image_file:
+                    data['image'] = image_file
+
+                count += 1
+                if count > BULK_STREAM_IMAGES_LIMIT:
+                    raise MultipartStreamError(
+                        f'Number of items in bulk exceeds maximum limit of {BULK_STREAM_IMAGES_LIMIT} items.'
+                    )
+
+                batch.append(data)
+                if len(batch) >= BULK_STREAM_BATCH_SIZE:
+                    # back-pressure: stop reading the request until a batch slot is free
+                    while len(futures) >= BULK_STREAM_MAX_PENDING_BATCHES:
+                        collect(futures.pop(0))
+                    futures.append(executor.submit(self._create_images_stream_batch, batch, seen, refresh))
+                    batch = []
+
+            if batch:
+                futures.append(executor.submit(self._create_images_stream_batch, batch, seen, refresh))
+            for future in futures:
+                collect(future)
+        except MultipartStreamError as e:
+            # wait for the batches that were already started before responding
+            for future in futures:
+                with contextlib.suppress(Exception):
+                    collect(future)
             return Response(
-                {
-                    'error': f'Image hashes with IDs {existing_str} already exist',
-                },
-                status=status.HTTP_409_CONFLICT,
+                {'error': e.message, 'created': created, 'failed': failed},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+        finally:
+            executor.shutdown(wait=True)
+            for image_file in pending_files.values():
+                image_file.close()
+
+        if not count:
+            return Response({'error': 'No images provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # save images in bulk
-        # TODO: log updates
-        with OSBulkIndex() as os_bulk:
+        return Response({'created': created, 'failed': failed}, status=status.HTTP_200_OK)
+
+    def _create_images_stream_batch(self, items, seen, refresh):
+        """
+        Validate, upload and index a batch of images from bulk_create_stream. Runs in a worker thread. An error of
+        the batch fails its items that were not created, it doesn't fail the other batches.
+
+        @param items: list of image data dicts, with the image file or an image_url
+        @param seen: IDs and hashes of the images in the previous batches of the same request
+        @return: tuple of (created image IDs, list of failures)
+        """
+        failed = []
+        downloaded_images = {}
+        os_bulk = OSBulkIndex(refresh=refresh)
+
+        def fail(data, error):
+            failed.append({'id': data.get('id'), 'error': error})
+
+        try:
+            downloaded_images = download_images_from_urls(
+                [data['image_url'] for data in items if data.get('image_url') and not data.get('image')]
+            )
+
+            serializers = []
+            for data in items:
+                serializer = OSImageCreateSerializer(
+                    data=data,
+                    context={'valid_datasets': self.valid_datasets, 'downloaded_images': downloaded_images},
+                )
+                if not serializer.is_valid():
+                    fail(data, serializer.errors)
+                    continue
+
+                serializer.validated_data['original_url'] = data.get('image_url', None)
+                if not serializer.validated_data.get('image_hash', None):
+                    serializer.validated_data['image_hash'] = OSImage.get_image_hash(serializer.validated_data['image'])
+                serializer.validated_data['author'] = self.request.user.email
+
+                # validate all images in the request are unique
+                image_id = serializer.validated_data['id']
+                image_hash = serializer.validated_data['image_hash']
+                with seen['lock']:
+                    if image_id in seen['ids']:
+                        fail(data, f"Image with ID '{image_id}' appears multiple times in bulk")
+                        continue
+                    if image_hash in seen['hashes']:
+                        fail(data, f"Image hash with ID '{image_id}' appears multiple times in bulk")
+                        continue
+                    seen['ids'].add(image_id)
+                    seen['hashes'].add(image_hash)
+                serializers.append(serializer)
+
+            # check if any images with the given IDs or hashes already exist
+            existing = OSImage.all_objects.find_existing(
+                ids=[s.validated_data['id'] for s in serializers],
+                image_hashes=[s.validated_data['image_hash'] for s in serializers],
+                fields=['id'],
+            )
+            existing_ids = {image.id for image in existing['id']}
+            existing_hashes = {image.image_hash for image in existing['image_hash']}
+            # images of asynchronous creates that are not indexed yet, checked before their files are overwritten
+            queued_ids = get_queued_image_ids(
+                [(s.validated_data['id'], s.validated_data['image_hash']) for s in serializers]
+            )
+            new_serializers = []
             for serializer in serializers:
-                # save image
-                serializer.create(serializer.validated_data, bulk_index=os_bulk)
+                data = serializer.validated_data
+                if data['id'] in existing_ids:
+                    fail(data, f"Image with ID '{data['id']}' already exists")
+                elif data['image_hash'] in existing_hashes:
+                    fail(data, 'Image with the same hash already exists')
+                elif data['id'] in queued_ids:
+                    fail(data, f"Image with ID '{data['id']}' is already queued to be created")
+                else:
+                    new_serializers.append(serializer)
+
+            # upload concurrently, then index the uploaded images in bulk
+            images = [serializer.build(serializer.validated_data) for serializer in new_serializers]
+            uploaded_images, upload_failed = OSImage.upload_image_files(images)
+            failed.extend({'id': image_id, 'error': error} for image_id, error in upload_failed.items())
+
+            Tag.objects.ensure_exist(tag for image in uploaded_images for tag in image.tags)
+            try:
+                with os_bulk:
+                    for image in uploaded_images:
+                        image.create(bulk_index=os_bulk)
+            except BulkIndexError:
+                # the errors of each image are in os_bulk.results
+                pass
+            created, conflicts = get_bulk_created(uploaded_images, os_bulk)
+
+            return created, failed + conflicts
+        except Exception as e:
+            logger.error(f'Error creating a batch of {len(items)} streamed images: {e}')
+            created = [image_id for image_id, result in os_bulk.results.items() if result == 'created']
+            reported = set(created) | {failure['id'] for failure in failed}
+            failed.extend({'id': data.get('id'), 'error': str(e)} for data in items if data.get('id') not in reported)
+            return created, failed
+        finally:
+            for data in items:
+                if data.get('image'):
+                    data['image'].close()
+            for image_file in downloaded_images.values():
+                if not isinstance(image_file, Exception):
+                    image_file.close()
+            # this runs in a worker thread which has its own database connection
+            connections.close_all()
+
+    def _get_direct_upload_items(self, request):
+        images = request.data.get('images') if isinstance(request.data, dict) else None
+        if not images or not isinstance(images, list):
+            raise exceptions.ValidationError({'error': 'No images provided'})
+        if len(images) > BULK_DIRECT_UPLOAD_LIMIT:
+            raise exceptions.ValidationError(
+                {'error': f'Number of images in bulk exceeds maximum limit of {BULK_DIRECT_UPLOAD_LIMIT} images.'}
+            )
+        return images
+
+    def _validate_direct_upload_latent_types(self, items):
+        latent_types_map = OSImage.get_latent_types_map()
+        for data in items:
+            for latent in data.get('latents', []):
+                if latent['latent_type'] not in latent_types_map:
+                    raise exceptions.ValidationError({'error': f"Latent type '{latent['latent_type']}' does not exist"})
+        return latent_types_map
+
+    @tracer.wrap()
+    @extend_schema(request=None)
+    @action(detail=False, methods=['post'])
+    def direct_upload(self, request):
+        """
+        First step of a direct upload: get presigned URLs to upload the original files and latents of new images
+        straight to storage, without sending them through the API. Once uploaded, register the images with
+        direct_upload_commit.
+
+        Example request:
+
+            {"images": [{"id": "image1", "filename": "image1.jpg", "content_type": "image/jpeg",
+                         "latents": [{"latent_type": "mask", "filename": "mask.png", "content_type": "image/png"}]}]}
+        """
+        self._check_api_writes_disabled()
+
+        if not is_direct_upload_supported():
+            return Response(
+                {'error': 'Direct uploads are not supported by the configured storage'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = DirectUploadImageSerializer(data=self._get_direct_upload_items(request), many=True)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data
+        self._validate_direct_upload_latent_types(items)
+
+        image_ids = [data['id'] for data in items]
+        duplicate_ids = {image_id for image_id in image_ids if image_ids.count(image_id) > 1}
+        if duplicate_ids:
+            return Response(
+                {'error': f"Image with ID '{sorted(duplicate_ids)[0]}' appears multiple times in bulk"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        existing = OSImage.all_objects.find_existing(ids=image_ids, fields=['id'])
+        if existing['id']:
+            existing_str = ', '.join([f"'{e.id}'" for e in existing['id']])
+            return Response(
+                {'error': f'Images with IDs {existing_str} already exist'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        images = []
+        for data in items:
+            # every upload has its own folder, the files are moved to the folder of the image by the commit
+            upload_id = uuid.uuid4().hex
+            image_path = OSImage.get_direct_upload_storage_path(
+                upload_id=upload_id, filename=data['filename'], name='original'
+            )
+            latents = []
+            for latent in data.get('latents', []):
+                latent_path = OSImage.get_direct_upload_storage_path(
+                    upload_id=upload_id,
+                    filename=latent['filename'],
+                    name=f"latent_{latent['latent_type']}",
+                )
+                latents.append(
+                    {
+                        'latent_type': latent['latent_type'],
+                        'upload': generate_upload_url(latent_path, content_type=latent.get('content_type')),
+                    }
+                )
+            images.append(
+                {
+                    'id': data['id'],
+                    'upload_id': upload_id,
+                    'upload': generate_upload_url(image_path, content_type=data.get('content_type')),
+                    'latents': latents,
+                }
+            )
 
-        return Response({'created': [s.validated_data['id'] for s in serializers]}, status=status.HTTP_200_OK)
+        return Response({'images': images}, status=status.HTTP_200_OK)
+
+    @tracer.wrap()
+    @extend_schema(request=None)
+    @action(detail=False, methods=['post'])
+    def direct_upload_commit(self, request):
+        """
+        Second step of a direct upload: register images whose files were uploaded with the URLs from direct_upload.
+        The size (and sha256, if given) of every file is verified, the hash and sizes of the images are calculated
+        from the uploaded originals and all images are indexed with a single bulk request. Images whose files are
+        missing, don't match or conflict with existing images are reported under "failed", and their uploaded files
+        are deleted. The files of the created images are moved from their upload folder to the folder of the image.
+
+        Example request:
+
+            {"images": [{"id": "image1", "upload_id": "...", "filename": "image1.jpg", "size": 12345, "sha256": "...",
+                         "source": "...",
+                         "attributes": {...}, "tags": [...],
+                         "latents": [{"latent_type": "mask", "filename": "mask.png", "size": 123}]}]}
+        """
+        self._check_api_writes_disabled()
+        self._prefetch_valid_datasets()
+        refresh = get_request_refresh(request, create=True)
+
+        serializers = []
+        image_ids = []
+        for data in self._get_direct_upload_items(request):
+            serializer = OSImageDirectUploadCommitSerializer(data=data, context={'valid_datasets': self.valid_datasets})
+            serializer.is_valid(raise_exception=True)
+            serializer.validated_data['author'] = self.request.user.email
+            if serializer.validated_data['id'] in image_ids:
+                return Response(
+                    {'error': f"Image with ID '{serializer.validated_data['id']}' appears multiple times in bulk"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            image_ids.append(serializer.validated_data['id'])
+            serializers.append(serializer)
+        latent_types_map = self._validate_direct_upload_latent_types([s.validated_data for s in serializers])
+
+        uploads = []
+        for serializer in serializers:
+            data = serializer.validated_data
+            image = serializer.build(data)
+            latent_uploads = []
+            for latent_data in data.get('latents', []):
+                latent = image.latents.latents[latent_data['latent_type']]
+                latent.validate_latent_type(prefetched_latent_types=list(latent_types_map.values()))
+                latent_uploads.append((latent, latent_data['size'], latent_data.get('sha256')))
+            uploads.append((image, data['size'], data.get('sha256'), latent_uploads))
+
+        # verify the uploaded files and calculate the image hashes concurrently
+        images, failed = OSImage.load_uploaded_files(uploads)
+        rejected = [image for image, *_ in uploads if image.id in failed]
+        failed = [{'id': image_id, 'error': error} for image_id, error in failed.items()]
+
+        # check for duplicates now that the hashes are known
+        existing = OSImage.all_objects.find_existing(
+            ids=[image.id for image in images],
+            image_hashes=[image.image_hash for image in images],
+            fields=['id', 'image_hash'],
+        )
+        existing_ids = {image.id for image in existing['id']}
+        existing_hashes = {image.image_hash for image in existing['image_hash']}
+        # images of asynchronous creates that are not indexed yet, checked before their files are overwritten
+        queued_ids = get_queued_image_ids([(image.id, image.image_hash) for image in images])
+        new_images = []
+        for image in images:
+            if image.id in existing_ids:
+                failed.append({'id': image.id, 'error': f"Image with ID '{image.id}' already exists"})
+                rejected.append(image)
+            elif image.image_hash in existing_hashes:
+                failed.append({'id': image.id, 'error': 'Image with the same hash already exists'})
+                rejected.append(image)
+            elif image.id in queued_ids:
+                failed.append({'id': image.id, 'error': f"Image with ID '{image.id}' is already queued to be created"})
+                rejected.append(image)
+            else:
+                existing_hashes.add(image.image_hash)
+                new_images.append(image)
+        # nothing else deletes the uploads of the rejected images
+        delete_files(path for image in rejected for path in image.get_file_paths())
+
+        new_images, move_failed = OSImage.move_uploaded_files(new_images)
+        failed.extend({'id': image_id, 'error': error} for image_id, error in move_failed.items())
+
+        Tag.objects.ensure_exist(tag for image in new_images for tag in image.tags)
+        with OSBulkIndex(refresh=refresh) as os_bulk:
+            for image in new_images:
+                image.create(bulk_index=os_bulk)
+        created, conflicts = get_bulk_created(new_images, os_bulk)
+
+        return Response(
+            {'created': created, 'failed': failed + conflicts},
+            status=status.HTTP_200_OK,
+        )
 
     @tracer.wrap()
     def _handle_single_create(self, request, *args, **kwargs):
+        refresh = get_request_refresh(request, create=True)
         instance = None
         image_url = None
 
@@ -425,16 +945,24 @@ class ImageViewSet(ViewSet):
 
         if not instance:
             # new image, create it
-            serializer = OSImageCreateSerializer(data=data, context={'valid_datasets': self.valid_datasets})
+            serializer = OSImageCreateSerializer(
+                data=data,
+                context={'valid_datasets': self.valid_datasets, 'refresh': refresh},
+            )
             serializer.is_valid(raise_exception=True)
             image_file = serializer.validated_data['image']
 
-            # check if same ID already exists
-            try:
-                same_id_image = OSImage.all_objects.get(serializer.validated_data['id'])
-            except OSImage.DoesNotExist:
-                pass
-            else:
+            # check if the same ID or hash already exists
+            image_hash = serializer.validated_data.get('image_hash', None)
+            if not image_hash:
+                image_hash = OSImage.get_image_hash(image_file)
+            existing = OSImage.all_objects.find_existing(
+                ids=[serializer.validated_data['id']],
+                image_hashes=[image_hash],
+            )
+
+            if existing['id']:
+                same_id_image = existing['id'][0]
                 deleted_msg = ' as a deleted image' if same_id_image.is_deleted else ''
                 return Response(
                     {
@@ -444,15 +972,7 @@ class ImageViewSet(ViewSet):
                     status=status.HTTP_409_CONFLICT,
                 )
 
-            # check if same hash already exists
-            image_hash = serializer.validated_data.get('image_hash', None)
-            if not image_hash:
-                image_hash = OSImage.get_image_hash(image_file)
-            try:
-                same_hash_image = OSImage.all_objects.get_by_hash(image_hash)
-            except OSImage.DoesNotExist:
-                pass
-            else:
+            for same_hash_image in existing['image_hash']:
                 if same_hash_image.is_same_image(image_file):
                     deleted_msg = ' as a deleted image' if same_hash_image.is_deleted else ''
                     return Response(
@@ -464,6 +984,13 @@ class ImageViewSet(ViewSet):
                         status=status.HTTP_409_CONFLICT,
                     )
 
+            # an asynchronous create that is not indexed yet, checked before its file is overwritten
+            if get_queued_image_ids([(serializer.validated_data['id'], image_hash)]):
+                return Response(
+                    {'error': 'An image with the provided ID or the same hash is already queued to be created.'},
+                    status=status.HTTP_409_CONFLICT,
+                )
+
             # save image
             try:
                 serializer.save(
@@ -471,9 +998,13 @@ class ImageViewSet(ViewSet):
                     image_hash=image_hash,
                     original_url=image_url,
                 )
-            except SaveConflictError as e:
+            except SaveConflictError:
+                # created by another request since the check
                 return Response(
-                    {'error': e.description},
+                    {
+                        'error': 'The provided ID already exists in the database. '
+                        'Make sure all your IDs are unique and can trace back to the original image.',
+                    },
                     status=status.HTTP_409_CONFLICT,
                 )
 
@@ -487,13 +1018,14 @@ class ImageViewSet(ViewSet):
     def update(self, request, *args, **kwargs):
         self._check_api_writes_disabled()
         self._prefetch_valid_datasets()
+        refresh = get_request_refresh(request)
 
         if 'multipart/form-data' in request.content_type:
-            return self._update_image_with_latents(request=request)
-        return self._update_image(data=request.data)
+            return self._update_image_with_latents(request=request, refresh=refresh)
+        return self._update_image(data=request.data, refresh=refresh)
 
     @tracer.wrap()
-    def _update_image_with_latents(self, request):
+    def _update_image_with_latents(self, request, refresh):
         """
         Update an image with multiple latents in a single request.
 
@@ -538,10 +1070,10 @@ class ImageViewSet(ViewSet):
                 }
                 data['latents'].append(final_latent_data)
 
-        return self._update_image(data=data)
+        return self._update_image(data=data, refresh=refresh)
 
     @tracer.wrap()
-    def _update_image(self, data):
+    def _update_image(self, data, refresh):
         # validate serializer
         serializer = OSImageUpdateSerializer(data=data, context={'valid_datasets': self.valid_datasets})
         serializer.is_valid(raise_exception=True)
@@ -556,38 +1088,35 @@ class ImageViewSet(ViewSet):
                 )
             latent_types.append(latent['latent_type'])
 
-        # save image
-        image = self.get_object()
-        updated_fields = list(serializer.validated_data.keys())
-        # TODO: log update
-        # old_date_updated = image.date_updated
-
-        for field, value in serializer.validated_data.items():
-            if field == 'attributes':
-                value = OSAttributes.from_json(value)
-                setattr(image, field, value)
-            elif field == 'latents':
-                try:
-                    value = OSLatents.from_json(value)
-                except LatentTypeValidationError as e:
-                    return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
-                setattr(image, field, value)
-            elif field == 'coca_embedding':
-                image.coca_embedding_exists = value is not None
-                image.coca_embedding_vector = value
-                image.coca_embedding_author = self.request.user.email
-            elif field == 'datasets':
-                image.datasets.update(value)
-            else:
-                setattr(image, field, value)
-
-        if updated_fields:
+        values = dict(serializer.validated_data)
+        if 'attributes' in values:
+            values['attributes'] = OSAttributes.from_json(values['attributes'])
+        if 'latents' in values:
             try:
-                image.save(fields=updated_fields, latent_types=latent_types)
-            except SaveConflictError as e:
-                return Response({'error': e.description}, status=status.HTTP_409_CONFLICT)
+                values['latents'] = OSLatents.from_json(values['latents'])
             except LatentTypeValidationError as e:
                 return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+        updated_fields = list(values.keys())
+
+        def update(image):
+            for field, value in values.items():
+                if field == 'coca_embedding':
+                    image.coca_embedding_exists = value is not None
+                    image.coca_embedding_vector = value
+                    image.coca_embedding_author = self.request.user.email
+                elif field == 'datasets':
+                    image.datasets.update(value)
+                else:
+                    setattr(image, field, value)
+            return list(updated_fields)
+
+        # save image, the update is applied again if the image was changed in the meantime
+        try:
+            image = self._update_with_retry(update, latent_types=latent_types, refresh=refresh)
+        except SaveConflictError as e:
+            return Response({'error': e.description}, status=status.HTTP_409_CONFLICT)
+        except LatentTypeValidationError as e:
+            return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(image.to_json(include_fields=updated_fields), status=status.HTTP_200_OK)
 
@@ -595,6 +1124,8 @@ class ImageViewSet(ViewSet):
     def bulk_update(self, request, *args, **kwargs):
         self._check_api_writes_disabled()
         self._prefetch_valid_datasets()
+        refresh = get_request_refresh(request, bulk=True)
+        asynchronous = get_request_async(request)
 
         if not isinstance(request.data, list):
             return Response({'error': "Expected a list of images to update"}, status=status.HTTP_400_BAD_REQUEST)
@@ -609,6 +1140,13 @@ class ImageViewSet(ViewSet):
             serializer.is_valid(raise_exception=True)
             valid_serializers.append(serializer)
 
+        # latents need files, they are set in bulk with bulk_set_latents
+        if any(serializer.validated_data.get('latents') for serializer in valid_serializers):
+            return Response(
+                {'error': "Bulk update images with latents is not supported, use bulk_set_latents instead"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
         # validate bulk size
         if len(valid_serializers) > BULK_IMAGES_LIMIT:
             return Response(
@@ -622,8 +1160,11 @@ class ImageViewSet(ViewSet):
             image.id: image
             for image in OSImage.all_objects.get_multiple(image_ids, fields=['id'], number=BULK_IMAGES_LIMIT)
         }
-        if len(image_ids) != len(images_by_id):
-            missing = set(image_ids) - set(images_by_id.keys())
+        missing = set(image_ids) - set(images_by_id.keys())
+        if missing and asynchronous:
+            # queued after the creates of the images, the updates of an image are indexed in order
+            missing -= {image_id for image_id, _ in IngestionItem.objects.find_queued_creates(image_ids=missing)}
+        if missing:
             missing = [f'"{m}"' for m in missing]
             return Response(
                 {
@@ -632,35 +1173,39 @@ class ImageViewSet(ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if asynchronous:
+            # the updates are queued and indexed in batches by the task runner
+            ticket = IngestionTicket.objects.enqueue(
+                IngestionOperation.UPDATE,
+                [
+                    (
+                        serializer.validated_data['id'],
+                        {
+                            'data': self._get_update_payload(serializer.validated_data),
+                            'author': self.request.user.email,
+                        },
+                    )
+                    for serializer in valid_serializers
+                ],
+                author=request.user,
+            )
+            return Response(
+                {**IngestionTicketSerializer(ticket).data, 'accepted': image_ids},
+                status=status.HTTP_202_ACCEPTED,
+            )
+
         # update images in bulk
-        # TODO: log updates
         try:
-            with OSBulkIndex() as os_bulk:
+            Tag.objects.ensure_exist(
+                tag for serializer in valid_serializers for tag in serializer.validated_data.get('tags') or []
+            )
+            with OSBulkIndex(refresh=refresh) as os_bulk:
                 for serializer in valid_serializers:
                     image = images_by_id[serializer.validated_data['id']]
-                    updated_fields = []
-
-                    for field, value in serializer.validated_data.items():
-                        if field == 'id':
-                            continue
-                        elif field == 'source':
-                            image.source = value
-                            updated_fields.append('source')
-                        elif field == 'attributes':
-                            image.attributes = OSAttributes.from_json(value)
-                            updated_fields.append('attributes')
-                        elif field == 'latents':
-                            raise NotImplementedError('Bulk update images with latents is not supported')
-                        elif field == 'tags' and value is not None:
-                            image.tags = value
-                            updated_fields.append('tags')
-                        elif field == 'coca_embedding':
-                            image.coca_embedding_exists = value is not None
-                            image.coca_embedding_vector = value
-                            image.coca_embedding_author = self.request.user.email
-                            updated_fields.append('coca_embedding')
-
-                    image.save(fields=updated_fields, bulk_index=os_bulk)
+                    updated_fields = image.set_update_fields(serializer.validated_data, author=self.request.user.email)
+
+                    # partial updates that don't depend on the images that were read (only their IDs)
+                    image.save(fields=updated_fields, bulk_index=os_bulk, if_unchanged=False)
         except SaveConflictError as e:
             return Response(
                 {'error': e.description},
@@ -669,14 +1214,21 @@ class ImageViewSet(ViewSet):
 
         return Response({'updated': image_ids}, status=status.HTTP_200_OK)
 
+    @staticmethod
+    def _get_update_payload(validated_data):
+        # the JSON form of the fields that OSImage.set_update_fields sets, to be queued
+        data = {field: validated_data[field] for field in ASYNC_UPDATE_FIELDS if field in validated_data}
+        if data.get('coca_embedding') is not None:
+            data['coca_embedding'] = [float(value) for value in data['coca_embedding']]
+        return data
+
     @tracer.wrap()
     def destroy(self, request, *args, **kwargs):
         self._check_api_writes_disabled()
+        refresh = get_request_refresh(request)
 
         image = self.get_object()
-        image.delete()
-
-        # TODO: log deletion
+        image.delete(refresh=refresh)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -684,32 +1236,30 @@ class ImageViewSet(ViewSet):
     @action(detail=True, methods=['put'])
     def add_attributes(self, request, pk=None):
         self._check_api_writes_disabled()
-
-        image = self.get_object()
+        refresh = get_request_refresh(request)
 
         image_attributes_serializer = ImageAttributesSerializer(data=self.request.data)
         image_attributes_serializer.is_valid(raise_exception=True)
 
-        # old_attributes = dict(image.attributes.to_json())
-        # old_date_updated = image.date_updated
+        def update(image):
+            image.attributes.update(image_attributes_serializer.validated_data['attributes'])
+            return ['attributes']
 
-        image.attributes.update(image_attributes_serializer.validated_data['attributes'])
         try:
-            image.save(fields=['attributes'])
+            image = self._update_with_retry(update, refresh=refresh)
         except SaveConflictError as e:
             return Response(
                 {'error': e.description},
                 status=status.HTTP_409_CONFLICT,
             )
 
-        # TODO: log update
-
         return Response(image.to_json(), status=status.HTTP_200_OK)
 
     @tracer.wrap()
     @action(detail=False, methods=['post'])
     def add_attributes_bulk(self, request):
         self._check_api_writes_disabled()
+        refresh = get_request_refresh(request, bulk=True)
 
         if len(self.request.data) == 0:
             return Response({'error': "Empty list provided"}, status=status.HTTP_400_BAD_REQUEST)
@@ -722,38 +1272,30 @@ class ImageViewSet(ViewSet):
         serializers_list = ImageIdWithAttributesSerializer(data=self.request.data, many=True)
         serializers_list.is_valid(raise_exception=True)
 
+        # only the attributes are read, to count the added and merged ones and check all the images before writing
         image_ids = [image['image_id'] for image in serializers_list.validated_data]
+        existing = OSImage.objects.find_existing(ids=image_ids, fields=['id', 'attributes'])
+        images = {image.id: image for image in existing['id']}
+        missing = set(image_ids) - images.keys()
+        if missing:
+            missing = ', '.join([f"'{image_id}'" for image_id in missing])
+            return Response(
+                {'error': f'One or more images do not exist: {missing}'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         added_count = 0
         merged_count = 0
-        search = (
-            OSImage.objects.search(
-                fields=['id', 'attributes'],
-            )
-            .filter('terms', id=image_ids)
-            .extra(size=BULK_ADD_ATTRIBUTES_LIMIT)
-        )
-        result = search.execute()
-        images = {image.id: image for image in OSImage.list_from_hits(result.hits)}
-
-        try:
-            with OSBulkIndex() as os_bulk:
-                for image_serializer in serializers_list.validated_data:
-                    image = images[image_serializer['image_id']]
-                    # old_attributes = dict(image.attributes.to_json())
-                    # old_date_updated = image.date_updated
-                    if image.attributes:
-                        merged_count += 1
-                    else:
-                        added_count += 1
-                    image.attributes.update(image_serializer['attributes'])
-                    image.save(fields=['attributes'], bulk_index=os_bulk)
-                    # TODO: log update
-        except SaveConflictError as e:
-            return Response(
-                {'error': e.description},
-                status=status.HTTP_409_CONFLICT,
-            )
+        docs = {}
+        for image_serializer in serializers_list.validated_data:
+            if images[image_serializer['image_id']].attributes:
+                merged_count += 1
+            else:
+                added_count += 1
+            attributes = OSAttributes.from_json(image_serializer['attributes'])
+            docs.setdefault(image_serializer['image_id'], {}).update(attributes.to_doc())
+        # merge the attributes with scripted updates, concurrent updates of other fields are kept
+        OSImage.merge_fields(docs, refresh=refresh)
 
         return Response({'added': added_count, 'merged': merged_count}, status=status.HTTP_200_OK)
 
@@ -761,6 +1303,7 @@ class ImageViewSet(ViewSet):
     @action(detail=True, methods=['post'])
     def set_latent(self, request, pk=None):
         self._check_api_writes_disabled()
+        refresh = get_request_refresh(request)
 
         # multipart/form-data request with file
         latent_file = request.FILES.get('file', None)
@@ -788,15 +1331,8 @@ class ImageViewSet(ViewSet):
             return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
 
         image = self.get_object(fields=['latents', 'date_updated'])
-        if latent.latent_type in image.latents:
-            pass
-            # old_date_updated = image.date_updated
-            # TODO: log update
-        else:
-            pass  # TODO: log create
-
         try:
-            image.add_latent(latent)
+            image.add_latent(latent, refresh=refresh)
         except SaveConflictError as e:
             return Response(
                 {'error': e.description},
@@ -805,10 +1341,151 @@ class ImageViewSet(ViewSet):
 
         return Response(image.to_json(fields=['id', 'latents', 'date_updated']), status=status.HTTP_200_OK)
 
+    @tracer.wrap()
+    @extend_schema(request=None)
+    @action(detail=False, methods=['post'], authentication_classes=[APITokenAuthentication])
+    def bulk_set_latents(self, request):
+        """
+        Set many latents of many images in a single streamed multipart request. All files are uploaded to storage
+        concurrently and the images are updated with a single bulk request. Failed latents don't fail the request.
+
+        Example request:
+
+            files = [
+                ('latent_json_0', '{"image_id": "image1", "latent_type": "mask"}'),
+                ('latent_0', <file>),
+                ('latent_json_1', '{"image_id": "image1", "latent_type": "depth"}'),
+                ('latent_1', <file>),
+                ('latent_json_2', '{"image_id": "image2", "latent_type": "mask"}'),
+                ('latent_2', <file>),
+            ]
+        """
+        self._check_api_writes_disabled()
+        refresh = get_request_refresh(request, bulk=True)
+
+        if request.stream is None:
+            return Response({'error': 'No latents provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+        items = {}
+        failed = []
+        try:
+            # parse the request, the files are spooled to disk
+            try:
+                for name, value in iter_multipart_parts(request):
+                    if name.startswith('latent_json_'):
+                        items.setdefault(name[12:], {})['json'] = value
+                    elif name.startswith('latent_'):
+                        items.setdefault(name[7:], {})['file'] = value
+                    if len(items) > BULK_LATENTS_LIMIT:
+                        raise MultipartStreamError(
+                            f'Number of latents in bulk exceeds maximum limit of {BULK_LATENTS_LIMIT} latents.'
+                        )
+            except MultipartStreamError as e:
+                return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+            if not items:
+                return Response({'error': 'No latents provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+            # validate the latents
+            latent_types_map = OSImage.get_latent_types_map()
+            latents_by_image_id = {}
+            for index, item in items.items():
+                try:
+                    data = json.loads(item.get('json') or '')
+                    if not isinstance(data, dict):
+                        raise TypeError
+                except (ValueError, TypeError):
+                    failed.append({'image_id': None, 'latent_type': None, 'error': f'Invalid JSON for latent {index}'})
+                    continue
+                data['file'] = item.get('file')
+                serializer = ImageLatentBulkCreateSerializer(data=data)
+                if not serializer.is_valid():
+                    failed.append(
+                        {
+                            'image_id': data.get('image_id'),
+                            'latent_type': data.get('latent_type'),
+                            'error': serializer.errors,
+                        }
+                    )
+                    continue
+                image_id = serializer.validated_data['image_id']
+                latent_type = serializer.validated_data['latent_type']
+                if latent_type not in latent_types_map:
+                    error = f"Latent type '{latent_type}' does not exist"
+                    failed.append({'image_id': image_id, 'latent_type': latent_type, 'error': error})
+                    continue
+                if latent_type in latents_by_image_id.get(image_id, {}):
+                    error = f"Latent type '{latent_type}' appears multiple times for the image"
+                    failed.append({'image_id': image_id, 'latent_type': latent_type, 'error': error})
+                    continue
+                latent = OSLatent(latent_type=latent_type, file_object=serializer.validated_data['file'])
+                latent.validate_latent_type(prefetched_latent_types=list(latent_types_map.values()))
+                latents_by_image_id.setdefault(image_id, {})[latent_type] = latent
+
+            # get all images with one query
+            images = OSImage.objects.get_multiple(
+                list(latents_by_image_id.keys()),
+                fields=['id', 'latents'],
+                number=len(latents_by_image_id),
+            )
+            images_by_id = {image.id: image for image in images}
+            for image_id in set(latents_by_image_id.keys()) - set(images_by_id.keys()):
+                for latent_type in latents_by_image_id.pop(image_id):
+                    error = f'Image with ID "{image_id}" does not exist'
+                    failed.append({'image_id': image_id, 'latent_type': latent_type, 'error': error})
+
+            # upload all files concurrently
+            image_latents = []
+            previous_latents = {}
+            for image_id, latents in latents_by_image_id.items():
+                image = images_by_id[image_id]
+                for latent in latents.values():
+                    image_latents.append((image, latent))
+                    previous_latents[(image_id, latent.latent_type)] = image.latents.latents.get(latent.latent_type)
+                    image.latents.latents[latent.latent_type] = latent
+            upload_failed = OSImage.upload_latent_files(image_latents)
+            for (image_id, latent_type), error in upload_failed.items():
+                failed.append({'image_id': image_id, 'latent_type': latent_type, 'error': str(error)})
+                del latents_by_image_id[image_id][latent_type]
+                # keep the previous latent of the image, if any
+                previous_latent = previous_latents[(image_id, latent_type)]
+                if previous_latent is None:
+                    del images_by_id[image_id].latents.latents[latent_type]
+                else:
+                    images_by_id[image_id].latents.latents[latent_type] = previous_latent
+
+            # save all images with one bulk request, only the fields of the new latent types are written and the
+            # images deleted since they were read are not created again
+            docs = {
+                image_id: {latent.os_name_file: latent.file for latent in latents.values()}
+                for image_id, latents in latents_by_image_id.items()
+                if latents
+            }
+            results = OSImage.merge_fields(docs, refresh=refresh, raise_on_error=False)
+            updated = []
+            for image_id, latents in latents_by_image_id.items():
+                if not latents:
+                    continue
+                result = results.get(image_id)
+                # noop: the latents were replaced by files with the same paths
+                if result in ['updated', 'noop']:
+                    updated.append(image_id)
+                    continue
+                error = f'Image with ID "{image_id}" does not exist' if result == 'not_found' else str(result)
+                for latent_type in latents:
+                    failed.append({'image_id': image_id, 'latent_type': latent_type, 'error': error})
+        finally:
+            for item in items.values():
+                if item.get('file'):
+                    item['file'].close()
+
+        return Response({'updated': updated, 'failed': failed}, status=status.HTTP_200_OK)
+
     @tracer.wrap()
     @action(detail=True, methods=['post'])
     def delete_latent(self, request, pk=None):
         self._check_api_writes_disabled()
+        refresh = get_request_refresh(request)
 
         image = self.get_object(fields=['latents', 'date_updated'])
 
@@ -820,17 +1497,14 @@ class ImageViewSet(ViewSet):
         if latent_type not in image.latents:
             return Response({'error': 'Latent not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # old_date_updated = image.date_updated
         try:
-            image.remove_latent(latent_type)
+            image.remove_latent(latent_type, refresh=refresh)
         except SaveConflictError as e:
             return Response(
                 {'error': e.description},
                 status=status.HTTP_409_CONFLICT,
             )
 
-        # TODO: log delete
-
         return Response(image.to_json(fields=['id', 'latents', 'date_updated']), status=status.HTTP_200_OK)
 
     @tracer.wrap()
@@ -1135,6 +1809,33 @@ class ImageViewSet(ViewSet):
             }
         )
 
+    @tracer.wrap()
+    @extend_schema(parameters=[AuditLogParamsSerializer], responses=PaginatedAuditLogSerializer)
+    @action(detail=True, methods=['get'])
+    def audit_logs(self, request, pk=None):
+        """
+        The writes of an image, most recent first. Entries are indexed in batches, the latest writes can take a few
+        seconds to appear. Deleted images keep their audit log.
+        """
+        params_serializer = AuditLogParamsSerializer(data=self.request.query_params)
+        params_serializer.is_valid(raise_exception=True)
+
+        page_size = params_serializer.get_page_size()
+        entries = audit_log.search(pk, size=page_size, search_after=params_serializer.get_search_after())
+        next_url = None
+        if len(entries) == page_size:
+            parsed_url = urlparse(self.request.build_absolute_uri())
+            params = self.request.query_params.copy()
+            params[self.search_after_param] = ':'.join(str(value) for value in entries[-1]['sort'])
+            next_url = urlunparse(parsed_url._replace(query=params.urlencode()))
+
+        return Response(
+            {
+                'next': next_url,
+                'results': AuditLogEntrySerializer(entries, many=True).data,
+            }
+        )
+
     @extend_schema(parameters=[RetrieveOSImageParamsSerializer], responses=RelatedOSImageListSerializer)
     @action(detail=True, methods=['get'])
     def related(self, request, pk=None):
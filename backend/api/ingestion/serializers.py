@@ -0,0 +1,33 @@
+from rest_framework import serializers
+
+from backend.api.users.serializers import UserSerializer
+from backend.dataroom.models.ingestion import IngestionTicket
+
+
+class IngestionFailedItemSerializer(serializers.Serializer):
+    image_id = serializers.CharField()
+    error = serializers.CharField()
+
+
+class IngestionTicketSerializer(serializers.ModelSerializer):
+    ticket_id = serializers.UUIDField(source='id', read_only=True)
+    author = UserSerializer(read_only=True)
+    is_completed = serializers.BooleanField(read_only=True)
+    counts = serializers.DictField(child=serializers.IntegerField(), source='get_status_counts', read_only=True)
+    failed_items = IngestionFailedItemSerializer(many=True, source='get_failed_items', read_only=True)
+
+    class Meta:
+        model = IngestionTicket
+        fields = (
+            'ticket_id',
+            'operation',
+            'status',
+            'is_completed',
+            'item_count',
+            'counts',
+            'failed_items',
+            'author',
+            'date_created',
+            'date_completed',
+        )
+        read_only_fields = fields
@@ -0,0 +1,16 @@
+from rest_framework import exceptions
+
+ASYNC_PARAM = 'async'
+
+
+def get_request_async(request):
+    """
+    Should the writes of the request be queued and indexed asynchronously? With ?async=true the endpoint answers
+    202 with an ingestion ticket instead of waiting for OpenSearch.
+    """
+    value = request.query_params.get(ASYNC_PARAM)
+    if value is None or value.lower() in ['false', '0']:
+        return False
+    if value.lower() in ['true', '1']:
+        return True
+    raise exceptions.ValidationError({ASYNC_PARAM: f'Invalid value "{value}", expected "true" or "false"'})
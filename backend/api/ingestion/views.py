@@ -0,0 +1,17 @@
+from rest_framework.mixins import RetrieveModelMixin
+from rest_framework.viewsets import GenericViewSet
+
+from backend.api.ingestion.serializers import IngestionTicketSerializer
+from backend.dataroom.models.ingestion import IngestionTicket
+
+
+class IngestionTicketViewSet(RetrieveModelMixin, GenericViewSet):
+    """
+    Status of the writes sent with ?async=true. The tickets are returned by the write endpoints, poll them until
+    "is_completed" is true.
+    """
+
+    serializer_class = IngestionTicketSerializer
+
+    def get_queryset(self):
+        return IngestionTicket.objects.all().select_related('author')
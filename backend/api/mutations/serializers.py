@@ -0,0 +1,70 @@
+from rest_framework import serializers
+
+from backend.api.images.fields import AttributesPartialJSONField
+from backend.api.tags.fields import TagNameField
+from backend.api.tags.serializers import TAG_IMAGES_TAGS_LIMIT
+from backend.dataroom.models.dataset import Dataset
+
+MUTATION_OPERATIONS = [
+    ('add_tags', 'Add tags'),
+    ('remove_tags', 'Remove tags'),
+    ('add_to_datasets', 'Add to datasets'),
+    ('remove_from_datasets', 'Remove from datasets'),
+    ('set_attributes', 'Set attributes'),
+    ('delete', 'Delete'),
+]
+
+
+class MutationCreateSerializer(serializers.Serializer):
+    filters = serializers.DictField(
+        child=serializers.CharField(allow_blank=True),
+        required=True,
+        allow_empty=False,
+        help_text='Image filters, in the same format as the query parameters of the images list endpoint.',
+    )
+    operation = serializers.ChoiceField(choices=MUTATION_OPERATIONS, required=True)
+    tags = serializers.ListField(
+        child=TagNameField(),
+        required=False,
+        allow_empty=False,
+        max_length=TAG_IMAGES_TAGS_LIMIT,
+    )
+    datasets = serializers.ListField(child=serializers.CharField(), required=False, allow_empty=False)
+    attributes = AttributesPartialJSONField(required=False)
+    requests_per_second = serializers.FloatField(required=False, min_value=1)
+
+    def validate(self, data):
+        operation = data['operation']
+        if operation in ['add_tags', 'remove_tags'] and not data.get('tags'):
+            raise serializers.ValidationError(f'Please provide "tags" for the "{operation}" operation')
+        if operation in ['add_to_datasets', 'remove_from_datasets'] and not data.get('datasets'):
+            raise serializers.ValidationError(f'Please provide "datasets" for the "{operation}" operation')
+        if operation == 'set_attributes' and not data.get('attributes'):
+            raise serializers.ValidationError('Please provide "attributes" for the "set_attributes" operation')
+        return data
+
+    def validate_datasets(self, value):
+        valid_datasets = set(
+            Dataset.objects.filter(is_frozen=False, slug_version__in=value).values_list('slug_version', flat=True)
+        )
+        invalid_datasets = [dataset for dataset in value if dataset not in valid_datasets]
+        if invalid_datasets:
+            raise serializers.ValidationError(f'Invalid datasets: {", ".join(invalid_datasets)}')
+        return value
+
+
+class MutationSerializer(serializers.Serializer):
+    task_id = serializers.CharField()
+    description = serializers.CharField(allow_null=True)
+    completed = serializers.BooleanField()
+    cancelled = serializers.BooleanField()
+    error = serializers.JSONField(allow_null=True)
+    failures = serializers.JSONField()
+    total = serializers.IntegerField()
+    progress = serializers.IntegerField()
+    percent = serializers.FloatField()
+    updated = serializers.IntegerField()
+    noops = serializers.IntegerField()
+    version_conflicts = serializers.IntegerField()
+    elapsed_seconds = serializers.FloatField()
+    remaining_seconds = serializers.FloatField()
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.http import Http404, QueryDict
+from django_filters.utils import translate_validation
+from drf_spectacular.utils import extend_schema
+from opensearchpy import TransportError
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+from rest_framework.viewsets import ViewSet
+
+from backend.api.audit_log import AuditLogAuthorMixin
+from backend.api.images.filters import InvalidFilterError, OSImageFilterSet
+from backend.api.mutations.serializers import MutationCreateSerializer, MutationSerializer
+from backend.dataroom.audit_log import audit_log
+from backend.dataroom.exceptions import LatentTypeValidationError
+from backend.dataroom.models.attributes import AttributesFieldNotFoundError
+from backend.dataroom.models.os_image import (
+    ARRAY_ADD_SCRIPT,
+    ARRAY_REMOVE_SCRIPT,
+    MERGE_FIELDS_SCRIPT,
+    OSAttributes,
+    OSImage,
+)
+from backend.dataroom.models.tag import Tag
+from backend.dataroom.utils.opensearch_tasks import (
+    cancel_opensearch_task,
+    get_opensearch_task,
+    get_opensearch_task_status,
+)
+
+UPDATE_BY_QUERY_ACTION = 'indices:data/write/update/byquery'
+
+
+class MutationViewSet(AuditLogAuthorMixin, ViewSet):
+    """
+    Mutations update all images matching a filter in the background, with a throttled and sliced update_by_query
+    task in OpenSearch. The ID of a mutation is the ID of its OpenSearch task.
+    """
+
+    def _get_search(self, filters):
+        data = QueryDict(mutable=True)
+        data.update(filters)
+        filterset = OSImageFilterSet(data=data, search=OSImage.objects.search(), request=self.request)
+        try:
+            if not filterset.is_valid():
+                raise translate_validation(filterset.errors)
+            return filterset.filtered_search
+        except InvalidFilterError as e:
+            raise exceptions.ValidationError(str(e)) from e
+        except AttributesFieldNotFoundError as e:
+            raise exceptions.ValidationError(str(e)) from e
+        except LatentTypeValidationError as e:
+            raise exceptions.ValidationError(e.message) from e
+
+    def _get_script(self, data):
+        operation = data['operation']
+        if operation == 'add_tags':
+            Tag.objects.ensure_exist(data['tags'])
+            return ARRAY_ADD_SCRIPT, {'field': 'tags', 'values': data['tags'], 'sort': False}
+        if operation == 'remove_tags':
+            return ARRAY_REMOVE_SCRIPT, {'field': 'tags', 'values': data['tags']}
+        if operation == 'add_to_datasets':
+            return ARRAY_ADD_SCRIPT, {'field': 'datasets', 'values': data['datasets'], 'sort': True}
+        if operation == 'remove_from_datasets':
+            return ARRAY_REMOVE_SCRIPT, {'field': 'datasets', 'values': data['datasets']}
+        if operation == 'set_attributes':
+            return MERGE_FIELDS_SCRIPT, {'fields': OSAttributes.from_json(data['attributes']).to_doc()}
+        if operation == 'delete':
+            return MERGE_FIELDS_SCRIPT, {'fields': {'is_deleted': True}}
+        raise ValueError(f'Unknown operation "{operation}"')
+
+    def _get_status(self, task_id):
+        try:
+            main_task = get_opensearch_task(task_id)
+        except TransportError as e:
+            # unknown tasks and malformed task IDs
+            if e.status_code in [400, 404]:
+                raise Http404(f'Mutation "{task_id}" does not exist') from e
+            raise
+        # only expose the update_by_query tasks on the images index
+        task = main_task.get('task', {})
+        if task.get('action') != UPDATE_BY_QUERY_ACTION or f'[{OSImage.INDEX}]' not in task.get('description', ''):
+            raise Http404(f'Mutation "{task_id}" does not exist')
+        return get_opensearch_task_status(task_id, main_task=main_task)
+
+    @extend_schema(request=MutationCreateSerializer, responses={202: MutationSerializer})
+    def create(self, request):
+        if settings.API_DISABLE_IMAGE_WRITES:
+            raise exceptions.PermissionDenied('Writes are temporarily disabled')
+
+        serializer = MutationCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        search = self._get_search(serializer.validated_data['filters'])
+        script, params = self._get_script(serializer.validated_data)
+        task_id = OSImage.start_update_by_query(
+            search,
+            script=script,
+            params=params,
+            requests_per_second=serializer.validated_data.get('requests_per_second'),
+        )
+        # the updated images are not known, the mutation is logged once with its filters
+        audit_log.log(
+            None,
+            'mutation',
+            changes={
+                'task_id': task_id,
+                'filters': serializer.validated_data['filters'],
+                'operation': serializer.validated_data['operation'],
+                'params': params,
+            },
+            fields=[params['field']] if 'field' in params else list(params['fields']),
+        )
+        return Response(MutationSerializer(self._get_status(task_id)).data, status=status.HTTP_202_ACCEPTED)
+
+    @extend_schema(responses={200: MutationSerializer})
+    def retrieve(self, request, pk=None):
+        return Response(MutationSerializer(self._get_status(pk)).data, status=status.HTTP_200_OK)
+
+    @extend_schema(responses={200: MutationSerializer})
+    def destroy(self, request, pk=None):
+        """Cancel the mutation, images that were already updated are kept"""
+        task_status = self._get_status(pk)
+        if not task_status['completed']:
+            cancel_opensearch_task(pk)
+            task_status = self._get_status(pk)
+        return Response(MutationSerializer(task_status).data, status=status.HTTP_200_OK)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from rest_framework import exceptions
+
+from backend.dataroom.opensearch import get_refresh_policy
+
+REFRESH_PARAM = 'refresh'
+
+
+def get_request_refresh(request, bulk=False, create=False):
+    """
+    Refresh policy of a write endpoint, from the "refresh" query param. Clients that need to read their writes
+    right away can pass ?refresh=true (or wait_for), the endpoints default to OPENSEARCH_CREATE_REFRESH for image
+    creates, OPENSEARCH_DEFAULT_REFRESH for single image writes and OPENSEARCH_BULK_REFRESH for bulk writes.
+    """
+    refresh = request.query_params.get(REFRESH_PARAM)
+    if refresh is None:
+        if create:
+            return settings.OPENSEARCH_CREATE_REFRESH
+        return settings.OPENSEARCH_BULK_REFRESH if bulk else settings.OPENSEARCH_DEFAULT_REFRESH
+    try:
+        return get_refresh_policy(refresh)
+    except ValueError as e:
+        raise exceptions.ValidationError({REFRESH_PARAM: str(e)}) from e
@@ -26,6 +26,20 @@ class QueueSerializer(serializers.Serializer):
     images_with_disabled_latents = StatsDictSerializer()
 
 
+class TaskRunnerStatsSerializer(serializers.Serializer):
+    name = serializers.CharField()
+    items_processed = serializers.IntegerField()
+    items_per_second = serializers.FloatField()
+    failures = serializers.IntegerField()
+    retries = serializers.IntegerField()
+    duration_p50 = serializers.IntegerField(help_text='Milliseconds')
+    duration_p95 = serializers.IntegerField(help_text='Milliseconds')
+    duration_p99 = serializers.IntegerField(help_text='Milliseconds')
+    feed_time = serializers.IntegerField(help_text='Milliseconds')
+    queue_depth = serializers.IntegerField()
+    date_updated = serializers.DateTimeField()
+
+
 class AttributeFieldSerializer(serializers.ModelSerializer):
     class Meta:
         model = AttributesField
@@ -8,6 +8,7 @@ from backend.api.stats.serializers import (
     AttributeFieldSerializer,
     LatentTypeSerializer,
     QueueSerializer,
+    TaskRunnerStatsSerializer,
     TotalsSerializer,
 )
 from backend.api.stats.utils import get_queue_stats
@@ -20,6 +21,7 @@ class StatsViewSet(viewsets.ViewSet):
         data = {
             'totals': request.build_absolute_uri(reverse('api:stats-totals')),
             'queue': request.build_absolute_uri(reverse('api:stats-queue')),
+            'task_runner': request.build_absolute_uri(reverse('api:stats-task_runner')),
             'image_sources': request.build_absolute_uri(reverse('api:stats-image_sources')),
             'image_aspect_ratio_fractions': request.build_absolute_uri(
                 reverse('api:stats-image_aspect_ratio_fractions'),
@@ -45,6 +47,13 @@ class StatsViewSet(viewsets.ViewSet):
         serializer = QueueSerializer(get_queue_stats())
         return Response(serializer.data)
 
+    @extend_schema(responses={200: TaskRunnerStatsSerializer(many=True)})
+    @action(detail=False, url_name='task_runner')
+    def task_runner(self, request):
+        stats = [{'name': name, **values} for name, values in Stats.objects.get_task_runner_stats().items()]
+        serializer = TaskRunnerStatsSerializer(stats, many=True)
+        return Response(serializer.data)
+
     @extend_schema(responses={200: {"type": "object", "additionalProperties": {"type": "integer"}}})
     @action(detail=False, url_name='image_sources')
     def image_sources(self, request):
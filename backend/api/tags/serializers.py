@@ -6,7 +6,7 @@ from backend.api.images.fields import ImageIdField
 from backend.api.tags.fields import TagNameField
 from backend.dataroom.models.tag import Tag
 
-TAG_IMAGES_IMAGE_LIMIT = 1000
+TAG_IMAGES_IMAGE_LIMIT = 10_000
 TAG_IMAGES_TAGS_LIMIT = 10
 
 
@@ -3,6 +3,8 @@ from rest_framework.routers import DefaultRouter
 
 from backend.api.datasets.views import DatasetViewSet
 from backend.api.images.views import ImageViewSet
+from backend.api.ingestion.views import IngestionTicketViewSet
+from backend.api.mutations.views import MutationViewSet
 from backend.api.opensearch.views import OpenSearchAPIView
 from backend.api.stats.views import StatsViewSet
 from backend.api.tags.views import TagViewSet
@@ -16,6 +18,8 @@ router.register(r'datasets', DatasetViewSet, basename='datasets')
 router.register(r'tags', TagViewSet, basename='tags')
 router.register(r'stats', StatsViewSet, basename='stats')
 router.register(r'tokens', TokenViewSet, basename='tokens')
+router.register(r'mutations', MutationViewSet, basename='mutations')
+router.register(r'ingestion_tickets', IngestionTicketViewSet, basename='ingestion_tickets')
 
 
 urlpatterns = [
@@ -448,6 +448,8 @@ MAX_ATTRIBUTES_FIELDS = 100
 # duplication params
 DUPLICATE_FINDER_NUMBER_OF_SIMILARS = 30
 DUPLICATE_FINDER_SIMILARITY_THRESHOLD = 0.98
+# recompute the similarity of the kNN hits from the vectors, for indices that approximate the kNN scores
+DUPLICATE_FINDER_EXACT_RESCORE = env.bool('DUPLICATE_FINDER_EXACT_RESCORE', default=False)
 DUPLICATE_FINDER_EXCLUDED_SOURCES = []
 DUPLICATE_DELETE_TASK_INCLUDED_SOURCES = []
 
@@ -463,21 +465,108 @@ API_CACHE_MAX_TTL = 60 * 60  # 1 hour
 # Use this to turn off all writes in the API during maintenance
 API_DISABLE_IMAGE_WRITES = env.bool('API_DISABLE_IMAGE_WRITES', default=False)
 
+# Maximum number of concurrent storage uploads when creating images in bulk
+BULK_CREATE_STORAGE_MAX_WORKERS = env.int('BULK_CREATE_STORAGE_MAX_WORKERS', default=16)
+
+# Asynchronous ingestion: accepted writes are queued in the database and indexed in batches by the task runner
+INGESTION_BATCH_SIZE = env.int('INGESTION_BATCH_SIZE', default=500)
+INGESTION_MAX_ATTEMPTS = env.int('INGESTION_MAX_ATTEMPTS', default=5)
+# items claimed by a worker that died are queued again after INGESTION_CLAIM_TIMEOUT seconds
+INGESTION_CLAIM_TIMEOUT = env.int('INGESTION_CLAIM_TIMEOUT', default=60 * 10)
+
+# Maximum number of concurrent storage uploads when saving latents
+LATENT_STORAGE_MAX_WORKERS = env.int('LATENT_STORAGE_MAX_WORKERS', default=16)
+
+# Presigned URLs for uploading images and latents directly to storage (S3/R2 only)
+DIRECT_UPLOAD_URL_EXPIRATION = env.int('DIRECT_UPLOAD_URL_EXPIRATION', default=60 * 60)
+
+# Background mutations of all images matching a filter (update_by_query)
+MUTATIONS_REQUESTS_PER_SECOND = env.float('MUTATIONS_REQUESTS_PER_SECOND', default=1000)
+MUTATIONS_SCROLL_SIZE = env.int('MUTATIONS_SCROLL_SIZE', default=1000)
+
+# Images downloaded from URLs (image_url)
+IMAGE_DOWNLOAD_MAX_SIZE = env.int('IMAGE_DOWNLOAD_MAX_SIZE', default=DATA_UPLOAD_MAX_MEMORY_SIZE)
+IMAGE_DOWNLOAD_TIMEOUT = env.float('IMAGE_DOWNLOAD_TIMEOUT', default=30)
+IMAGE_DOWNLOAD_MAX_CONNECTIONS = env.int('IMAGE_DOWNLOAD_MAX_CONNECTIONS', default=50)
+IMAGE_DOWNLOAD_MAX_WORKERS = env.int('IMAGE_DOWNLOAD_MAX_WORKERS', default=16)
+
+# Shared pooled HTTP clients
+HTTP_CLIENT_MAX_CONNECTIONS = env.int('HTTP_CLIENT_MAX_CONNECTIONS', default=20)
+HTTP_CLIENT_TIMEOUT = env.float('HTTP_CLIENT_TIMEOUT', default=30)
+
+# Per-process Bloom filter over image IDs and hashes, skips the existence checks for images that are definitely new
+IMAGE_EXISTENCE_FILTER_ENABLED = env.bool('IMAGE_EXISTENCE_FILTER_ENABLED', default=False)
+# capacity counts both IDs and hashes, the filter takes ~1.2 bytes per value at a 1% error rate
+IMAGE_EXISTENCE_FILTER_CAPACITY = env.int('IMAGE_EXISTENCE_FILTER_CAPACITY', default=200_000_000)
+IMAGE_EXISTENCE_FILTER_ERROR_RATE = env.float('IMAGE_EXISTENCE_FILTER_ERROR_RATE', default=0.01)
+IMAGE_EXISTENCE_FILTER_REFRESH_SECONDS = env.int('IMAGE_EXISTENCE_FILTER_REFRESH_SECONDS', default=5)
+IMAGE_EXISTENCE_FILTER_REFRESH_OVERLAP_SECONDS = env.int('IMAGE_EXISTENCE_FILTER_REFRESH_OVERLAP_SECONDS', default=60)
+
 # thumbnail image size
 THUMBNAIL_SIZE = (400, 400)
+# Maximum number of thumbnails created concurrently by the task runner
+THUMBNAIL_MAX_WORKERS = env.int('THUMBNAIL_MAX_WORKERS', default=8)
+
+# Images per batch of the cleanup of the latents of disabled latent types
+DISABLED_LATENTS_CLEANUP_BATCH_SIZE = env.int('DISABLED_LATENTS_CLEANUP_BATCH_SIZE', default=500)
+# Maximum duration of a run of the cleanup, the next run continues
+DISABLED_LATENTS_CLEANUP_MAX_SECONDS = env.int('DISABLED_LATENTS_CLEANUP_MAX_SECONDS', default=600)
 
 # Number of workers for MDSWriter in dataset_save_shards
 MDS_WRITER_MAX_WORKERS = env.int('MDS_WRITER_MAX_WORKERS', default=6)
 
 # Task runner API
 TASK_RUNNER_STATS_API = env.str('TASK_RUNNER_STATS_API', default=None)
+# how long the queue feeds keep their point in time between two pages
+TASK_RUNNER_PIT_KEEP_ALIVE = '10m'
+# the queue feeds back off when their OpenSearch searches are slower than this or rejected
+TASK_RUNNER_MAX_OPENSEARCH_LATENCY_SECONDS = env.float('TASK_RUNNER_MAX_OPENSEARCH_LATENCY_SECONDS', default=2.0)
+# longest interval between two feeds of a queued task while backing off
+TASK_RUNNER_MAX_BACKOFF_SECONDS = env.int('TASK_RUNNER_MAX_BACKOFF_SECONDS', default=60)
+# port of the Prometheus metrics endpoint of the task runner, disabled by default
+TASK_RUNNER_METRICS_PORT = env.int('TASK_RUNNER_METRICS_PORT', default=None)
+# statsd server the task runner metrics are sent to, disabled by default
+TASK_RUNNER_STATSD_HOST = env.str('TASK_RUNNER_STATSD_HOST', default=None)
+TASK_RUNNER_STATSD_PORT = env.int('TASK_RUNNER_STATSD_PORT', default=8125)
+TASK_RUNNER_STATSD_PREFIX = env.str('TASK_RUNNER_STATSD_PREFIX', default='dataroom.task_runner')
+# how often the task runner metrics are saved to the stats and sent to statsd
+TASK_RUNNER_METRICS_INTERVAL_SECONDS = env.int('TASK_RUNNER_METRICS_INTERVAL_SECONDS', default=60)
+# how often the long scans (see ScanCursor) save their position, they continue from it after a restart
+TASK_RUNNER_SCAN_CHECKPOINT_SECONDS = env.int('TASK_RUNNER_SCAN_CHECKPOINT_SECONDS', default=60)
+# number of partitions of the scan of the R2 migration fed in parallel, the migration is disabled with 0
+R2_MIGRATION_PARTITIONS = env.int('R2_MIGRATION_PARTITIONS', default=0)
 
 # OpenSearch
 AWS_OPEN_SEARCH_UNAUTHENTICATED_REQUESTS = True
 AWS_OPEN_SEARCH_URL = env('AWS_OPEN_SEARCH_URL', default='http://localhost:9200')
 
 OPENSEARCH_IMAGES_INDEX_NAME = env('OPENSEARCH_IMAGES_INDEX_NAME', default='images')
-OPENSEARCH_DEFAULT_REFRESH = True
+# refresh policy of the writes: "true", "false", "wait_for" or "coalesce", see dataroom.opensearch.get_refresh_policy.
+# Clients that need to read their writes right away can pass ?refresh=true to the write endpoints.
+OPENSEARCH_DEFAULT_REFRESH = env('OPENSEARCH_DEFAULT_REFRESH', default='coalesce')
+OPENSEARCH_BULK_REFRESH = env('OPENSEARCH_BULK_REFRESH', default='false')
+# image creates are refreshed right away by default, the duplicate checks search the hashes and original URLs
+OPENSEARCH_CREATE_REFRESH = env('OPENSEARCH_CREATE_REFRESH', default='true')
+# coalesced refreshes run at most once per index every OPENSEARCH_REFRESH_INTERVAL seconds
+OPENSEARCH_REFRESH_INTERVAL = env.float('OPENSEARCH_REFRESH_INTERVAL', default=1)
+# read-modify-write updates (OSImage.update_with_retry) read the image again this many times after a conflict
+OPENSEARCH_CONFLICT_MAX_RETRIES = env.int('OPENSEARCH_CONFLICT_MAX_RETRIES', default=3)
+# OSBulkIndex: a bulk request is sent every OPENSEARCH_BULK_SIZE documents or OPENSEARCH_BULK_MAX_BYTES bytes
+OPENSEARCH_BULK_SIZE = env.int('OPENSEARCH_BULK_SIZE', default=100)
+OPENSEARCH_BULK_MAX_BYTES = env.int('OPENSEARCH_BULK_MAX_BYTES', default=10 * 1024 * 1024)
+# number of bulk requests sent in parallel, only for writes that don't touch the same document twice
+OPENSEARCH_BULK_MAX_IN_FLIGHT = env.int('OPENSEARCH_BULK_MAX_IN_FLIGHT', default=1)
+# retries of documents rejected with 429 (es_rejected_execution_exception), with an exponential backoff in seconds
+OPENSEARCH_BULK_MAX_RETRIES = env.int('OPENSEARCH_BULK_MAX_RETRIES', default=5)
+OPENSEARCH_BULK_INITIAL_BACKOFF = env.float('OPENSEARCH_BULK_INITIAL_BACKOFF', default=1)
+OPENSEARCH_BULK_MAX_BACKOFF = env.float('OPENSEARCH_BULK_MAX_BACKOFF', default=30)
+
+# audit log of the image writes, in monthly indices named <prefix>-YYYY.MM
+OPENSEARCH_AUDIT_LOG_INDEX_PREFIX = env('OPENSEARCH_AUDIT_LOG_INDEX_PREFIX', default='audit-logs')
+AUDIT_LOG_ENABLED = env.bool('AUDIT_LOG_ENABLED', default=True)
+# the entries are indexed in bulk every AUDIT_LOG_FLUSH_INTERVAL seconds or AUDIT_LOG_BUFFER_SIZE entries
+AUDIT_LOG_BUFFER_SIZE = env.int('AUDIT_LOG_BUFFER_SIZE', default=1000)
+AUDIT_LOG_FLUSH_INTERVAL = env.float('AUDIT_LOG_FLUSH_INTERVAL', default=5)
 
 OPENSEARCH_SNAPSHOT_REPOSITORY_NAME = env('OPENSEARCH_SNAPSHOT_REPOSITORY_NAME', default=None)
 OPENSEARCH_SNAPSHOT_NAME = env('OPENSEARCH_SNAPSHOT_NAME', default=None)
@@ -497,3 +586,8 @@ FETCH_EMBEDDING_FOR_TEXT_HEADER_VALUE = env('FETCH_EMBEDDING_FOR_TEXT_HEADER_VAL
 FETCH_TEXT_FOR_IMAGE_API_URL = env('FETCH_TEXT_FOR_IMAGE_API_URL', default=None)
 FETCH_TEXT_FOR_IMAGE_HEADER_KEY = env('FETCH_TEXT_FOR_IMAGE_HEADER_KEY', default=None)
 FETCH_TEXT_FOR_IMAGE_HEADER_VALUE = env('FETCH_TEXT_FOR_IMAGE_HEADER_VALUE', default=None)
+
+# images sent per call by the embedding backfill, only set it above 1 if the endpoint accepts multiple images
+FETCH_EMBEDDING_FOR_IMAGE_BATCH_SIZE = env.int('FETCH_EMBEDDING_FOR_IMAGE_BATCH_SIZE', default=1)
+# maximum number of concurrent calls to the embedding API per process
+FETCH_EMBEDDING_MAX_CONCURRENCY = env.int('FETCH_EMBEDDING_MAX_CONCURRENCY', default=8)
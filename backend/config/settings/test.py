@@ -38,4 +38,7 @@ AWS_OPEN_SEARCH_UNAUTHENTICATED_REQUESTS = True
 AWS_OPEN_SEARCH_URL = 'http://localhost:9200'
 
 OPENSEARCH_IMAGES_INDEX_NAME = 'test_images'
+OPENSEARCH_AUDIT_LOG_INDEX_PREFIX = 'test_audit_logs'
 OPENSEARCH_DEFAULT_REFRESH = True
+OPENSEARCH_BULK_REFRESH = True
+OPENSEARCH_CREATE_REFRESH = True
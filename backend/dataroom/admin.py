@@ -9,7 +9,9 @@ from opensearchpy import TransportError
 from backend.api.stats.utils import get_queue_stats
 from backend.dataroom.models import (
     AttributesField,
+    IngestionTicket,
     LatentType,
+    ScanCursor,
     Stats,
     Tag,
 )
@@ -80,6 +82,27 @@ class DatasetAdmin(admin.ModelAdmin):
     raw_id_fields = ('author',)
 
 
+@admin.register(IngestionTicket)
+class IngestionTicketAdmin(admin.ModelAdmin):
+    list_display = ("id", "operation", "status", "item_count", "author", "date_created", "date_completed")
+    list_filter = ("operation", "status")
+    readonly_fields = ("date_created", "date_updated", "date_completed")
+
+
+@admin.register(ScanCursor)
+class ScanCursorAdmin(admin.ModelAdmin):
+    list_display = ("name", "partition", "partitions", "items_scanned", "pass_count", "date_updated", "date_completed")
+    list_filter = ("name",)
+    readonly_fields = ("date_created", "date_updated", "date_pass_started", "date_completed")
+    actions = ("reset",)
+
+    @admin.action(description="Start the selected scans over")
+    def reset(self, request, queryset):
+        for cursor in queryset:
+            cursor.reset()
+        self.message_user(request, f"{len(queryset)} scan partitions will start over", messages.SUCCESS)
+
+
 @admin.register(LatentType)
 class LatentTypeAdmin(admin.ModelAdmin):
     list_display = (
@@ -150,6 +173,7 @@ class StatsAdmin(admin.ModelAdmin):
                     }
                     for key, val in get_queue_stats().items()
                 },
+                'task_runner': Stats.objects.get_task_runner_stats(),
             }
         )
         return TemplateResponse(request, "admin/custom/tasks.html", ctx)
@@ -0,0 +1,181 @@
+import atexit
+import contextvars
+import datetime
+import logging
+import threading
+import uuid
+import zoneinfo
+
+from django.conf import settings
+from opensearchpy.helpers import BulkIndexError
+
+from backend.dataroom.opensearch import OS, OSBulkIndex
+
+logger = logging.getLogger('dataroom')
+
+# fields that are too large to be copied to the audit log
+AUDIT_LOG_EXCLUDED_FIELDS = ('coca_embedding_vector',)
+# fields derived by the task runner, updates of only these fields are not logged
+AUDIT_LOG_IGNORED_FIELDS = ('date_updated', 'thumbnail', 'thumbnail_error', 'duplicate_state')
+
+# email of the user making the current request, set by the API views
+current_author = contextvars.ContextVar('audit_log_author', default=None)
+
+
+def get_audit_log_index_pattern():
+    return f'{settings.OPENSEARCH_AUDIT_LOG_INDEX_PREFIX}-*'
+
+
+def get_audit_log_index(date):
+    """The audit log has one index per month, old months can be dropped or snapshotted as a whole"""
+    return f'{settings.OPENSEARCH_AUDIT_LOG_INDEX_PREFIX}-{date:%Y.%m}'
+
+
+def get_audit_log_index_template():
+    return {
+        'index_patterns': [get_audit_log_index_pattern()],
+        'template': {
+            'settings': {
+                'number_of_shards': 1,
+                'refresh_interval': '5s',
+            },
+            'mappings': {
+                'dynamic': 'strict',
+                'properties': {
+                    'entry_id': {'type': 'keyword'},
+                    'image_id': {'type': 'keyword'},
+                    'action': {'type': 'keyword'},
+                    'fields': {'type': 'keyword'},
+                    'author': {'type': 'keyword'},
+                    'date': {'type': 'date'},
+                    # stored as is, not searchable
+                    'changes': {'type': 'object', 'enabled': False},
+                },
+            },
+        },
+    }
+
+
+class AuditLog:
+    """
+    Append-only log of the image writes, stored in monthly OpenSearch indices.
+
+    Entries are buffered in memory and indexed in bulk from a background thread, every flush_interval seconds or
+    when buffer_size entries are buffered, so logging only appends to a list in the write path. Entries of a process
+    that is killed before a flush are lost, they are flushed when the process exits normally.
+
+    Usage:
+
+        audit_log.log(image.id, 'update', changes=image.to_doc(fields=['source']))
+        audit_log.search(image.id)
+    """
+
+    def __init__(self, buffer_size=None, flush_interval=None):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._template_is_stored = False
+
+    def log(self, image_id, action, changes=None, fields=None, author=None):
+        """
+        Add an entry to the audit log.
+
+        @param image_id: ID of the written image, None for a mutation of all the images matching a filter
+        @param action: "create", "update", "delete", "delete_permanently" or "mutation"
+        @param changes: the written values, as an OpenSearch document, or the task, filters and parameters of a
+            mutation
+        @param fields: the written fields, by default the keys of changes without AUDIT_LOG_IGNORED_FIELDS
+        @param author: email of the author of the write, the author of the current request by default
+        """
+        if not settings.AUDIT_LOG_ENABLED:
+            return
+        if fields is None:
+            fields = [field for field in (changes or {}) if field not in AUDIT_LOG_IGNORED_FIELDS]
+            if action == 'update' and not fields:
+                return
+        changes = {key: value for key, value in (changes or {}).items() if key not in AUDIT_LOG_EXCLUDED_FIELDS}
+        entry = {
+            'entry_id': uuid.uuid4().hex,
+            'image_id': image_id,
+            'action': action,
+            'fields': sorted(fields),
+            'author': author or current_author.get(),
+            'date': datetime.datetime.now(tz=zoneinfo.ZoneInfo('UTC')).isoformat(),
+            'changes': changes,
+        }
+        buffer_size = self.buffer_size or settings.AUDIT_LOG_BUFFER_SIZE
+        with self._lock:
+            self._buffer.append(entry)
+            is_full = len(self._buffer) >= buffer_size
+            if not is_full and self._timer is None:
+                self._timer = threading.Timer(
+                    self.flush_interval if self.flush_interval is not None else settings.AUDIT_LOG_FLUSH_INTERVAL,
+                    self.flush,
+                )
+                self._timer.daemon = True
+                self._timer.start()
+        if is_full:
+            threading.Thread(target=self.flush, daemon=True).start()
+
+    def _store_template(self):
+        if not self._template_is_stored:
+            OS.client.indices.put_index_template(
+                name=settings.OPENSEARCH_AUDIT_LOG_INDEX_PREFIX,
+                body=get_audit_log_index_template(),
+            )
+            self._template_is_stored = True
+
+    def flush(self):
+        """Index the buffered entries, the entries that can't be indexed are dropped"""
+        with self._lock:
+            entries = self._buffer
+            self._buffer = []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not entries:
+            return
+
+        # one flush at a time, so the template is stored once and the entries are indexed in order
+        with self._flush_lock:
+            try:
+                self._store_template()
+                with OSBulkIndex() as os_bulk:
+                    for entry in entries:
+                        date = datetime.datetime.fromisoformat(entry['date'])
+                        os_bulk.append(index=get_audit_log_index(date), body=entry)
+            except BulkIndexError as e:
+                logger.error(f'Error indexing {len(e.errors)} of {len(entries)} audit log entries: {e.errors[:3]}')
+            except Exception as e:
+                logger.error(f'Error indexing {len(entries)} audit log entries: {e}')
+
+    def search(self, image_id, size=100, search_after=None):
+        """
+        Get the audit log of an image, most recent first.
+
+        @param image_id: ID of the image
+        @param size: number of entries to return
+        @param search_after: "sort" of the last entry of the previous page
+        @return: list of entries, each with its "sort"
+        """
+        body = {
+            'query': {'term': {'image_id': image_id}},
+            'sort': [{'date': 'desc'}, {'entry_id': 'desc'}],
+            'size': size,
+        }
+        if search_after:
+            body['search_after'] = search_after
+        response = OS.client.search(
+            index=get_audit_log_index_pattern(),
+            body=body,
+            ignore_unavailable=True,
+            allow_no_indices=True,
+        )
+        return [{**hit['_source'], 'sort': hit['sort']} for hit in response['hits']['hits']]
+
+
+audit_log = AuditLog()
+atexit.register(audit_log.flush)
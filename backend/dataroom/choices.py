@@ -112,6 +112,14 @@ class StatsType(models.TextChoices):
     IMAGES_MARKED_AS_DUPLICATES = "images_marked_as_duplicates", "Images marked as duplicates"
     IMAGES_MARKED_FOR_DELETION = "images_marked_for_deletion", "Images marked for deletion"
     IMAGES_WITH_DISABLED_LATENTS = "images_with_disabled_latents", "Images with disabled latents"
+    TASK_ITEMS_PROCESSED = "task_items_processed", "Task items processed"
+    TASK_FAILURES = "task_failures", "Task failures"
+    TASK_RETRIES = "task_retries", "Task retries"
+    TASK_DURATION_P50 = "task_duration_p50", "Task duration p50 (ms)"
+    TASK_DURATION_P95 = "task_duration_p95", "Task duration p95 (ms)"
+    TASK_DURATION_P99 = "task_duration_p99", "Task duration p99 (ms)"
+    TASK_FEED_TIME = "task_feed_time", "Task feed time (ms)"
+    TASK_QUEUE_DEPTH = "task_queue_depth", "Task queue depth"
 
 
 class DuplicateState(Enum):
@@ -122,3 +130,15 @@ class DuplicateState(Enum):
     @classmethod
     def values(cls):
         return [state.value for state in cls]
+
+
+class IngestionOperation(models.TextChoices):
+    CREATE = "create", "Create"
+    UPDATE = "update", "Update"
+
+
+class IngestionStatus(models.TextChoices):
+    PENDING = "pending", "Pending"
+    PROCESSING = "processing", "Processing"
+    DONE = "done", "Done"
+    FAILED = "failed", "Failed"
@@ -23,3 +23,19 @@ class LatentTypeValidationError(Exception):
             message = f"Invalid latent type '{latent_type}'"
         self.message = message
         self.latent_type = latent_type
+
+
+class ImageDownloadError(Exception):
+    """Raised when an image downloaded from a URL is rejected"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class DirectUploadError(Exception):
+    """Raised when a file uploaded directly to storage is missing or doesn't match what the client declared"""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.task_runner.tasks import (
+    delete_duplicates_task,
+    delete_marked_for_deletion_task,
+    mark_duplicates_task,
+    update_thumbnail_task,
+)
+from backend.task_runner.tasks.delete_images import image_delete_duplicates, image_delete_marked_for_deletion
+from backend.task_runner.tasks.update_images import image_mark_duplicates, image_update_thumbnail
+from backend.task_runner.tasks.utils import chunks
+
+# queued task and its task function for a single item
+BENCHMARKED_TASKS = {
+    'update_thumbnail': (update_thumbnail_task, image_update_thumbnail),
+    'mark_duplicates': (mark_duplicates_task, image_mark_duplicates),
+    'delete_duplicates': (delete_duplicates_task, image_delete_duplicates),
+    'delete_marked_for_deletion': (delete_marked_for_deletion_task, image_delete_marked_for_deletion),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of a queued task processing one item at a time and batches of items. The tasks run '
+        'in this process, without the Dask scheduling overhead.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('task', type=str, choices=BENCHMARKED_TASKS.keys(), help='The queued task to benchmark')
+        parser.add_argument(
+            '--items', type=int, required=False, default=200, help='The number of items processed in each mode'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, required=False, default=None, help='The batch size, of the task by default'
+        )
+
+    def handle(self, *args, **options):
+        task, single_task_function = BENCHMARKED_TASKS[options['task']]
+        batch_size = options['batch_size'] or task.batch_size
+
+        items = task.queue_feed_function(size=options['items'] * 2).result
+        if len(items) < 2:
+            self.stdout.write(self.style.ERROR(f'Not enough queued items for {task.name}'))
+            return
+        single_items = items[: len(items) // 2]
+        batch_items = items[len(items) // 2 :]
+
+        # the items are really processed, e.g. the images marked for deletion are deleted
+        message = f'Process {len(items)} queued items of {task.name}? (y/n): '
+        if input(self.style.WARNING(message)).lower() != 'y':
+            self.stdout.write(self.style.ERROR('Aborted!'))
+            return
+
+        single_rate, single_cpu_rate = self.measure(single_task_function, single_items)
+        self.stdout.write(
+            f'One item at a time: {len(single_items)} items, {single_rate:.1f} items/s, '
+            f'{single_cpu_rate:.1f} items per CPU second'
+        )
+
+        batch_rate, batch_cpu_rate = self.measure(task.task_function, list(chunks(batch_items, batch_size)))
+        self.stdout.write(
+            f'Batches of {batch_size} items: {len(batch_items)} items, {batch_rate:.1f} items/s, '
+            f'{batch_cpu_rate:.1f} items per CPU second'
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {batch_rate / single_rate:.2f}x'))
+
+    def measure(self, task_function, args):
+        """Call the task function with each argument, return the items per second and per CPU second"""
+        start_time = time.time()
+        start_cpu_time = time.process_time()
+        for arg in args:
+            task_function(arg)
+        duration = time.time() - start_time
+        # the CPU time of all the threads of this process
+        cpu_time = time.process_time() - start_cpu_time
+        count = sum(len(arg) if isinstance(arg, list) else 1 for arg in args)
+        return count / duration, count / max(cpu_time, 0.001)
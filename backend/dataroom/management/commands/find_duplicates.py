@@ -0,0 +1,118 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from backend.dataroom.choices import DuplicateState
+from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.opensearch import OS
+from backend.dataroom.utils.offline_duplicates import (
+    FAISS_AVAILABLE,
+    VectorMatrix,
+    find_similar_pairs,
+    get_duplicate_states,
+    load_vectors,
+)
+from backend.task_runner.tasks.utils import chunks
+
+# number of images per merge_fields call
+UPDATE_CHUNK_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Find the near duplicates of all the images of some sources with an exact similarity join on this machine, '
+        'instead of one kNN search per image on the cluster, and set their duplicate_state.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', type=str, action='append', required=True, help='A source of the images, can be repeated'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            required=False,
+            default=settings.DUPLICATE_FINDER_SIMILARITY_THRESHOLD,
+            help='The minimum similarity of two duplicates',
+        )
+        parser.add_argument(
+            '--block-size',
+            type=int,
+            required=False,
+            default=4096,
+            help='The number of vectors compared at once, the memory used grows with its square',
+        )
+        parser.add_argument(
+            '--slices', type=int, required=False, default=8, help='The number of partitions loaded in parallel'
+        )
+        parser.add_argument(
+            '--work-dir', type=str, required=False, default=None, help='The directory of the memory-mapped matrix'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count the changes, do not save them')
+
+    def handle(self, *args, **options):
+        query = {
+            'bool': {
+                'filter': [
+                    {'terms': {'source': options['source']}},
+                    {'term': {'coca_embedding_exists': True}},
+                    {'term': {'is_deleted': False}},
+                ]
+            }
+        }
+        count = OS.client.count(index=OSImage.INDEX, body={'query': query})['count']
+        if not count:
+            self.stdout.write(self.style.ERROR('No images with an embedding in these sources'))
+            return
+
+        with tempfile.TemporaryDirectory(dir=options['work_dir']) as work_dir:
+            matrix = VectorMatrix(os.path.join(work_dir, 'vectors.npy'), count)
+
+            start_time = time.time()
+            load_vectors(matrix, OSImage.INDEX, query, slices=options['slices'])
+            self.report('Loaded', matrix.count, start_time)
+
+            start_time = time.time()
+            pairs = find_similar_pairs(matrix.vectors, options['threshold'], block_size=options['block_size'])
+            new_states, pair_count = get_duplicate_states(matrix, pairs)
+            duration = self.report('Compared', matrix.count, start_time, faiss=FAISS_AVAILABLE)
+            comparisons = matrix.count * (matrix.count - 1) / 2
+            self.stdout.write(f'{pair_count} similar pairs, {comparisons / max(duration, 0.001):.3g} comparisons/s')
+            # closes the memory-mapped file before the directory is removed
+            del matrix
+
+        duplicates = sum(state == DuplicateState.DUPLICATE for state in new_states.values())
+        self.stdout.write(
+            f'{len(new_states)} images to update: {duplicates} duplicates, {len(new_states) - duplicates} originals'
+        )
+        if options['dry_run'] or not new_states:
+            return
+        if input(self.style.WARNING(f'Update {len(new_states)} images? (y/n): ')).lower() != 'y':
+            self.stdout.write(self.style.ERROR('Aborted!'))
+            return
+
+        start_time = time.time()
+        failed = 0
+        for image_ids in chunks(list(new_states.keys()), UPDATE_CHUNK_SIZE):
+            results = OSImage.merge_fields(
+                {image_id: {'duplicate_state': new_states[image_id].value} for image_id in image_ids}
+            )
+            failed += sum(result not in ['updated', 'noop'] for result in results.values())
+        self.report('Updated', len(new_states), start_time)
+        if failed:
+            self.stdout.write(self.style.ERROR(f'{failed} images could not be updated'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Done!'))
+
+    def report(self, phase, count, start_time, faiss=None):
+        """Print the duration of a phase and its throughput per million vectors, return the duration"""
+        duration = time.time() - start_time
+        details = '' if faiss is None else (' with faiss' if faiss else ' with NumPy')
+        self.stdout.write(
+            f'{phase} {count} vectors{details} in {duration:.1f}s, '
+            f'{duration / max(count, 1) * 1_000_000:.1f}s per million vectors'
+        )
+        return duration
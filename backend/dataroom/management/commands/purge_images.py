@@ -0,0 +1,96 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from backend.dataroom.models.os_image import OSImage
+from backend.task_runner.tasks.delete_images import get_images_marked_as_duplicates, get_images_marked_for_deletion
+
+
+def format_bytes(size):
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024 or unit == 'TB':
+            return f'{size:.1f} {unit}'
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Permanently delete the duplicates or the images marked for deletion, and their files, in batches. Use '
+        '--dry-run to report the number of images and the storage that would be reclaimed.'
+    )
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--duplicates', action='store_true', help='Delete the images marked as duplicates')
+        group.add_argument('--marked-for-deletion', action='store_true', help='Delete the images marked for deletion')
+        parser.add_argument(
+            '--source',
+            type=str,
+            action='append',
+            required=False,
+            help='A source of the duplicates, can be repeated. DUPLICATE_DELETE_TASK_INCLUDED_SOURCES by default',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, required=False, default=1000, help='The number of images deleted at once'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+
+    def handle(self, *args, **options):
+        if options['duplicates']:
+            name = 'duplicates'
+            manager = OSImage.objects
+
+            def get_page(**kwargs):
+                return get_images_marked_as_duplicates(sources=options['source'], **kwargs)
+
+        else:
+            name = 'images marked for deletion'
+            manager = OSImage.all_objects
+            get_page = get_images_marked_for_deletion
+
+        if not options['dry_run']:
+            message = f'Permanently delete all the {name} and their files? (y/n): '
+            if input(self.style.WARNING(message)).lower() != 'y':
+                self.stdout.write(self.style.ERROR('Aborted!'))
+                return
+
+        totals = {'images': 0, 'files': 0, 'bytes': 0, 'failed': 0}
+        start_time = time.time()
+        page = get_page(size=options['batch_size'])
+        while True:
+            if page.result:
+                images = manager.get_multiple(
+                    page.result, fields=['id', 'image', 'thumbnail', 'latents', 'is_deleted'], number=len(page.result)
+                )
+                if options['marked_for_deletion']:
+                    images = [image for image in images if image.is_deleted]
+                result = OSImage.delete_permanently_multiple(images, dry_run=options['dry_run'])
+                totals['images'] += result['images']
+                totals['files'] += result['files']
+                totals['bytes'] += result.get('bytes', 0)
+                totals['failed'] += len(result['failed'])
+            self.stdout.write(
+                f"{totals['images']} images, {totals['files']} files ({time.time() - start_time:.0f}s)", ending='\r'
+            )
+            if not page.next_kwargs:
+                break
+            page = get_page(size=options['batch_size'], **page.next_kwargs)
+        self.stdout.write('')
+
+        duration = time.time() - start_time
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{totals['images']} {name} to delete with {totals['files']} files, "
+                    f"{format_bytes(totals['bytes'])} would be reclaimed"
+                )
+            )
+            return
+        self.stdout.write(
+            f"Deleted {totals['images']} {name} and {totals['files']} files in {duration:.1f}s, "
+            f"{totals['images'] / max(duration, 0.001):.1f} images/s"
+        )
+        if totals['failed']:
+            self.stdout.write(self.style.ERROR(f"{totals['failed']} images could not be deleted, run it again"))
+        else:
+            self.stdout.write(self.style.SUCCESS('Done!'))
@@ -45,4 +45,9 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(e.info))
                 raise e
 
+        # stored scripts are cluster wide
+        for script in OSImage.STORED_SCRIPTS:
+            script.put()
+            self.stdout.write(f'Stored script "{script.script_id}".')
+
         self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataroom', '0006_ingestionticket_ingestionitem'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stats',
+            name='stats_type',
+            field=models.CharField(
+                choices=[
+                    ('total_images', 'Total images'),
+                    ('total_datasets', 'Total datasets'),
+                    ('image_sources', 'Image sources'),
+                    ('image_aspect_ratio_fractions', 'Image aspect ratio fractions'),
+                    ('images_missing_thumbnail', 'Images missing thumbnail'),
+                    ('images_missing_coca_embedding', 'Images missing COCA embedding'),
+                    ('images_missing_tags', 'Images missing tags'),
+                    ('images_missing_duplicate_state', 'Images missing duplicate state'),
+                    ('images_marked_as_duplicates', 'Images marked as duplicates'),
+                    ('images_marked_for_deletion', 'Images marked for deletion'),
+                    ('images_with_disabled_latents', 'Images with disabled latents'),
+                    ('task_items_processed', 'Task items processed'),
+                    ('task_failures', 'Task failures'),
+                    ('task_retries', 'Task retries'),
+                    ('task_duration_p50', 'Task duration p50 (ms)'),
+                    ('task_duration_p95', 'Task duration p95 (ms)'),
+                    ('task_duration_p99', 'Task duration p99 (ms)'),
+                    ('task_feed_time', 'Task feed time (ms)'),
+                    ('task_queue_depth', 'Task queue depth'),
+                ],
+                max_length=40,
+            ),
+        ),
+    ]
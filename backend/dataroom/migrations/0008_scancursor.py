@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-19 14:00
+
+import uuid
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataroom', '0007_alter_stats_stats_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanCursor',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=100)),
+                ('partition', models.PositiveIntegerField(default=0)),
+                ('partitions', models.PositiveIntegerField(default=1)),
+                ('pit_id', models.TextField(blank=True, default='')),
+                ('search_after', models.JSONField(blank=True, null=True)),
+                ('items_scanned', models.BigIntegerField(default=0)),
+                ('pass_count', models.PositiveIntegerField(default=0)),
+                ('date_pass_started', models.DateTimeField(blank=True, null=True)),
+                ('date_completed', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('name', 'partition'),
+                'constraints': [
+                    models.UniqueConstraint(fields=('name', 'partition'), name='scan_cursor_partition_unique')
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dataroom', '0008_scancursor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestionitem',
+            name='image_hash',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ingestionitem',
+            index=models.Index(fields=['image_id', 'status'], name='ingestion_item_image_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingestionitem',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('operation', 'create'), ('status__in', ['pending', 'processing'])),
+                fields=('image_id',),
+                name='ingestion_item_queued_create_id_unique',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='ingestionitem',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('operation', 'create'), ('status__in', ['pending', 'processing'])),
+                fields=('image_hash',),
+                name='ingestion_item_queued_create_hash_unique',
+            ),
+        ),
+    ]
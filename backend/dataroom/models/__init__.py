@@ -1,5 +1,7 @@
 from backend.dataroom.models.attributes import *  # noqa: F403
 from backend.dataroom.models.dataset import *  # noqa: F403
+from backend.dataroom.models.ingestion import *  # noqa: F403
 from backend.dataroom.models.latents import *  # noqa: F403
+from backend.dataroom.models.scan_cursor import *  # noqa: F403
 from backend.dataroom.models.stats import *  # noqa: F403
 from backend.dataroom.models.tag import *  # noqa: F403
@@ -1,10 +1,10 @@
+from django.conf import settings
 from django.db import models, transaction
 
 from backend.common.base_model import BaseModel
 from backend.dataroom.models.os_image import OSImage
-from backend.dataroom.opensearch import OSBulkIndex
 
-DATASET_UPDATE_IMAGES_LIMIT = 1000
+DATASET_UPDATE_IMAGES_LIMIT = 10_000
 DATASET_PREVIEW_IMAGES_COUNT = 12
 
 
@@ -86,52 +86,16 @@ class Dataset(BaseModel):
         self.is_frozen = False
         self.save()
 
-    def add_images(self, image_ids) -> int:
+    def add_images(self, image_ids, refresh=settings.OPENSEARCH_BULK_REFRESH) -> int:
         if self.is_frozen:
             raise ValueError('Dataset is frozen')
 
-        num_updated = 0
-        result = (
-            OSImage.objects.search(fields=['id', 'datasets'])
-            .filter(
-                'terms',
-                id=image_ids,
-            )
-            .extra(size=DATASET_UPDATE_IMAGES_LIMIT)
-            .execute()
-        )
-        images = OSImage.list_from_hits(result.hits)
-
-        with OSBulkIndex() as os_bulk:
-            for image in images:
-                if self.slug_version not in image.datasets:
-                    image.datasets.add(self.slug_version)
-                    num_updated += 1
-                    image.save(fields=['datasets'], bulk_index=os_bulk)
-
-        return num_updated
+        results = OSImage.update_array_field(image_ids, field='datasets', add=[self.slug_version], refresh=refresh)
+        return sum(1 for result in results.values() if result == 'updated')
 
-    def remove_images(self, image_ids) -> int:
+    def remove_images(self, image_ids, refresh=settings.OPENSEARCH_BULK_REFRESH) -> int:
         if self.is_frozen:
             raise ValueError('Dataset is frozen')
 
-        num_updated = 0
-        result = (
-            OSImage.objects.search(fields=['id', 'datasets'])
-            .filter(
-                'terms',
-                id=image_ids,
-            )
-            .extra(size=DATASET_UPDATE_IMAGES_LIMIT)
-            .execute()
-        )
-        images = OSImage.list_from_hits(result.hits)
-
-        with OSBulkIndex() as os_bulk:
-            for image in images:
-                if self.slug_version in image.datasets:
-                    image.datasets.remove(self.slug_version)
-                    num_updated += 1
-                image.save(fields=['datasets'], bulk_index=os_bulk)
-
-        return num_updated
+        results = OSImage.update_array_field(image_ids, field='datasets', remove=[self.slug_version], refresh=refresh)
+        return sum(1 for result in results.values() if result == 'updated')
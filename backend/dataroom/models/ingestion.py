@@ -0,0 +1,201 @@
+import datetime
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from backend.common.base_model import BaseModel
+from backend.dataroom.choices import IngestionOperation, IngestionStatus
+
+INGESTION_TICKET_FAILED_ITEMS_LIMIT = 100
+# items that are queued or being indexed, a queued create reserves its image ID and hash
+INGESTION_UNFINISHED_STATUSES = [IngestionStatus.PENDING, IngestionStatus.PROCESSING]
+
+
+class IngestionTicketManager(models.Manager):
+    def enqueue(self, operation, payloads, author=None):
+        """
+        Queue writes to be indexed asynchronously by the task runner, in a single transaction. Queuing a create of an
+        image ID or hash that is already queued raises an IntegrityError, use IngestionItem.objects.find_queued_creates
+        to check them first.
+
+        @param operation: IngestionOperation of all the writes
+        @param payloads: list of (image_id, payload) tuples, the payloads must be JSON-serializable
+        @param author: user who sent the writes
+        @return: the IngestionTicket to follow the progress of the writes
+        """
+        with transaction.atomic():
+            ticket = self.create(
+                operation=operation,
+                author=author,
+                item_count=len(payloads),
+                status=IngestionStatus.PENDING if payloads else IngestionStatus.DONE,
+                date_completed=None if payloads else timezone.now(),
+            )
+            IngestionItem.objects.bulk_create(
+                [
+                    IngestionItem(
+                        ticket=ticket,
+                        operation=operation,
+                        image_id=image_id,
+                        image_hash=payload['doc']['image_hash'] if operation == IngestionOperation.CREATE else None,
+                        payload=payload,
+                    )
+                    for image_id, payload in payloads
+                ]
+            )
+        return ticket
+
+
+class IngestionTicket(BaseModel):
+    """
+    A batch of image writes accepted by the API and indexed asynchronously by the task runner.
+    """
+
+    operation = models.CharField(max_length=20, choices=IngestionOperation.choices)
+    author = models.ForeignKey('users.User', on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=IngestionStatus.choices, default=IngestionStatus.PENDING)
+    item_count = models.PositiveIntegerField(default=0)
+    date_completed = models.DateTimeField(null=True, blank=True)
+
+    objects = IngestionTicketManager()
+
+    class Meta:
+        ordering = ('-date_created',)
+
+    def __str__(self):
+        return f'{self.operation} {self.id}'
+
+    @property
+    def is_completed(self):
+        return self.status in [IngestionStatus.DONE, IngestionStatus.FAILED]
+
+    def get_status_counts(self):
+        counts = {status: 0 for status in IngestionStatus.values}
+        for row in self.items.values('status').annotate(count=Count('id')):
+            counts[row['status']] = row['count']
+        return counts
+
+    def get_failed_items(self, limit=INGESTION_TICKET_FAILED_ITEMS_LIMIT):
+        return list(self.items.filter(status=IngestionStatus.FAILED).values('image_id', 'error')[:limit])
+
+    def update_status(self):
+        """Update the status from the status of the items, the ticket fails only if all its items failed"""
+        counts = self.get_status_counts()
+        if counts[IngestionStatus.PENDING] or counts[IngestionStatus.PROCESSING]:
+            started = counts[IngestionStatus.DONE] or counts[IngestionStatus.FAILED]
+            self.status = IngestionStatus.PROCESSING if started else IngestionStatus.PENDING
+        else:
+            failed = counts[IngestionStatus.FAILED] and not counts[IngestionStatus.DONE]
+            self.status = IngestionStatus.FAILED if failed else IngestionStatus.DONE
+            self.date_completed = self.date_completed or timezone.now()
+        self.save(update_fields=['status', 'date_completed', 'date_updated'])
+        return counts
+
+
+class IngestionItemManager(models.Manager):
+    def claim(self, limit):
+        """
+        Mark up to limit pending items as processing, oldest first. Items locked by another consumer are skipped, so
+        concurrent consumers never claim the same items. An item is not claimed while an older write of the same
+        image is queued or being indexed by another consumer, so the writes of each image are indexed in order.
+
+        @return: list of (item ID, image ID) of the claimed items, oldest first
+        """
+        with transaction.atomic():
+            candidates = list(
+                self.filter(status=IngestionStatus.PENDING)
+                .order_by('date_created')
+                .select_for_update(skip_locked=True)
+                .values_list('id', 'image_id', 'date_created')[:limit]
+            )
+            # oldest unfinished write of each image that is left to another consumer or a later claim
+            blocked = {}
+            others = (
+                self.filter(image_id__in={image_id for _, image_id, _ in candidates})
+                .filter(status__in=INGESTION_UNFINISHED_STATUSES)
+                .exclude(id__in=[item_id for item_id, _, _ in candidates])
+                .values_list('image_id', 'date_created')
+            )
+            for image_id, date_created in others:
+                blocked[image_id] = min(blocked.get(image_id, date_created), date_created)
+            claimed = [
+                (item_id, image_id)
+                for item_id, image_id, date_created in candidates
+                if image_id not in blocked or date_created < blocked[image_id]
+            ]
+            if claimed:
+                self.filter(id__in=[item_id for item_id, _ in claimed]).update(
+                    status=IngestionStatus.PROCESSING, date_updated=timezone.now()
+                )
+        return claimed
+
+    def find_queued_creates(self, image_ids=None, image_hashes=None):
+        """
+        Find the creates that are queued or being indexed with any of the image IDs or hashes, these images don't
+        exist in OpenSearch yet.
+
+        @return: list of (image ID, image hash) of the queued creates
+        """
+        return list(
+            self.filter(operation=IngestionOperation.CREATE, status__in=INGESTION_UNFINISHED_STATUSES)
+            .filter(Q(image_id__in=list(image_ids or [])) | Q(image_hash__in=list(image_hashes or [])))
+            .values_list('image_id', 'image_hash')
+        )
+
+    def release_stale(self, timeout=None):
+        """
+        Queue again the items that were claimed more than timeout seconds ago, e.g. by a worker that died.
+
+        @return: number of released items
+        """
+        timeout = settings.INGESTION_CLAIM_TIMEOUT if timeout is None else timeout
+        now = timezone.now()
+        return self.filter(
+            status=IngestionStatus.PROCESSING,
+            date_updated__lt=now - datetime.timedelta(seconds=timeout),
+        ).update(status=IngestionStatus.PENDING, date_updated=now)
+
+
+class IngestionItem(BaseModel):
+    """
+    A single queued image write of an IngestionTicket.
+
+    The payload of a create is the OpenSearch document of the image (the original file is already in storage), the
+    payload of an update is the validated update data.
+    """
+
+    ticket = models.ForeignKey(IngestionTicket, on_delete=models.CASCADE, related_name='items')
+    operation = models.CharField(max_length=20, choices=IngestionOperation.choices)
+    image_id = models.CharField(max_length=settings.IMAGE_ID_MAX_LENGTH)
+    # hash of the image of a create, reserved while the create is queued
+    image_hash = models.TextField(null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=IngestionStatus.choices, default=IngestionStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+
+    objects = IngestionItemManager()
+
+    class Meta:
+        ordering = ('date_created',)
+        indexes = [
+            models.Index(fields=['status', 'date_created'], name='ingestion_item_status_idx'),
+            models.Index(fields=['image_id', 'status'], name='ingestion_item_image_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['image_id'],
+                condition=Q(operation=IngestionOperation.CREATE, status__in=INGESTION_UNFINISHED_STATUSES),
+                name='ingestion_item_queued_create_id_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['image_hash'],
+                condition=Q(operation=IngestionOperation.CREATE, status__in=INGESTION_UNFINISHED_STATUSES),
+                name='ingestion_item_queued_create_hash_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.operation} {self.image_id}'
@@ -1,8 +1,10 @@
+import contextlib
 import datetime
 import hashlib
 import logging
 import re
 import zoneinfo
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from fractions import Fraction
 from io import BytesIO
 
@@ -13,20 +15,35 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.core.files import File
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
-from opensearchpy import AttrDict, NotFoundError, Search
-from opensearchpy.exceptions import ConflictError
+from opensearchpy import AttrDict, MultiSearch, NotFoundError, Search
+from opensearchpy.exceptions import ConflictError, TransportError
+from opensearchpy.helpers import BulkIndexError
 from opensearchpy.helpers.response import Hit
-from PIL import Image
+from PIL import Image, UnidentifiedImageError
 
+from backend.dataroom.audit_log import audit_log, current_author
 from backend.dataroom.choices import DuplicateState, OSFieldType
-from backend.dataroom.exceptions import LatentTypeValidationError, MissingEmbeddingError, SaveConflictError
+from backend.dataroom.exceptions import (
+    DirectUploadError,
+    LatentTypeValidationError,
+    MissingEmbeddingError,
+    SaveConflictError,
+)
 from backend.dataroom.models.attributes import AttributesFieldNotFoundError, AttributesSchema
 from backend.dataroom.models.latents import LatentType
 from backend.dataroom.models.tag import Tag
-from backend.dataroom.opensearch import OS, OSBulkIndex
+from backend.dataroom.opensearch import OS, OSBulkIndex, OSStoredScript, get_refresh_param, refresh_after_write
+from backend.dataroom.utils.bulk_delete import delete_files, get_files_size
+from backend.dataroom.utils.direct_upload import move_files, verify_uploaded_file
 from backend.dataroom.utils.disable_storage_custom_domain import disable_storage_custom_domain
-from backend.dataroom.utils.fetch_embedding import fetch_coca_embedding, fetch_coca_embedding_async
+from backend.dataroom.utils.existence_filter import image_existence_filter
+from backend.dataroom.utils.fetch_embedding import (
+    fetch_coca_embedding,
+    fetch_coca_embedding_async,
+    fetch_coca_embeddings,
+)
 from backend.dataroom.utils.get_vector_for_image_file import get_vector_for_image_file
+from backend.dataroom.utils.union_find import UnionFind
 from backend.dataroom.utils.vectors import normalize_similarity, normalize_vector
 
 logger = logging.getLogger('dataroom')
@@ -134,6 +151,7 @@ class OSLatents:
                         file=hit[file_key],
                         is_mask=latent_types_map[latent_type].is_mask,
                     )
+                    latents[latent_type].latent_type_instance = latent_types_map[latent_type]
         return cls(latents=latents)
 
     @classmethod
@@ -178,9 +196,11 @@ class OSLatents:
         return latents_dict
 
     def validate_latent_types(self):
-        latent_types = self.latents.keys()
-        latent_type_instances = LatentType.objects.filter(name__in=latent_types)
-        for latent in self.latents.values():
+        latents = [latent for latent in self.latents.values() if not latent.is_validated]
+        if not latents:
+            return
+        latent_type_instances = LatentType.objects.filter(name__in=[latent.latent_type for latent in latents])
+        for latent in latents:
             latent.validate_latent_type(prefetched_latent_types=latent_type_instances)
 
 
@@ -499,8 +519,11 @@ class OSImageManager:
         # do not include _source or only some fields
         if not include_source:
             s = s.source(False)
-        elif fields:
-            s = s.source(includes=self._field_includes(fields))
+        else:
+            # the images read can be saved with conditional writes
+            s = s.extra(seq_no_primary_term=True)
+            if fields:
+                s = s.source(includes=self._field_includes(fields))
 
         # pagination
         if search_after:
@@ -541,6 +564,64 @@ class OSImageManager:
         result = self.search(fields=fields).filter("terms", image_hash=image_hashes).extra(size=number).execute()
         return OSImage.list_from_hits(result.hits.hits)
 
+    def find_existing(self, ids=None, image_hashes=None, original_urls=None, fields=None):
+        """
+        Find the images that already exist by ID, hash or original URL. The IDs are looked up in real time with a
+        multi-get, so an image that was just created is found before the next refresh. The hashes and original URLs
+        are searched with a single multi-search request, they are only found once the images are refreshed. When the
+        image existence filter is enabled and it knows that none of the hashes exist, the hashes are not searched.
+
+        @param ids: list of image IDs
+        @param image_hashes: list of image hashes
+        @param original_urls: list of original URLs
+        @param fields: fields to include in the returned images
+        @return: dict with the keys "id", "image_hash" and "original_url", each with the list of matching images
+        """
+        ids = list(ids or [])
+        lookups = {
+            'image_hash': list(image_hashes or []),
+            'original_url': list(original_urls or []),
+        }
+        lookups = {field: values for field, values in lookups.items() if values}
+        existing = {'id': [], 'image_hash': [], 'original_url': []}
+        if 'image_hash' in lookups and not image_existence_filter.might_exist(image_hashes=lookups['image_hash']):
+            # best effort like the search, images created by other processes since the last refresh are missed
+            del lookups['image_hash']
+        if fields:
+            fields = list(set(fields) | set(lookups.keys()))
+
+        latent_types_map = OSImage.get_latent_types_map()
+        if ids:
+            response = OS.client.mget(
+                index=OSImage.INDEX,
+                body={'ids': ids},
+                _source_includes=self._field_includes(fields),
+                timeout=self.default_timeout,
+            )
+            for doc in response['docs']:
+                if doc.get('found') and (self.include_deleted or not doc['_source'].get('is_deleted')):
+                    existing['id'].append(OSImage.from_hit(doc, latent_types_map=latent_types_map))
+        if not lookups:
+            return existing
+
+        # a value can match several images (e.g. hash collisions), the matches are paged on the unique ID
+        page_size = max(max(len(values) for values in lookups.values()), 100)
+
+        def get_search(field, search_after=None):
+            search = self.search(fields=fields, search_after=search_after).filter('terms', **{field: lookups[field]})
+            return search.extra(size=page_size)
+
+        multi_search = MultiSearch(using=OS.client, index=OSImage.INDEX)
+        for field in lookups:
+            multi_search = multi_search.add(get_search(field))
+        for field, response in zip(lookups.keys(), multi_search.execute(), strict=True):
+            hits = list(response.hits)
+            while len(response.hits) == page_size:
+                response = get_search(field, search_after=list(response.hits[-1].meta.sort)).execute()
+                hits += response.hits
+            existing[field] = [OSImage.from_hit(hit, latent_types_map=latent_types_map) for hit in hits]
+        return existing
+
     def get(self, id, fields=None):  # noqa: A002
         try:
             hit = OS.client.get(
@@ -564,7 +645,7 @@ class OSImageManager:
         response = self.search(fields=fields).extra(size=number).execute()
         return OSImage.list_from_hits(response.hits)
 
-    def find_similar(self, vector, number=10, exclude_id=None, fields=None, body=None):
+    def _get_similar_body(self, vector, number=10, exclude_id=None, body=None):
         if body:
             if "size" not in body:
                 body["size"] = number
@@ -596,15 +677,50 @@ class OSImageManager:
             if "filter" not in body["query"]["bool"]:
                 body["query"]["bool"]["filter"] = []
             body["query"]["bool"]["filter"].extend(self._exclude_deleted_query["bool"]["filter"])
+        return body
 
+    def find_similar(self, vector, number=10, exclude_id=None, fields=None, body=None):
         response = OS.client.search(
             index=OSImage.INDEX,
-            body=body,
+            body=self._get_similar_body(vector, number=number, exclude_id=exclude_id, body=body),
             _source_includes=self._field_includes(fields),
             timeout=self.default_timeout,
         )
         return OSImage.list_from_hits(response['hits']['hits'])
 
+    def find_similar_multiple(self, vectors, number=10, exclude_ids=None, fields=None):
+        """
+        Find the similar images of multiple vectors with one multi search request.
+
+        @param vectors: list of vectors
+        @param number: number of similar images per vector
+        @param exclude_ids: list of IDs to exclude from the results of each vector, e.g. the image of the vector
+        @param fields: fields of the similar images
+        @return: list of lists of similar OSImages, in the order of the vectors
+        """
+        if not vectors:
+            return []
+        if exclude_ids is None:
+            exclude_ids = [None] * len(vectors)
+
+        source_includes = self._field_includes(fields)
+        searches = []
+        for vector, exclude_id in zip(vectors, exclude_ids, strict=True):
+            body = self._get_similar_body(vector, number=number, exclude_id=exclude_id)
+            body['timeout'] = f'{self.default_timeout}s'
+            if source_includes:
+                body['_source'] = {'includes': source_includes}
+            searches.extend([{}, body])
+        response = OS.client.msearch(index=OSImage.INDEX, body=searches)
+
+        latent_types_map = OSImage.get_latent_types_map()
+        results = []
+        for item in response['responses']:
+            if 'error' in item:
+                raise TransportError('N/A', item['error']['type'], item['error'])
+            results.append([OSImage.from_hit(hit, latent_types_map=latent_types_map) for hit in item['hits']['hits']])
+        return results
+
     def find_similar_to_file(self, image_file, number=10, exclude_id=None, fields=None, body=None):
         vector = get_vector_for_image_file(image_file)
         if not vector:
@@ -649,13 +765,105 @@ class OSImageManager:
 
 
 class OSImageMeta:
-    def __init__(self, score: float, sort: list):
+    def __init__(self, score: float, sort: list, seq_no: int | None = None, primary_term: int | None = None):
         self.score = score
         self.sort = sort
+        # version of the document when it was read, used for conditional writes
+        self.seq_no = seq_no
+        self.primary_term = primary_term
+
+
+# Stored scripts for partial updates without reading the documents first. Deleted images are never changed and
+# the update is a noop (and date_updated is kept) when nothing changes.
+ARRAY_ADD_SCRIPT = OSStoredScript(
+    'dataroom-array-add-v1',
+    """
+    if (ctx._source.is_deleted == true) {
+      ctx.op = 'none';
+    } else {
+      def values = ctx._source[params.field];
+      if (values == null) {
+        values = new ArrayList();
+        ctx._source[params.field] = values;
+      }
+      boolean changed = false;
+      for (def value : params.values) {
+        if (!values.contains(value)) {
+          values.add(value);
+          changed = true;
+        }
+      }
+      if (changed) {
+        if (params.sort) {
+          Collections.sort(values);
+        }
+        ctx._source.date_updated = params.date_updated;
+      } else {
+        ctx.op = 'none';
+      }
+    }
+    """,
+)
+ARRAY_REMOVE_SCRIPT = OSStoredScript(
+    'dataroom-array-remove-v1',
+    """
+    def removed = params.values;
+    if (ctx._source.is_deleted != true && ctx._source[params.field] != null
+        && ctx._source[params.field].removeIf(value -> removed.contains(value))) {
+      ctx._source.date_updated = params.date_updated;
+    } else {
+      ctx.op = 'none';
+    }
+    """,
+)
+MERGE_FIELDS_SCRIPT = OSStoredScript(
+    'dataroom-merge-fields-v1',
+    """
+    boolean changed = false;
+    if (ctx._source.is_deleted != true) {
+      for (def entry : params.fields.entrySet()) {
+        if (!ctx._source.containsKey(entry.getKey()) || ctx._source[entry.getKey()] != entry.getValue()) {
+          ctx._source[entry.getKey()] = entry.getValue();
+          changed = true;
+        }
+      }
+    }
+    if (changed) {
+      ctx._source.date_updated = params.date_updated;
+    } else {
+      ctx.op = 'none';
+    }
+    """,
+)
+
+
+# unlike MERGE_FIELDS_SCRIPT, also applies to images marked for deletion
+CLEAR_FIELDS_SCRIPT = OSStoredScript(
+    'dataroom-clear-fields-v1',
+    """
+    boolean changed = false;
+    for (def field : params.fields) {
+      if (ctx._source[field] != null) {
+        ctx._source[field] = null;
+        changed = true;
+      }
+    }
+    if (changed) {
+      ctx._source.date_updated = params.date_updated;
+    } else {
+      ctx.op = 'none';
+    }
+    """,
+)
 
 
 class OSImage:
     INDEX = settings.OPENSEARCH_IMAGES_INDEX_NAME
+    STORED_SCRIPTS = [ARRAY_ADD_SCRIPT, ARRAY_REMOVE_SCRIPT, MERGE_FIELDS_SCRIPT, CLEAR_FIELDS_SCRIPT]
+    # array fields that can be updated with the stored scripts, and whether they are kept sorted
+    ARRAY_SCRIPT_FIELDS = {'tags': False, 'datasets': True}
+    # fields read to mark the duplicates of an image
+    DUPLICATE_FIELDS = ['id', 'duplicate_state', 'coca_embedding', 'width', 'height']
     INDEX_SETTINGS = {
         "settings": {
             "index": {
@@ -1053,11 +1261,21 @@ class OSImage:
         """
         if isinstance(hit, Hit):
             hit_id = hit.meta.id
-            hit_meta = OSImageMeta(score=hit.meta.score, sort=hit.meta.sort)
+            hit_meta = OSImageMeta(
+                score=hit.meta.score,
+                sort=hit.meta.sort,
+                seq_no=getattr(hit.meta, 'seq_no', None),
+                primary_term=getattr(hit.meta, 'primary_term', None),
+            )
             doc = hit.to_dict()
         else:
             hit_id = hit['_id']
-            hit_meta = OSImageMeta(score=hit.get('_score'), sort=hit.get('sort'))
+            hit_meta = OSImageMeta(
+                score=hit.get('_score'),
+                sort=hit.get('sort'),
+                seq_no=hit.get('_seq_no'),
+                primary_term=hit.get('_primary_term'),
+            )
             doc = hit['_source']
             if isinstance(doc, AttrDict):
                 doc = doc.to_dict()
@@ -1207,7 +1425,7 @@ class OSImage:
             raise ValueError('OSImage.datasets must be an OSImageDatasets instance')
 
     @tracer.wrap()
-    def create(self, bulk_index: OSBulkIndex = None, refresh=settings.OPENSEARCH_DEFAULT_REFRESH):
+    def create(self, bulk_index: OSBulkIndex = None, refresh=settings.OPENSEARCH_CREATE_REFRESH):
         date_now = datetime.datetime.now(tz=zoneinfo.ZoneInfo('UTC')).isoformat()
 
         if not self._image_file and not self.image:
@@ -1215,20 +1433,7 @@ class OSImage:
 
         if not self.image:
             # we are creating a new image, save it to storage
-            assert self._image_file
-            storage_path = self.get_image_storage_path(image_id=self.id, filename=self._image_file.name)
-            self.image = default_storage.save(storage_path, self._image_file)
-            # calculate hash
-            if not self.image_hash:
-                self.image_hash = self.get_image_hash(self._image_file)
-            # get image sizes
-            sizes = self.get_image_sizes(self._image_file)
-            self.width = sizes['width']
-            self.height = sizes['height']
-            self.short_edge = sizes['short_edge']
-            self.pixel_count = sizes['pixel_count']
-            self.aspect_ratio = sizes['aspect_ratio']
-            self.aspect_ratio_fraction = sizes['aspect_ratio_fraction']
+            self.upload_image_file()
 
         # update dates
         if not self.date_created:
@@ -1239,40 +1444,289 @@ class OSImage:
         self._validate_class()
 
         # save to OpenSearch
+        # create-only, an image with the same ID is never overwritten: SaveConflictError is raised (or the result of
+        # the ID in bulk_index.results is "conflict")
+        doc = self.to_doc()
         if bulk_index:
-            bulk_index.index(
+            bulk_index.create(
                 index=self.INDEX,
                 doc_id=self.id,
-                body=self.to_doc(),
+                body=doc,
             )
         else:
-            OS.client.index(
-                index=self.INDEX,
-                id=self.id,
-                body=self.to_doc(),
-                refresh=refresh,
-                timeout=self.objects.default_timeout,
-            )
+            try:
+                response = OS.client.create(
+                    index=self.INDEX,
+                    id=self.id,
+                    body=doc,
+                    refresh=get_refresh_param(refresh),
+                    timeout=self.objects.default_timeout,
+                )
+            except ConflictError as e:
+                raise SaveConflictError() from e
+            refresh_after_write(self.INDEX, refresh)
+            self._set_version(response)
 
         self._update_tag_objects()
+        image_existence_filter.add(self.id, self.image_hash)
+        if bulk_index:
+            author = self.author or current_author.get()
+            bulk_index.on_success(self.id, lambda: audit_log.log(self.id, 'create', changes=doc, author=author))
+        else:
+            audit_log.log(self.id, 'create', changes=doc, author=self.author)
 
         return self
 
+    @tracer.wrap()
+    def upload_image_file(self):
+        """
+        Save the original image file to storage and calculate its hash and sizes.
+        """
+        assert self._image_file
+        storage_path = self.get_image_storage_path(image_id=self.id, filename=self._image_file.name)
+        self.image = default_storage.save(storage_path, self._image_file)
+        # calculate hash
+        if not self.image_hash:
+            self.image_hash = self.get_image_hash(self._image_file)
+        # get image sizes
+        self.set_image_sizes(self._image_file)
+
+    def set_image_sizes(self, image_file):
+        sizes = self.get_image_sizes(image_file)
+        self.width = sizes['width']
+        self.height = sizes['height']
+        self.short_edge = sizes['short_edge']
+        self.pixel_count = sizes['pixel_count']
+        self.aspect_ratio = sizes['aspect_ratio']
+        self.aspect_ratio_fraction = sizes['aspect_ratio_fraction']
+
+    @tracer.wrap()
+    def load_uploaded_image_file(self, size, checksum=None):
+        """
+        Verify the original file that was uploaded directly to storage at self.image and calculate its hash and
+        sizes.
+
+        @param size: size in bytes declared by the client
+        @param checksum: optional sha256 of the file declared by the client
+        """
+        assert self.image
+        image_file = verify_uploaded_file(self.image, size=size, checksum=checksum) or default_storage.open(self.image)
+        try:
+            self.image_hash = self.get_image_hash(image_file)
+            image_file.seek(0)
+            self.set_image_sizes(image_file)
+        except UnidentifiedImageError as e:
+            raise DirectUploadError(f'File "{self.image}" is not a valid image') from e
+        finally:
+            image_file.close()
+
+    @classmethod
+    @tracer.wrap()
+    def upload_image_files(cls, images, max_workers=settings.BULK_CREATE_STORAGE_MAX_WORKERS):
+        """
+        Upload the original files of multiple new images to storage concurrently.
+
+        @param images: list of OSImage instances that have an image_file but no image yet
+        @param max_workers: maximum number of concurrent uploads
+        @return: tuple of (uploaded images, dict of image ID to error message for the failed ones)
+        """
+        uploaded = []
+        failed = {}
+        if not images:
+            return uploaded, failed
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as executor:
+            futures = {executor.submit(image.upload_image_file): position for position, image in enumerate(images)}
+            for future in as_completed(futures):
+                position = futures[future]
+                image = images[position]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f'Error uploading image {image.id} to storage: {e}')
+                    failed[image.id] = str(e)
+                else:
+                    uploaded.append(position)
+
+        # keep the original order
+        return [images[position] for position in sorted(uploaded)], failed
+
+    @classmethod
+    @tracer.wrap()
+    def load_uploaded_files(cls, uploads, max_workers=settings.BULK_CREATE_STORAGE_MAX_WORKERS):
+        """
+        Verify the files of new images that were uploaded directly to storage, concurrently.
+
+        @param uploads: list of (OSImage, size, checksum, latent uploads) tuples, the images have their image path set
+            and the latent uploads are (OSLatent, size, checksum) tuples for latents with their file path set
+        @param max_workers: maximum number of concurrent verifications
+        @return: tuple of (verified images, dict of image ID to error message for the failed ones)
+        """
+        loaded = []
+        failed = {}
+        if not uploads:
+            return loaded, failed
+
+        def load(image, size, checksum, latent_uploads):
+            image.load_uploaded_image_file(size=size, checksum=checksum)
+            for latent, latent_size, latent_checksum in latent_uploads:
+                latent_file = verify_uploaded_file(latent.file, size=latent_size, checksum=latent_checksum)
+                if latent_file:
+                    latent_file.close()
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(uploads))) as executor:
+            futures = {executor.submit(load, *upload): position for position, upload in enumerate(uploads)}
+            for future in as_completed(futures):
+                position = futures[future]
+                image = uploads[position][0]
+                try:
+                    future.result()
+                except DirectUploadError as e:
+                    failed[image.id] = e.message
+                except Exception as e:
+                    logger.error(f'Error verifying the uploaded files of image {image.id}: {e}')
+                    failed[image.id] = str(e)
+                else:
+                    loaded.append(position)
+
+        # keep the original order
+        return [uploads[position][0] for position in sorted(loaded)], failed
+
+    @classmethod
+    @tracer.wrap()
+    def move_uploaded_files(cls, images):
+        """
+        Move the verified files of new images from their direct upload folders to the folders of the images. The
+        files of the images that fail are deleted.
+
+        @param images: list of OSImage instances with the paths of their uploaded files, updated to the new paths
+        @return: tuple of (moved images, dict of image ID to error message for the failed ones)
+        """
+        paths = {}  # upload path -> (image, new path)
+        for image in images:
+            paths[image.image] = (image, cls.get_image_storage_path(image_id=image.id, filename=image.image))
+            for latent in image.latents.latents.values():
+                latent_path = cls.get_latent_storage_path(
+                    image_id=image.id, latent_type=latent.latent_type, filename=latent.file
+                )
+                paths[latent.file] = (image, latent_path)
+
+        errors = move_files({path: new_path for path, (_, new_path) in paths.items()})
+        failed = {}
+        for path, error in errors.items():
+            failed.setdefault(paths[path][0].id, error)
+        # the files of a failed image that were moved are deleted with the files that were not
+        delete_files(
+            path if path in errors else new_path for path, (image, new_path) in paths.items() if image.id in failed
+        )
+
+        moved = []
+        for image in images:
+            if image.id in failed:
+                continue
+            image.image = paths[image.image][1]
+            for latent in image.latents.latents.values():
+                latent.file = paths[latent.file][1]
+            moved.append(image)
+        return moved, failed
+
+    @classmethod
+    @tracer.wrap()
+    def upload_latent_files(cls, image_latents, max_workers=settings.LATENT_STORAGE_MAX_WORKERS):
+        """
+        Upload the files of new latents to storage concurrently. Latents that are removed or already uploaded are
+        skipped.
+
+        @param image_latents: list of (OSImage, OSLatent) tuples
+        @param max_workers: maximum number of concurrent uploads
+        @return: dict of (image ID, latent type) to the exception for the failed uploads
+        """
+        image_latents = [
+            (image, latent)
+            for image, latent in image_latents
+            if not latent.is_removed and not latent.file and latent._file_object
+        ]
+        failed = {}
+        if not image_latents:
+            return failed
+
+        def upload(image, latent):
+            storage_path = cls.get_latent_storage_path(
+                image_id=image.id,
+                latent_type=latent.latent_type,
+                filename=latent.file_object.name,
+            )
+            latent.file = default_storage.save(storage_path, latent.file_object)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(image_latents))) as executor:
+            futures = {
+                executor.submit(upload, image, latent): (image.id, latent.latent_type)
+                for image, latent in image_latents
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    image_id, latent_type = futures[future]
+                    logger.error(f'Error uploading latent {latent_type} of image {image_id} to storage: {e}')
+                    failed[futures[future]] = e
+
+        return failed
+
     def _update_tag_objects(self):
-        # creates entries in the tags table
-        for tag_name in self.tags:
-            Tag.objects.get_or_create(name=tag_name)
+        # creates entries in the tags table, bulk writes create the tags of the whole request first
+        Tag.objects.ensure_exist(self.tags)
+
+    def set_update_fields(self, data, author=None):
+        """
+        Set the fields of a validated partial update (source, attributes, tags and coca_embedding), latents are set
+        separately because they need files.
+
+        @param data: validated data of an update, in its JSON form
+        @param author: email of the author of the update
+        @return: list of the updated fields, to be passed to save
+        """
+        updated_fields = []
+        for field, value in data.items():
+            if field == 'source':
+                self.source = value
+                updated_fields.append('source')
+            elif field == 'attributes':
+                self.attributes = OSAttributes.from_json(value)
+                updated_fields.append('attributes')
+            elif field == 'tags' and value is not None:
+                self.tags = value
+                updated_fields.append('tags')
+            elif field == 'coca_embedding':
+                self.coca_embedding_exists = value is not None
+                self.coca_embedding_vector = value
+                self.coca_embedding_author = author
+                updated_fields.append('coca_embedding')
+        return updated_fields
 
     @tracer.wrap()
-    def save(self, fields, latent_types=None, bulk_index=None, refresh=settings.OPENSEARCH_DEFAULT_REFRESH):
+    def save(
+        self,
+        fields,
+        latent_types=None,
+        bulk_index=None,
+        refresh=settings.OPENSEARCH_DEFAULT_REFRESH,
+        if_unchanged=True,
+    ):
         """
         Save the OSImage to OpenSearch.
 
+        Images that were read from OpenSearch are only saved if they were not changed by another process in the
+        meantime, otherwise SaveConflictError is raised (or the ID is added to bulk_index.conflicts). Use
+        update_with_retry to read and update again automatically.
+
         @param fields: List of fields to update
         @param latent_types: If "latents" is in fields, please also provide a list of latent types to update (all other
             latent types will not be updated)
         @param bulk_index: OSBulkIndex instance to use for bulk indexing
-        @param refresh: Should we refresh the index right after saving?
+        @param refresh: Refresh policy of the write, see get_refresh_policy. Ignored with bulk_index.
+        @param if_unchanged: Should the write be conditional on the version that was read? Disable it for partial
+            updates that don't depend on the values that were read.
         """
         # we don't allow saving without explicitly providing fields to prevent data loss
         if not fields:
@@ -1295,49 +1749,213 @@ class OSImage:
             if not latent_types:
                 raise ValueError('Latent types must be provided when saving latents')
             self.latents.validate_latent_types()
-            for latent in self.latents.latents.values():
-                if not latent.is_removed and latent.latent_type in latent_types:
-                    storage_path = self.get_latent_storage_path(
-                        image_id=self.id,
-                        latent_type=latent.latent_type,
-                        filename=latent.file_object.name,
-                    )
-                    latent.file = default_storage.save(storage_path, latent.file_object)
+            failed = self.upload_latent_files(
+                [(self, latent) for latent in self.latents.latents.values() if latent.latent_type in latent_types]
+            )
+            if failed:
+                raise next(iter(failed.values()))
 
         # save to OpenSearch
         doc = self.to_doc(fields=fields)
+        version = {}
+        if if_unchanged and self.meta and self.meta.seq_no is not None:
+            version = {'if_seq_no': self.meta.seq_no, 'if_primary_term': self.meta.primary_term}
         try:
             if bulk_index:
                 bulk_index.index(
                     index=self.INDEX,
                     doc_id=self.id,
                     body=doc,
+                    **version,
                 )
             else:
-                OS.client.update(
+                response = OS.client.update(
                     index=self.INDEX,
                     id=self.id,
                     body={"doc": doc},
-                    refresh=refresh,
+                    refresh=get_refresh_param(refresh),
                     timeout=self.objects.default_timeout,
+                    **version,
                 )
+                refresh_after_write(self.INDEX, refresh)
+                self._set_version(response)
         except ConflictError as e:
             if e.error == 'version_conflict_engine_exception':
                 raise SaveConflictError() from e
+            raise
 
         if 'tags' in fields:
             self._update_tag_objects()
+        if bulk_index:
+            # the author of the write, the callback runs when the bulk request is sent
+            author = current_author.get()
+            bulk_index.on_success(self.id, lambda: audit_log.log(self.id, 'update', changes=doc, author=author))
+        else:
+            audit_log.log(self.id, 'update', changes=doc)
 
         return self
 
+    def _set_version(self, response):
+        # the next save of this instance is conditional on the version that was just written
+        if response.get('_seq_no') is None:
+            return
+        if self.meta:
+            self.meta.seq_no = response['_seq_no']
+            self.meta.primary_term = response['_primary_term']
+        else:
+            self.meta = OSImageMeta(
+                score=None,
+                sort=None,
+                seq_no=response['_seq_no'],
+                primary_term=response['_primary_term'],
+            )
+
+    @classmethod
+    @tracer.wrap()
+    def update_with_retry(
+        cls,
+        image_id,
+        update,
+        fields=None,
+        latent_types=None,
+        refresh=settings.OPENSEARCH_DEFAULT_REFRESH,
+        max_retries=None,
+    ):
+        """
+        Read, update and save an image with a conditional write. When another process changed the image in the
+        meantime, it is read again and the update is applied again on top of the other changes. Only use it for
+        updates that can be applied in any order, e.g. adding tags or merging attributes.
+
+        @param image_id: ID of the image
+        @param update: function called with the image that was read, it changes the image and returns the list of
+            fields to save (nothing is saved when it's empty)
+        @param fields: fields to read, all fields by default
+        @param latent_types: latent types to save when "latents" is saved
+        @param refresh: refresh policy of the write
+        @param max_retries: number of times the image is read again after a conflict
+        @return: the saved image
+        """
+        if max_retries is None:
+            max_retries = settings.OPENSEARCH_CONFLICT_MAX_RETRIES
+        attempt = 0
+        while True:
+            image = cls.objects.get(image_id, fields=fields)
+            updated_fields = update(image)
+            if not updated_fields:
+                return image
+            try:
+                return image.save(fields=list(updated_fields), latent_types=latent_types, refresh=refresh)
+            except SaveConflictError:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                logger.info(f'Conflict while saving image {image_id}, retrying ({attempt}/{max_retries})')
+
+    @classmethod
     @tracer.wrap()
-    def add_latent(self, latent: OSLatent):
+    def update_array_field(cls, image_ids, field, add=None, remove=None, refresh=settings.OPENSEARCH_BULK_REFRESH):
+        """
+        Add values to or remove values from an array field of many images with bulk scripted updates, without
+        reading the images first.
+
+        @param image_ids: list of image IDs
+        @param field: "tags" or "datasets"
+        @param add: values to add to the field
+        @param remove: values to remove from the field
+        @param refresh: refresh policy of the bulk requests
+        @return: dict of image ID to the result: "updated", "noop" (nothing changed or the image is deleted),
+            "not_found" or the error
+        """
+        if field not in cls.ARRAY_SCRIPT_FIELDS:
+            raise ValueError(f'Field "{field}" can not be updated with a script')
+        if bool(add) == bool(remove):
+            raise ValueError('Provide either values to add or values to remove')
+
+        date_updated = datetime.datetime.now(tz=zoneinfo.ZoneInfo('UTC')).isoformat()
+        script = ARRAY_ADD_SCRIPT if add else ARRAY_REMOVE_SCRIPT
+        params = {
+            'field': field,
+            'values': list(add or remove),
+            'sort': cls.ARRAY_SCRIPT_FIELDS[field],
+            'date_updated': date_updated,
+        }
+        with OSBulkIndex(refresh=refresh) as os_bulk:
+            for image_id in image_ids:
+                os_bulk.update_script(index=cls.INDEX, doc_id=image_id, script=script, params=params)
+        for image_id, result in os_bulk.results.items():
+            if result == 'updated':
+                audit_log.log(image_id, 'update', changes={field: {'add' if add else 'remove': params['values']}})
+        return os_bulk.results
+
+    @classmethod
+    @tracer.wrap()
+    def merge_fields(cls, docs, refresh=settings.OPENSEARCH_BULK_REFRESH, raise_on_error=True):
+        """
+        Set fields of many images with bulk scripted updates, without reading the images first. Other fields are
+        left untouched and missing images are not created.
+
+        @param docs: dict of image ID to a partial OpenSearch document, e.g. from OSAttributes.to_doc()
+        @param refresh: refresh policy of the bulk requests
+        @param raise_on_error: raise a BulkIndexError when an image fails, otherwise its error is in the results
+        @return: dict of image ID to the result: "updated", "noop" (nothing changed or the image is deleted),
+            "not_found" or the error
+        """
+        date_updated = datetime.datetime.now(tz=zoneinfo.ZoneInfo('UTC')).isoformat()
+        os_bulk = OSBulkIndex(refresh=refresh)
+        try:
+            with os_bulk:
+                for image_id, doc in docs.items():
+                    os_bulk.update_script(
+                        index=cls.INDEX,
+                        doc_id=image_id,
+                        script=MERGE_FIELDS_SCRIPT,
+                        params={'fields': doc, 'date_updated': date_updated},
+                    )
+        except BulkIndexError:
+            if raise_on_error:
+                raise
+        for image_id, result in os_bulk.results.items():
+            if result == 'updated':
+                audit_log.log(image_id, 'update', changes=docs[image_id])
+        return os_bulk.results
+
+    @classmethod
+    @tracer.wrap()
+    def start_update_by_query(cls, search, script, params, requests_per_second=None):
+        """
+        Start a background update_by_query task that runs a stored script on all images matching the search. The
+        task is sliced (one slice per shard) and throttled, use backend.dataroom.utils.opensearch_tasks to follow it.
+
+        @param search: Search with the filters, only its query is used
+        @param script: OSStoredScript to run on every image
+        @param params: script params, date_updated is added
+        @param requests_per_second: throttle of the task, in documents per second over all slices
+        @return: the OpenSearch task ID
+        """
+        params = {**params, 'date_updated': datetime.datetime.now(tz=zoneinfo.ZoneInfo('UTC')).isoformat()}
+        response = OS.client.update_by_query(
+            index=cls.INDEX,
+            body={
+                'query': search.to_dict().get('query', {'match_all': {}}),
+                'script': {'id': script.get_id(), 'params': params},
+            },
+            conflicts='proceed',
+            slices='auto',
+            scroll_size=settings.MUTATIONS_SCROLL_SIZE,
+            requests_per_second=requests_per_second or settings.MUTATIONS_REQUESTS_PER_SECOND,
+            refresh=True,
+            wait_for_completion=False,
+        )
+        return response['task']
+
+    @tracer.wrap()
+    def add_latent(self, latent: OSLatent, refresh=settings.OPENSEARCH_DEFAULT_REFRESH):
         if not isinstance(latent, OSLatent) or not latent._file_object or latent.file:
             raise ValueError('Invalid latent state')
 
-        # save the image
+        # save the image, only the fields of this latent type are written
         self.latents.latents[latent.latent_type] = latent
-        self.save(fields=['latents'], latent_types=[latent.latent_type])
+        self.save(fields=['latents'], latent_types=[latent.latent_type], refresh=refresh, if_unchanged=False)
 
     @tracer.wrap()
     def remove_latent(self, latent_type, refresh=settings.OPENSEARCH_DEFAULT_REFRESH):
@@ -1349,14 +1967,72 @@ class OSImage:
             default_storage.delete(latent.file)
 
         latent.mark_as_removed()
-        self.save(fields=['latents'], latent_types=[latent.latent_type], refresh=refresh)
+        self.save(fields=['latents'], latent_types=[latent.latent_type], refresh=refresh, if_unchanged=False)
 
+    @classmethod
     @tracer.wrap()
-    def update_thumbnail(self, pil_image=None):
+    def remove_latents_multiple(cls, images, latent_types, refresh=settings.OPENSEARCH_BULK_REFRESH, retries=3):
+        """
+        Remove latents of many images: their files are deleted in batches (see delete_files), then the latent file
+        fields are cleared with bulk scripted updates, without reading the images again. The latents of images whose
+        files could not be deleted are kept.
+
+        @param images: images with the latents field
+        @param latent_types: names of the latent types to remove
+        @param refresh: refresh policy of the bulk requests
+        @param retries: number of retries of the files that failed
+        @return: dict of image ID to the result: "updated", "noop", "not_found", the error, or "file_error" when a
+            file could not be deleted
+        """
+        image_fields = {}
+        image_files = {}
+        for image in images:
+            latents = [image.latents.latents[name] for name in latent_types if name in image.latents.latents]
+            if latents:
+                image_fields[image.id] = [latent.os_name_file for latent in latents]
+                image_files[image.id] = [latent.file for latent in latents if latent.file]
+
+        file_errors = delete_files([path for paths in image_files.values() for path in paths], retries=retries)
+        results = {}
+        for image_id, paths in image_files.items():
+            if any(path in file_errors for path in paths):
+                results[image_id] = 'file_error'
+                del image_fields[image_id]
+        for path, error in file_errors.items():
+            logger.error(f'Failed to delete latent file "{path}": {error}')
+
+        date_updated = datetime.datetime.now(tz=zoneinfo.ZoneInfo('UTC')).isoformat()
+        os_bulk = OSBulkIndex(refresh=refresh)
+        try:
+            with os_bulk:
+                for image_id, fields in image_fields.items():
+                    os_bulk.update_script(
+                        index=cls.INDEX,
+                        doc_id=image_id,
+                        script=CLEAR_FIELDS_SCRIPT,
+                        params={'fields': fields, 'date_updated': date_updated},
+                    )
+        except BulkIndexError:
+            # the errors of each document are in os_bulk.results
+            pass
+        for image_id, result in os_bulk.results.items():
+            if result == 'updated':
+                audit_log.log(image_id, 'update', changes={field: None for field in image_fields[image_id]})
+        results.update(os_bulk.results)
+        return results
+
+    def store_thumbnail(self, pil_image=None):
+        """
+        Create the thumbnail of the image and upload it to storage, without saving the image.
+
+        @param pil_image: the original image, read from storage by default
+        @return: the fields to save, "thumbnail" or "thumbnail_error" when the thumbnail can't be created
+        """
         try:
             if not pil_image:
                 pil_image = self.pil_image
 
+            # the image is not decoded yet, so JPEGs are decoded at a reduced scale (see Image.draft)
             pil_image.thumbnail(settings.THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
 
             # save the thumbnail to a temporary memory file
@@ -1369,10 +2045,35 @@ class OSImage:
         except Exception as e:
             logger.error(f'Error updating thumbnail for image {self.id}: {e}')
             self.thumbnail_error = True
-            self.save(fields=['thumbnail_error'])
-        else:
-            # TODO: log update
-            self.save(fields=['thumbnail'])
+            return ['thumbnail_error']
+        return ['thumbnail']
+
+    @tracer.wrap()
+    def update_thumbnail(self, pil_image=None, bulk_index=None):
+        fields = self.store_thumbnail(pil_image=pil_image)
+        # the thumbnail only depends on the original image, concurrent changes of other fields don't matter
+        self.save(fields=fields, bulk_index=bulk_index, if_unchanged=False)
+
+    @classmethod
+    @tracer.wrap()
+    def update_thumbnails(cls, images, max_workers=settings.THUMBNAIL_MAX_WORKERS):
+        """
+        Update the thumbnails of multiple images. The originals are read, resized and the thumbnails uploaded
+        concurrently, Pillow releases the GIL while decoding, resizing and encoding. The images are saved with bulk
+        requests.
+
+        @param images: list of OSImage instances with their image
+        @param max_workers: maximum number of thumbnails created concurrently
+        """
+        if not images:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(images))) as executor:
+            fields = list(executor.map(lambda image: image.store_thumbnail(), images))
+
+        with OSBulkIndex() as os_bulk:
+            for image, image_fields in zip(images, fields, strict=True):
+                image.save(fields=image_fields, bulk_index=os_bulk, if_unchanged=False)
 
     @tracer.wrap()
     def update_coca_embedding(self, pil_image=None, author=None):
@@ -1389,8 +2090,55 @@ class OSImage:
         self.coca_embedding_exists = True
         self.coca_embedding_author = author
 
-        # TODO: log update
-        self.save(fields=['coca_embedding'])
+        self.save(fields=['coca_embedding'], if_unchanged=False)
+
+    @classmethod
+    @tracer.wrap()
+    def update_coca_embeddings(cls, images, author=None, max_workers=settings.FETCH_EMBEDDING_MAX_CONCURRENCY):
+        """
+        Update the CoCa embeddings of multiple images. The originals are read and sent to the embedding API
+        concurrently, FETCH_EMBEDDING_FOR_IMAGE_BATCH_SIZE images per call, and the images are saved with bulk
+        requests.
+
+        @param images: list of OSImage instances with their image
+        @param author: email of the author of the embeddings
+        @param max_workers: maximum number of concurrent calls to the embedding API
+        @return: dict of image ID to error message for the images that failed
+        """
+        failed = {}
+        if not images or not settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL:
+            return failed
+
+        def fetch(batch):
+            pil_images = [image.pil_image for image in batch]
+            return fetch_coca_embeddings([(pil_image, pil_image.filename) for pil_image in pil_images])
+
+        batches = [
+            images[i : i + settings.FETCH_EMBEDDING_FOR_IMAGE_BATCH_SIZE]
+            for i in range(0, len(images), settings.FETCH_EMBEDDING_FOR_IMAGE_BATCH_SIZE)
+        ]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+            futures = {executor.submit(fetch, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    vectors = future.result()
+                    if len(vectors) != len(batch):
+                        raise ValueError(f'Expected {len(batch)} embeddings, got {len(vectors)}')
+                except Exception as e:
+                    logger.error(f'Error fetching the embeddings of {len(batch)} images: {e}')
+                    failed.update({image.id: str(e) for image in batch})
+                    continue
+                for image, vector in zip(batch, vectors, strict=True):
+                    image.coca_embedding_vector = normalize_vector(vector)
+                    image.coca_embedding_exists = True
+                    image.coca_embedding_author = author
+
+        with OSBulkIndex() as os_bulk:
+            for image in images:
+                if image.id not in failed:
+                    image.save(fields=['coca_embedding'], bulk_index=os_bulk, if_unchanged=False)
+        return failed
 
     @tracer.wrap()
     async def update_coca_embedding_async(self, pil_image=None, author=None):
@@ -1407,57 +2155,191 @@ class OSImage:
         self.coca_embedding_exists = True
         self.coca_embedding_author = author
 
-        # TODO: log update
-        self.save(fields=['coca_embedding'])
+        self.save(fields=['coca_embedding'], if_unchanged=False)
 
     @classmethod
     @tracer.wrap()
-    def mark_duplicates(cls, image_id, threshold=settings.DUPLICATE_FINDER_SIMILARITY_THRESHOLD):
-        current_image = OSImage.objects.get(
-            image_id,
-            fields=["id", "duplicate_state", "coca_embedding", "width", "height"],
-        )
+    def mark_duplicates(
+        cls,
+        image_id,
+        threshold=settings.DUPLICATE_FINDER_SIMILARITY_THRESHOLD,
+        current_image=None,
+        bulk_index=None,
+    ):
+        """
+        Mark an image and its similar images as original (the largest one) or duplicates.
+
+        @param image_id: ID of the image
+        @param threshold: minimum similarity of the duplicates
+        @param current_image: the image, if it was already read with the DUPLICATE_FIELDS
+        @param bulk_index: OSBulkIndex to save the images with, they are saved right away by default
+        @return: IDs of the marked images
+        """
+        if current_image is None:
+            current_image = OSImage.objects.get(image_id, fields=cls.DUPLICATE_FIELDS)
 
         if current_image.duplicate_state != DuplicateState.UNPROCESSED:
-            return
+            return []
 
         if not current_image.coca_embedding_exists:
-            return
+            return []
 
         similars = current_image.find_similar(number=settings.DUPLICATE_FINDER_NUMBER_OF_SIMILARS)
         duplicates = [current_image] + [similar for similar in similars if similar.similarity_from_score > threshold]
 
         sorted_duplicates = sorted(duplicates, key=lambda image: image.width * image.height, reverse=True)
 
-        with OSBulkIndex() as bulk_index:
+        with OSBulkIndex() if bulk_index is None else contextlib.nullcontext(bulk_index) as bulk_index:
             for i, duplicate in enumerate(sorted_duplicates):
                 duplicate.duplicate_state = DuplicateState.ORIGINAL if i == 0 else DuplicateState.DUPLICATE
-                duplicate.save(bulk_index=bulk_index, fields=["duplicate_state"])
+                duplicate.save(bulk_index=bulk_index, fields=["duplicate_state"], if_unchanged=False)
+        return [duplicate.id for duplicate in sorted_duplicates]
+
+    @classmethod
+    @tracer.wrap()
+    def mark_duplicates_batch(
+        cls,
+        image_ids,
+        threshold=settings.DUPLICATE_FINDER_SIMILARITY_THRESHOLD,
+        exact_rescore=settings.DUPLICATE_FINDER_EXACT_RESCORE,
+    ):
+        """
+        Mark the duplicates of multiple images at once. The similar images of the whole batch are found with one
+        multi search, the images are grouped into connected components of similar images, the largest image of each
+        component is marked as original and the others as duplicates, with one bulk request.
+
+        @param image_ids: IDs of the images
+        @param threshold: minimum similarity of the duplicates
+        @param exact_rescore: compute the similarity from the vectors instead of using the kNN score
+        @return: IDs of the marked images
+        """
+        images = [
+            image
+            for image in OSImage.objects.get_multiple(image_ids, fields=cls.DUPLICATE_FIELDS, number=len(image_ids))
+            if image.duplicate_state == DuplicateState.UNPROCESSED and image.coca_embedding_exists
+        ]
+        if not images:
+            return []
+
+        similars = OSImage.objects.find_similar_multiple(
+            [image.coca_embedding_vector for image in images],
+            number=settings.DUPLICATE_FINDER_NUMBER_OF_SIMILARS,
+            exclude_ids=[image.id for image in images],
+            fields=cls.DUPLICATE_FIELDS,
+        )
 
-    def delete(self, refresh=True):
-        # TODO: log update
+        images_by_id = {}
+        union_find = UnionFind()
+        for image, image_similars in zip(images, similars, strict=True):
+            images_by_id[image.id] = image
+            union_find.find(image.id)
+            for similar in image_similars:
+                if exact_rescore:
+                    similarity = float(np.dot(image.coca_embedding_vector, similar.coca_embedding_vector))
+                else:
+                    similarity = similar.similarity_from_score
+                if similarity > threshold:
+                    images_by_id.setdefault(similar.id, similar)
+                    union_find.union(image.id, similar.id)
+
+        with OSBulkIndex() as bulk_index:
+            for group in union_find.groups():
+                duplicates = sorted(
+                    (images_by_id[image_id] for image_id in group),
+                    key=lambda image: (-(image.width or 0) * (image.height or 0), image.id),
+                )
+                for i, duplicate in enumerate(duplicates):
+                    duplicate_state = DuplicateState.ORIGINAL if i == 0 else DuplicateState.DUPLICATE
+                    if duplicate.duplicate_state != duplicate_state:
+                        duplicate.duplicate_state = duplicate_state
+                        duplicate.save(bulk_index=bulk_index, fields=["duplicate_state"], if_unchanged=False)
+        return list(images_by_id.keys())
+
+    def delete(self, refresh=settings.OPENSEARCH_DEFAULT_REFRESH):
         OS.client.update(
             index=self.INDEX,
             id=self.id,
             body={"doc": {"is_deleted": True}},
-            refresh=refresh,
+            refresh=get_refresh_param(refresh),
             timeout=self.objects.default_timeout,
         )
+        refresh_after_write(self.INDEX, refresh)
+        audit_log.log(self.id, 'delete', changes={'is_deleted': True})
 
-    def delete_permanently(self, refresh=True):
-        # TODO: log update
-        filepaths_to_delete = [self.image, self.thumbnail]
+    def get_file_paths(self):
+        """Storage paths of the files of the image: original, thumbnail and latents"""
+        file_paths = [self.image, self.thumbnail]
         for latent in self.latents.latents.values():
-            filepaths_to_delete.append(latent.file)
+            file_paths.append(latent.file)
+        return [str(file_path) for file_path in file_paths if file_path]
+
+    def delete_permanently(self, refresh=settings.OPENSEARCH_DEFAULT_REFRESH, bulk_index=None):
+        filepaths_to_delete = self.get_file_paths()
         for filepath in filepaths_to_delete:
             if filepath:
                 default_storage.delete(filepath)
-        OS.client.delete(
-            index=self.INDEX,
-            id=self.id,
-            refresh=refresh,
-            timeout=self.objects.default_timeout,
-        )
+        if bulk_index:
+            bulk_index.delete(index=self.INDEX, doc_id=self.id)
+        else:
+            OS.client.delete(
+                index=self.INDEX,
+                id=self.id,
+                refresh=get_refresh_param(refresh),
+                timeout=self.objects.default_timeout,
+            )
+            refresh_after_write(self.INDEX, refresh)
+        audit_log.log(self.id, 'delete_permanently', fields=[])
+
+    @classmethod
+    @tracer.wrap()
+    def delete_permanently_multiple(cls, images, refresh=settings.OPENSEARCH_BULK_REFRESH, retries=3, dry_run=False):
+        """
+        Permanently delete many images and their files: the files with batched storage deletes (S3 DeleteObjects of
+        up to 1000 keys), then the documents with bulk deletes. Partial failures are retried, images whose files
+        could not be deleted are kept so that they are deleted by a later call.
+
+        @param images: images with the image, thumbnail and latents fields
+        @param refresh: refresh policy of the bulk requests
+        @param retries: number of retries of the files and documents that failed
+        @param dry_run: don't delete anything, only count the files and their size
+        @return: dict with the number of "images" and "files" (deleted, or to delete with dry_run), the "bytes" of
+            the files with dry_run, and the "failed" image IDs
+        """
+        file_paths = {image.id: image.get_file_paths() for image in images}
+        if dry_run:
+            file_count, size = get_files_size(path for paths in file_paths.values() for path in paths)
+            return {'images': len(images), 'files': file_count, 'bytes': size, 'failed': []}
+
+        file_errors = delete_files([path for paths in file_paths.values() for path in paths], retries=retries)
+        failed = {image_id for image_id, paths in file_paths.items() if any(path in file_errors for path in paths)}
+        for path, error in file_errors.items():
+            logger.error(f'Failed to delete file "{path}": {error}')
+
+        deleted = []
+        pending = [image_id for image_id in file_paths if image_id not in failed]
+        for attempt in range(retries + 1):
+            os_bulk = OSBulkIndex(refresh=refresh)
+            try:
+                with os_bulk:
+                    for image_id in pending:
+                        os_bulk.delete(index=cls.INDEX, doc_id=image_id)
+            except BulkIndexError:
+                # the errors of each document are in os_bulk.results
+                pass
+            deleted += [image_id for image_id in pending if os_bulk.results.get(image_id) in ['deleted', 'not_found']]
+            pending = [image_id for image_id in pending if image_id not in deleted]
+            if not pending:
+                break
+            logger.warning(f'Failed to delete {len(pending)} images, attempt {attempt + 1} of {retries + 1}')
+        failed.update(pending)
+
+        for image_id in deleted:
+            audit_log.log(image_id, 'delete_permanently', fields=[])
+        return {
+            'images': len(deleted),
+            'files': sum(len(file_paths[image_id]) for image_id in deleted),
+            'failed': sorted(failed),
+        }
 
     @property
     def similarity_from_score(self):
@@ -1492,6 +2374,12 @@ class OSImage:
         extension = str(filename.replace('/', '').split('.')[-1:][0])[:4]
         return f"images/{image_id}/{name}.{extension}"
 
+    @classmethod
+    def get_direct_upload_storage_path(cls, upload_id, filename, name):
+        # outside of the folders of the images, a presigned URL can't overwrite the files of an image
+        extension = str(filename.replace('/', '').split('.')[-1:][0])[:4]
+        return f"uploads/{upload_id}/{name}.{extension}"
+
     @classmethod
     def get_image_storage_path(cls, image_id, filename):
         return cls.get_storage_path(image_id=image_id, filename=filename, name='original')
@@ -0,0 +1,67 @@
+import logging
+
+from django.db import models, transaction
+
+from backend.common.base_model import BaseModel
+
+logger = logging.getLogger('dataroom')
+
+
+class ScanCursorManager(models.Manager):
+    def get_partition(self, name, partition=0, partitions=1):
+        """
+        Cursor of a partition of a scan, created on the first run. Changing the number of partitions starts the scan
+        over, the slices of the saved cursors would not match the new ones.
+
+        @param name: name of the scan
+        @param partition: index of the partition, from 0 to partitions - 1
+        @param partitions: number of partitions of the scan
+        """
+        assert 0 <= partition < partitions
+        with transaction.atomic():
+            deleted, _ = self.filter(name=name).exclude(partitions=partitions).delete()
+            if deleted:
+                logger.warning(f'The scan {name} is now split in {partitions} partitions, starting it over')
+            cursor, _ = self.get_or_create(name=name, partition=partition, defaults={'partitions': partitions})
+        return cursor
+
+
+class ScanCursor(BaseModel):
+    """
+    Saved position of a partition of a long scan over the images (e.g. a migration), so that the task runner
+    continues the scan where it stopped after a restart. The partitions are slices of the images that are scanned in
+    parallel.
+    """
+
+    name = models.CharField(max_length=100)
+    partition = models.PositiveIntegerField(default=0)
+    partitions = models.PositiveIntegerField(default=1)
+    # position of the current pass, search_after holds the sort values of the last scanned image
+    pit_id = models.TextField(blank=True, default='')
+    search_after = models.JSONField(null=True, blank=True)
+    items_scanned = models.BigIntegerField(default=0)
+    pass_count = models.PositiveIntegerField(default=0)
+    date_pass_started = models.DateTimeField(null=True, blank=True)
+    date_completed = models.DateTimeField(null=True, blank=True)
+
+    objects = ScanCursorManager()
+
+    class Meta:
+        ordering = ('name', 'partition')
+        constraints = [models.UniqueConstraint(fields=['name', 'partition'], name='scan_cursor_partition_unique')]
+
+    def __str__(self):
+        return f'{self.name} {self.partition + 1}/{self.partitions}'
+
+    @property
+    def is_completed(self):
+        return self.date_completed is not None
+
+    def reset(self):
+        """Start the scan of the partition over, the PIT of the stopped pass expires on its own"""
+        self.pit_id = ''
+        self.search_after = None
+        self.items_scanned = 0
+        self.date_pass_started = None
+        self.date_completed = None
+        self.save()
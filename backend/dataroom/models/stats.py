@@ -7,6 +7,19 @@ from backend.common.base_model import BaseModel
 from backend.dataroom.choices import DuplicateState, StatsType
 from backend.dataroom.models.tag import Tag
 
+# stats type of the task runner metrics -> key of backend.task_runner.metrics.TaskMetrics.snapshot() and the scale
+# of the saved integer, the durations are saved in milliseconds
+TASK_RUNNER_STATS_TYPES = {
+    StatsType.TASK_ITEMS_PROCESSED: ('items_processed', 1),
+    StatsType.TASK_FAILURES: ('failures', 1),
+    StatsType.TASK_RETRIES: ('retries', 1),
+    StatsType.TASK_DURATION_P50: ('duration_p50', 1000),
+    StatsType.TASK_DURATION_P95: ('duration_p95', 1000),
+    StatsType.TASK_DURATION_P99: ('duration_p99', 1000),
+    StatsType.TASK_FEED_TIME: ('feed_seconds', 1000),
+    StatsType.TASK_QUEUE_DEPTH: ('queue_depth', 1),
+}
+
 
 class StatsManager(models.Manager):
     def _get_stats_dict(self, stats=None):
@@ -81,6 +94,29 @@ class StatsManager(models.Manager):
             return self._get_stats_dict(stats)
         return self._get_stats_dict()
 
+    def get_task_runner_stats(self):
+        """
+        Metrics of the queued tasks saved by the task runner, as a dict of task name to a dict of metric (the stats
+        type without "task_") to value. items_per_second is the measured throughput between the last two saves.
+        """
+        tasks = {}
+        for stats in self.filter(stats_type__in=TASK_RUNNER_STATS_TYPES.keys()).order_by('group_name'):
+            task = tasks.setdefault(stats.group_name, {'items_per_second': 0, 'date_updated': stats.date_updated})
+            task[stats.stats_type.removeprefix('task_')] = stats.value
+            if stats.stats_type == StatsType.TASK_ITEMS_PROCESSED:
+                task['items_per_second'] = stats.change_per_second
+            task['date_updated'] = max(task['date_updated'], stats.date_updated)
+        for task in tasks.values():
+            for stats_type in TASK_RUNNER_STATS_TYPES:
+                task.setdefault(stats_type.removeprefix('task_'), 0)
+        return tasks
+
+    def update_task_runner_stats(self, snapshots):
+        """Save the metrics of the queued tasks, from backend.task_runner.metrics.MetricsRegistry.snapshots()"""
+        for task_name, snapshot in snapshots.items():
+            for stats_type, (key, scale) in TASK_RUNNER_STATS_TYPES.items():
+                self._update_stats(stats_type=stats_type, value=round(snapshot[key] * scale), group_name=task_name)
+
     def update_all_stats(self):
         self.update_count_stats()
         self.update_queue_stats()
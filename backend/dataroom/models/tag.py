@@ -1,3 +1,6 @@
+import threading
+import time
+
 from django.core.validators import MinLengthValidator
 from django.db import models
 
@@ -5,6 +8,58 @@ from backend.common.base_model import BaseModel
 from backend.common.validators import AlphanumericValidator
 
 
+class TagManager(models.Manager):
+    # names of the tags this process knows exist, so writes of already known tags don't query the database. They are
+    # forgotten after a while, tags deleted by other processes would not be created again otherwise.
+    _known_names = set()
+    _known_names_date = None
+    _known_names_expiration_seconds = 60 * 5  # 5 minutes
+    _known_names_lock = threading.Lock()
+
+    def _expire_known_names(self):
+        # called with the lock held
+        if TagManager._known_names_date is not None and (
+            time.monotonic() - TagManager._known_names_date > self._known_names_expiration_seconds
+        ):
+            self._known_names.clear()
+            TagManager._known_names_date = None
+
+    def ensure_exist(self, names):
+        """
+        Create the missing tags of a request at once, with one query to find the existing tags and one bulk insert.
+        Tags created concurrently by another process are ignored.
+
+        @param names: tag names, may contain duplicates
+        @return: number of created tags
+        """
+        names = set(names)
+        with self._known_names_lock:
+            self._expire_known_names()
+            names -= self._known_names
+        if not names:
+            return 0
+
+        existing = set(self.filter(name__in=names).values_list('name', flat=True))
+        missing = sorted(names - existing)
+        if missing:
+            self.bulk_create([self.model(name=name) for name in missing], ignore_conflicts=True)
+
+        with self._known_names_lock:
+            if TagManager._known_names_date is None:
+                TagManager._known_names_date = time.monotonic()
+            self._known_names.update(names)
+        return len(missing)
+
+    def forget(self, names=None):
+        """Forget known tags, e.g. when they are deleted. All tags are forgotten when no names are given."""
+        with self._known_names_lock:
+            if names is None:
+                self._known_names.clear()
+                TagManager._known_names_date = None
+            else:
+                self._known_names.difference_update(names)
+
+
 class Tag(BaseModel):
     name = models.CharField(
         max_length=300,
@@ -19,8 +74,14 @@ class Tag(BaseModel):
     description = models.TextField(blank=True, default='')
     image_count = models.PositiveIntegerField(default=0, editable=False)
 
+    objects = TagManager()
+
     class Meta:
         ordering = ['name']
 
     def __str__(self):
         return self.name
+
+    def delete(self, *args, **kwargs):
+        Tag.objects.forget([self.name])
+        return super().delete(*args, **kwargs)
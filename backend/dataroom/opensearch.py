@@ -1,12 +1,16 @@
+import logging
 import os
-from collections import namedtuple
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import boto3
 from django.conf import settings
 from opensearchpy import OpenSearch, RequestsHttpConnection
-from opensearchpy.helpers import bulk
+from opensearchpy.helpers import BulkIndexError, streaming_bulk
 from requests_aws4auth import AWS4Auth
 
+logger = logging.getLogger('dataroom')
+
 
 class OSClass:
     """
@@ -81,7 +85,116 @@ class OSClass:
 OS = OSClass()
 
 
-OSDoc = namedtuple('OSDoc', ('index', 'doc_id', 'body'))
+REFRESH_POLICIES = ('true', 'false', 'wait_for', 'coalesce')
+
+
+def get_refresh_policy(refresh):
+    """
+    Normalize a refresh policy of a write:
+
+    - "true": refresh the index right away, the write is searchable when the request returns
+    - "false": don't refresh, the write is searchable after the next periodic refresh of the index
+    - "wait_for": wait for the next periodic refresh of the index before returning
+    - "coalesce": don't wait, and refresh the index at most once every OPENSEARCH_REFRESH_INTERVAL seconds
+
+    @param refresh: one of REFRESH_POLICIES, or a boolean for "true" / "false"
+    @return: one of REFRESH_POLICIES
+    """
+    if isinstance(refresh, bool):
+        return 'true' if refresh else 'false'
+    policy = str(refresh).lower()
+    if policy not in REFRESH_POLICIES:
+        raise ValueError(f'Invalid refresh policy "{refresh}", expected one of: {", ".join(REFRESH_POLICIES)}')
+    return policy
+
+
+def get_refresh_param(refresh):
+    """Value of the refresh param of a write request, coalesced refreshes are requested with refresh_after_write"""
+    policy = get_refresh_policy(refresh)
+    return 'false' if policy == 'coalesce' else policy
+
+
+def refresh_after_write(index, refresh):
+    if get_refresh_policy(refresh) == 'coalesce':
+        refresh_coalescer.request(index)
+
+
+class RefreshCoalescer:
+    """
+    Merge the refreshes requested by many writes into at most one refresh per index per interval.
+
+    The first request for an index schedules a refresh after the interval, the requests made until it runs are
+    covered by the same refresh.
+    """
+
+    def __init__(self, interval=None):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._scheduled = {}
+
+    def request(self, index):
+        with self._lock:
+            if index in self._scheduled:
+                return
+            timer = threading.Timer(
+                self.interval if self.interval is not None else settings.OPENSEARCH_REFRESH_INTERVAL,
+                self._refresh,
+                args=(index,),
+            )
+            timer.daemon = True
+            self._scheduled[index] = timer
+        timer.start()
+
+    def _refresh(self, index):
+        with self._lock:
+            self._scheduled.pop(index, None)
+        try:
+            OS.client.indices.refresh(index=index)
+        except Exception as e:
+            logger.error(f'Error refreshing index "{index}": {e}')
+
+    def flush(self):
+        """Run the scheduled refreshes right away, e.g. before the process exits"""
+        with self._lock:
+            scheduled = self._scheduled
+            self._scheduled = {}
+        for index, timer in scheduled.items():
+            timer.cancel()
+            self._refresh(index)
+
+
+refresh_coalescer = RefreshCoalescer()
+
+
+class OSStoredScript:
+    """
+    Painless script stored in the cluster and referenced by ID in update requests, so it is compiled once and
+    cached by OpenSearch. The script is (re)stored once per process on first use.
+
+    Usage:
+
+        ADD_ONE = OSStoredScript('add-one-v1', 'ctx._source.count += params.value')
+        OS.client.update(index='index', id='1', body={'script': {'id': ADD_ONE.get_id(), 'params': {'value': 1}}})
+
+    Change the ID when changing the source, processes running the old code keep using the old script.
+    """
+
+    def __init__(self, script_id, source):
+        self.script_id = script_id
+        self.source = source
+        self._is_stored = False
+        self._lock = threading.Lock()
+
+    def put(self):
+        OS.client.put_script(id=self.script_id, body={'script': {'lang': 'painless', 'source': self.source}})
+        self._is_stored = True
+
+    def get_id(self):
+        if not self._is_stored:
+            with self._lock:
+                if not self._is_stored:
+                    self.put()
+        return self.script_id
 
 
 class OSBulkIndex:
@@ -98,45 +211,208 @@ class OSBulkIndex:
                 image.save(fields=['source'], bulk_index=os_bulk)
                 # or directly:
                 os_bulk.index(index=OSImage.INDEX, doc_id='1', body={'field': 'value'})
+                # or with a stored script, without reading the document first:
+                os_bulk.update_script(index=OSImage.INDEX, doc_id='1', script=MY_SCRIPT, params={'value': 1})
+                # or append a document with a generated ID:
+                os_bulk.append(index='logs', body={'field': 'value'})
+                # or delete a document:
+                os_bulk.delete(index=OSImage.INDEX, doc_id='1')
+
+        # result by document ID: "created", "updated", "deleted", "noop", "not_found", "conflict" or the error
+        os_bulk.results
+
+    Documents are sent when bulk_size documents or max_bytes are queued, whichever comes first. Documents rejected
+    because the cluster is overloaded (429) are retried with an exponential backoff. Failed documents don't stop the
+    other documents, they are collected and raised together as a BulkIndexError when leaving the context.
+
+    Conditional writes (with if_seq_no and if_primary_term) of documents that were changed since they were read are
+    not errors, their IDs are collected in os_bulk.conflicts so they can be read and updated again.
+
+    With max_in_flight > 1, up to that many bulk requests are sent in parallel from background threads. Only use it
+    when the same document is not written twice, the order of the requests is not guaranteed.
+
+    The refresh policy applies to every bulk request, see get_refresh_policy.
 
+    Callbacks registered with on_success run when leaving the context, for the documents that were written. E.g. the
+    audit log entries of bulk writes are only added once the writes succeeded.
     """
 
-    def __init__(self, bulk_size=100, refresh=settings.OPENSEARCH_DEFAULT_REFRESH, timeout=25):
-        self._docs = []
-        self.bulk_size = bulk_size
-        self.refresh = 'true' if refresh else 'false'
+    def __init__(
+        self,
+        bulk_size=None,
+        refresh=settings.OPENSEARCH_DEFAULT_REFRESH,
+        timeout=25,
+        max_bytes=None,
+        max_in_flight=None,
+        max_retries=None,
+    ):
+        self.bulk_size = bulk_size or settings.OPENSEARCH_BULK_SIZE
+        self.max_bytes = max_bytes or settings.OPENSEARCH_BULK_MAX_BYTES
+        self.max_in_flight = max_in_flight or settings.OPENSEARCH_BULK_MAX_IN_FLIGHT
+        self.max_retries = settings.OPENSEARCH_BULK_MAX_RETRIES if max_retries is None else max_retries
+        self.refresh = get_refresh_policy(refresh)
         self.timeout = timeout
+        self.results = {}
+        self.errors = []
+        self.conflicts = []
+        self._actions = []
+        self._actions_bytes = 0
+        self._executor = None
+        self._futures = []
+        self._lock = threading.Lock()
+        self._callbacks = []
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self._flush()
+        try:
+            self._flush()
+            self._wait(max_pending=0)
+        finally:
+            if self._executor:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            callbacks = self._callbacks
+            self._callbacks = []
+            for doc_id, callback in callbacks:
+                if self.results.get(doc_id) in ('created', 'updated', 'deleted'):
+                    callback()
+        if self.errors and exc_type is None:
+            raise BulkIndexError(f'{len(self.errors)} document(s) failed to index.', self.errors)
+
+    def on_success(self, doc_id, callback):
+        """Call callback() when leaving the context if the document was created, updated or deleted"""
+        self._callbacks.append((doc_id, callback))
+
+    def _add(self, action):
+        self._actions.append(action)
+        # the size of the action in the request body, vectors make it vary a lot between documents
+        self._actions_bytes += len(OS.client.transport.serializer.dumps(action)) + 1
+        if len(self._actions) >= self.bulk_size or self._actions_bytes >= self.max_bytes:
+            self._flush()
 
     def _flush(self):
-        if len(self._docs):
-            body = [
+        if not self._actions:
+            return
+        actions = self._actions
+        self._actions = []
+        self._actions_bytes = 0
+
+        if self.max_in_flight <= 1:
+            self._send(actions)
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='os-bulk')
+        # back-pressure: wait for a free slot before sending more
+        self._wait(max_pending=self.max_in_flight - 1)
+        self._futures.append(self._executor.submit(self._send, actions))
+
+    def _wait(self, max_pending):
+        while len(self._futures) > max_pending:
+            done, _ = wait(self._futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._futures.remove(future)
+                # raises the errors of the whole request, e.g. when the retries are exhausted
+                future.result()
+
+    def _send(self, actions):
+        results = streaming_bulk(
+            client=OS.client,
+            actions=actions,
+            chunk_size=len(actions),
+            max_chunk_bytes=self.max_bytes,
+            raise_on_error=False,
+            max_retries=self.max_retries,
+            initial_backoff=settings.OPENSEARCH_BULK_INITIAL_BACKOFF,
+            max_backoff=settings.OPENSEARCH_BULK_MAX_BACKOFF,
+            params={
+                'timeout': self.timeout,
+                'refresh': get_refresh_param(self.refresh),
+            },
+        )
+        for ok, item in results:
+            op_type, result = next(iter(item.items()))
+            with self._lock:
+                if ok:
+                    self.results[result['_id']] = result['result']
+                elif result.get('status') == 404:
+                    # scripted updates of missing documents
+                    self.results[result['_id']] = 'not_found'
+                elif result.get('status') == 409:
+                    # the document was changed since it was read
+                    self.results[result['_id']] = 'conflict'
+                    self.conflicts.append(result['_id'])
+                else:
+                    self.results[result['_id']] = result.get('error')
+                    self.errors.append(item)
+        for index in {action['_index'] for action in actions}:
+            refresh_after_write(index, self.refresh)
+
+    def index(self, index, doc_id, body, if_seq_no=None, if_primary_term=None):
+        if if_seq_no is not None:
+            # only update the document if it was not changed since it was read, upserts can't be conditional
+            self._add(
                 {
-                    "_index": doc.index,
-                    "_id": doc.doc_id,
-                    "doc": doc.body,
-                    # perform an update or insert
+                    "_index": index,
+                    "_id": doc_id,
+                    "doc": body,
                     "_op_type": "update",
-                    'doc_as_upsert': True,
+                    "if_seq_no": if_seq_no,
+                    "if_primary_term": if_primary_term,
                 }
-                for doc in self._docs
-            ]
-            bulk(
-                client=OS.client,
-                actions=body,
-                params={
-                    'timeout': self.timeout,
-                    'refresh': self.refresh,
-                },
             )
-            self._docs = []
+            return
+        self._add(
+            {
+                "_index": index,
+                "_id": doc_id,
+                "doc": body,
+                # perform an update or insert
+                "_op_type": "update",
+                'doc_as_upsert': True,
+            }
+        )
 
-    def index(self, index, doc_id, body):
-        self._docs.append(OSDoc(index=index, doc_id=doc_id, body=body))
-        if len(self._docs) >= self.bulk_size:
-            self._flush()
+    def create(self, index, doc_id, body):
+        # only index the document if no document has the same ID, the result is "conflict" otherwise
+        self._add(
+            {
+                "_index": index,
+                "_id": doc_id,
+                "_op_type": "create",
+                "_source": body,
+            }
+        )
+
+    def append(self, index, body):
+        # append-only documents, with an ID generated by OpenSearch
+        self._add(
+            {
+                "_index": index,
+                "_op_type": "index",
+                "_source": body,
+            }
+        )
+
+    def delete(self, index, doc_id):
+        self._add(
+            {
+                "_index": index,
+                "_id": doc_id,
+                "_op_type": "delete",
+            }
+        )
+
+    def update_script(self, index, doc_id, script: OSStoredScript, params):
+        # scripted updates never create missing documents
+        self._add(
+            {
+                "_index": index,
+                "_id": doc_id,
+                "_op_type": "update",
+                "script": {"id": script.get_id(), "params": params},
+                "retry_on_conflict": 3,
+            }
+        )
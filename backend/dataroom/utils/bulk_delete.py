@@ -0,0 +1,87 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger('dataroom')
+
+# maximum number of keys of an S3 DeleteObjects request
+DELETE_OBJECTS_BATCH_SIZE = 1000
+# concurrent requests to read the sizes of the files
+SIZE_MAX_WORKERS = 16
+
+
+def is_s3_storage():
+    """S3 compatible storages (S3, R2) delete up to 1000 files with one request"""
+    return hasattr(default_storage, 'bucket') and hasattr(default_storage, '_normalize_name')
+
+
+def delete_files(paths, retries=3):
+    """
+    Delete many files of the default storage. With S3 compatible storages, the files are deleted with DeleteObjects
+    requests of up to 1000 keys, and the keys that failed are retried with an exponential backoff. Missing files are
+    not errors.
+
+    @param paths: storage paths of the files
+    @param retries: number of retries of the files that failed
+    @return: dict of path to the error of the files that could not be deleted
+    """
+    paths = list(dict.fromkeys(path for path in paths if path))
+    if not is_s3_storage():
+        errors = {}
+        for path in paths:
+            try:
+                default_storage.delete(path)
+            except OSError as e:
+                errors[path] = str(e)
+        return errors
+
+    from storages.utils import clean_name
+
+    keys = {default_storage._normalize_name(clean_name(path)): path for path in paths}
+    client = default_storage.bucket.meta.client
+    errors = {}
+    pending = list(keys.keys())
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(0.5 * 2 ** (attempt - 1))
+        errors = {}
+        for i in range(0, len(pending), DELETE_OBJECTS_BATCH_SIZE):
+            batch = pending[i : i + DELETE_OBJECTS_BATCH_SIZE]
+            try:
+                response = client.delete_objects(
+                    Bucket=default_storage.bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True},
+                )
+            except Exception as e:
+                errors.update({key: str(e) for key in batch})
+                continue
+            for error in response.get('Errors', []):
+                errors[error['Key']] = f"{error.get('Code')}: {error.get('Message')}"
+        pending = list(errors.keys())
+        if not pending:
+            break
+        logger.warning(f'Failed to delete {len(pending)} files, attempt {attempt + 1} of {retries + 1}')
+    return {keys[key]: error for key, error in errors.items()}
+
+
+def get_files_size(paths):
+    """
+    Total size in bytes of files of the default storage, missing files are ignored
+
+    @param paths: storage paths of the files
+    @return: tuple of (number of existing files, total size in bytes)
+    """
+    paths = list(dict.fromkeys(path for path in paths if path))
+
+    def get_size(path):
+        try:
+            return default_storage.size(path)
+        except Exception:
+            return None
+
+    # one HEAD request per file with S3 compatible storages
+    with ThreadPoolExecutor(max_workers=SIZE_MAX_WORKERS) as executor:
+        sizes = [size for size in executor.map(get_size, paths) if size is not None]
+    return len(sizes), sum(sizes)
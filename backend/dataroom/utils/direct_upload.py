@@ -0,0 +1,123 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from backend.dataroom.exceptions import DirectUploadError
+from backend.dataroom.utils.bulk_delete import delete_files, is_s3_storage
+
+logger = logging.getLogger('dataroom')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# concurrent copies of the uploaded files to the folders of their images
+MOVE_MAX_WORKERS = 16
+
+
+def is_direct_upload_supported():
+    """Presigned URLs are only available with S3 compatible storages (S3, R2)"""
+    return is_s3_storage()
+
+
+def generate_upload_url(path, content_type=None, expires_in=None):
+    """
+    Generate a presigned URL that allows a client to PUT a file directly to storage, without going through Django.
+
+    @param path: storage path of the file
+    @param content_type: content type the client must send with the upload
+    @param expires_in: validity of the URL in seconds
+    @return: dict with the method, URL and headers the client must use
+    """
+    if not is_direct_upload_supported():
+        raise DirectUploadError('Direct uploads are not supported by the configured storage')
+
+    from storages.utils import clean_name
+
+    params = {
+        'Bucket': default_storage.bucket_name,
+        'Key': default_storage._normalize_name(clean_name(path)),
+    }
+    headers = {}
+    if content_type:
+        params['ContentType'] = content_type
+        headers['Content-Type'] = content_type
+    url = default_storage.bucket.meta.client.generate_presigned_url(
+        'put_object',
+        Params=params,
+        ExpiresIn=expires_in or settings.DIRECT_UPLOAD_URL_EXPIRATION,
+        HttpMethod='PUT',
+    )
+    return {'method': 'PUT', 'url': url, 'headers': headers}
+
+
+def verify_uploaded_file(path, size, checksum=None):
+    """
+    Check that a directly uploaded file exists and matches the size (and checksum) declared by the client.
+
+    @param path: storage path of the file
+    @param size: expected size in bytes
+    @param checksum: optional expected hex sha256 of the file content, checking it reads the whole file
+    @return: the opened file if it was read to verify the checksum, otherwise None
+    """
+    if not default_storage.exists(path):
+        raise DirectUploadError(f'File "{path}" was not uploaded')
+    uploaded_size = default_storage.size(path)
+    if uploaded_size != size:
+        raise DirectUploadError(f'File "{path}" has {uploaded_size} bytes, expected {size}')
+    if not checksum:
+        return None
+
+    file = default_storage.open(path)
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks(HASH_CHUNK_SIZE):
+        sha256.update(chunk)
+    if sha256.hexdigest() != checksum.lower():
+        file.close()
+        raise DirectUploadError(f'File "{path}" does not match the sha256 checksum')
+    file.seek(0)
+    return file
+
+
+def move_files(paths):
+    """
+    Move files of the default storage, with server-side copies on S3 compatible storages.
+
+    @param paths: dict of source path to destination path
+    @return: dict of source path to the error of the files that could not be moved
+    """
+    if not paths:
+        return {}
+
+    def move(source, destination):
+        if is_s3_storage():
+            from storages.utils import clean_name
+
+            default_storage.bucket.meta.client.copy_object(
+                Bucket=default_storage.bucket_name,
+                Key=default_storage._normalize_name(clean_name(destination)),
+                CopySource={
+                    'Bucket': default_storage.bucket_name,
+                    'Key': default_storage._normalize_name(clean_name(source)),
+                },
+            )
+            return
+        with default_storage.open(source) as file:
+            name = default_storage.save(destination, file)
+        if name != destination:
+            default_storage.delete(name)
+            raise DirectUploadError(f'File "{destination}" already exists')
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=min(MOVE_MAX_WORKERS, len(paths))) as executor:
+        futures = {executor.submit(move, source, destination): source for source, destination in paths.items()}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors[futures[future]] = str(e)
+
+    delete_errors = delete_files([source for source in paths if source not in errors])
+    if delete_errors:
+        logger.warning(f'Failed to delete {len(delete_errors)} moved files: {delete_errors}')
+    return errors
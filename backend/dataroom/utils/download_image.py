@@ -1,17 +1,82 @@
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from mimetypes import guess_extension
 
 import httpx
-from django.core.files.base import ContentFile
+from ddtrace import tracer
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
 
+from backend.dataroom.exceptions import ImageDownloadError
+from backend.dataroom.utils.http_client import get_http_client
 
-def download_image_from_url(image_url):
-    try:
-        response = httpx.get(image_url)
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+@tracer.wrap()
+def download_image_from_url(image_url, max_size=None):
+    """
+    Stream an image from a URL into a temporary file.
+
+    @param image_url: URL of the image
+    @param max_size: maximum size of the image in bytes, defaults to settings.IMAGE_DOWNLOAD_MAX_SIZE
+    @return: TemporaryUploadedFile with the image, deleted when closed
+    """
+    max_size = max_size or settings.IMAGE_DOWNLOAD_MAX_SIZE
+    client = get_http_client('image_download', max_connections=settings.IMAGE_DOWNLOAD_MAX_CONNECTIONS)
+
+    with client.stream('GET', image_url, timeout=settings.IMAGE_DOWNLOAD_TIMEOUT) as response:
         response.raise_for_status()
-    except httpx.HTTPError as e:
-        raise e
-    else:
-        content_type = response.headers.get('Content-Type')
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith('image/'):
+            raise ImageDownloadError(f'Unsupported content type "{content_type}"')
+
+        content_length = response.headers.get('Content-Length')
+        if content_length and content_length.isdigit() and int(content_length) > max_size:
+            raise ImageDownloadError(f'Image is larger than {max_size} bytes')
+
         extension = guess_extension(content_type) or ''
-        return ContentFile(response.content, name=f'{uuid.uuid4().hex}{extension}')
+        image_file = TemporaryUploadedFile(
+            name=f'{uuid.uuid4().hex}{extension}',
+            content_type=content_type,
+            size=0,
+            charset=None,
+        )
+        try:
+            # the Content-Length header can be missing or wrong, so also count while streaming
+            for chunk in response.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                image_file.size += len(chunk)
+                if image_file.size > max_size:
+                    raise ImageDownloadError(f'Image is larger than {max_size} bytes')
+                image_file.write(chunk)
+        except BaseException:
+            image_file.close()
+            raise
+
+    image_file.seek(0)
+    return image_file
+
+
+@tracer.wrap()
+def download_images_from_urls(image_urls, max_workers=None):
+    """
+    Download multiple images in parallel.
+
+    @param image_urls: list of image URLs
+    @param max_workers: maximum number of concurrent downloads
+    @return: dict of URL to the downloaded file, or to the exception if the download failed
+    """
+    image_urls = list(dict.fromkeys(image_urls))
+    if not image_urls:
+        return {}
+
+    def download(image_url):
+        try:
+            return download_image_from_url(image_url)
+        except (httpx.HTTPError, ImageDownloadError) as e:
+            return e
+
+    max_workers = min(max_workers or settings.IMAGE_DOWNLOAD_MAX_WORKERS, len(image_urls))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(image_urls, executor.map(download, image_urls), strict=True))
@@ -0,0 +1,172 @@
+import datetime
+import hashlib
+import logging
+import math
+import threading
+import time
+import zoneinfo
+
+from django.conf import settings
+
+logger = logging.getLogger('dataroom')
+
+
+class BloomFilter:
+    """
+    Probabilistic set: `in` can return false positives (bounded by error_rate), but never false negatives.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        # double hashing: derive all positions from one 128 bit digest
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, value):
+        is_new = False
+        for position in self._positions(value):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                self.bits[position >> 3] |= 1 << (position & 7)
+                is_new = True
+        # approximate number of distinct values, used to warn when the filter is over capacity
+        if is_new:
+            self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class ImageExistenceFilter:
+    """
+    Per-process Bloom filter over the IDs and hashes of all images (including deleted ones), used to skip the
+    OpenSearch existence checks when creating images that are definitely new.
+
+    The filter is loaded and then refreshed incrementally by date_created in a background thread. Images created
+    by other processes are only visible after the next refresh, so the filter is only trusted when the last refresh
+    is recent, otherwise callers fall back to querying OpenSearch.
+    """
+
+    page_size = 10_000
+
+    def __init__(self):
+        self._filter = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watermark = None
+        self._last_refresh = None
+
+    @property
+    def is_enabled(self):
+        return settings.IMAGE_EXISTENCE_FILTER_ENABLED
+
+    @property
+    def is_ready(self):
+        if self._filter is None or self._last_refresh is None:
+            return False
+        max_age = settings.IMAGE_EXISTENCE_FILTER_REFRESH_SECONDS * 3
+        return time.monotonic() - self._last_refresh < max_age
+
+    def start(self):
+        """Start loading the filter in the background, does nothing if it is disabled or already started."""
+        if not self.is_enabled or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='image-existence-filter', daemon=True)
+                self._thread.start()
+
+    def might_exist(self, image_ids=None, image_hashes=None):
+        """
+        @return: False if none of the IDs and hashes exist for sure, True if some might exist or the filter can't
+            tell (disabled, still loading or stale)
+        """
+        if not self.is_enabled:
+            return True
+        self.start()
+        if not self.is_ready:
+            return True
+        values = [f'id:{image_id}' for image_id in image_ids or []]
+        values += [f'hash:{image_hash}' for image_hash in image_hashes or []]
+        return any(value in self._filter for value in values)
+
+    def add(self, image_id, image_hash):
+        """Add a newly created image, so this process doesn't have to wait for the next refresh."""
+        if self._filter is None:
+            return
+        with self._lock:
+            self._filter.add(f'id:{image_id}')
+            if image_hash:
+                self._filter.add(f'hash:{image_hash}')
+
+    def _run(self):
+        while True:
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.error(f'Error refreshing the image existence filter: {e}')
+            time.sleep(settings.IMAGE_EXISTENCE_FILTER_REFRESH_SECONDS)
+
+    def _refresh(self):
+        from backend.dataroom.models.os_image import OSImage
+
+        started = time.monotonic()
+        if self._filter is None:
+            new_filter = BloomFilter(
+                capacity=settings.IMAGE_EXISTENCE_FILTER_CAPACITY,
+                error_rate=settings.IMAGE_EXISTENCE_FILTER_ERROR_RATE,
+            )
+        else:
+            new_filter = self._filter
+
+        # re-read a window before the watermark, recent documents might not have been searchable yet
+        search = OSImage.all_objects.search(fields=['image_hash', 'date_created'], sort=['date_created', 'id'])
+        if self._watermark:
+            date_from = self._watermark - datetime.timedelta(
+                seconds=settings.IMAGE_EXISTENCE_FILTER_REFRESH_OVERLAP_SECONDS
+            )
+            search = search.filter('range', date_created={'gte': date_from.isoformat()})
+
+        watermark = self._watermark
+        search_after = None
+        while True:
+            page = search.extra(size=self.page_size)
+            if search_after:
+                page = page.extra(search_after=search_after)
+            hits = page.execute().hits
+            if not hits:
+                break
+            with self._lock:
+                for hit in hits:
+                    new_filter.add(f'id:{hit.meta.id}')
+                    if getattr(hit, 'image_hash', None):
+                        new_filter.add(f'hash:{hit.image_hash}')
+            date_created = datetime.datetime.fromisoformat(hits[-1].date_created)
+            if date_created.tzinfo is None:
+                date_created = date_created.replace(tzinfo=zoneinfo.ZoneInfo('UTC'))
+            watermark = max(watermark, date_created) if watermark else date_created
+            search_after = list(hits[-1].meta.sort)
+
+        if new_filter.count > new_filter.capacity:
+            logger.warning(
+                f'Image existence filter holds {new_filter.count} values, more than its capacity of '
+                f'{new_filter.capacity}, false positives will increase'
+            )
+
+        if self._filter is None:
+            logger.info(f'Image existence filter loaded in {time.monotonic() - started:.1f}s')
+        self._filter = new_filter
+        self._watermark = watermark
+        # the refresh counts from when it started, documents created while it ran might be missing
+        self._last_refresh = started
+
+
+image_existence_filter = ImageExistenceFilter()
@@ -6,46 +6,95 @@ from ddtrace import tracer
 from django.conf import settings
 from PIL import Image
 
+from backend.dataroom.utils.http_client import get_http_client
+
+# the endpoints resize the images to 224px anyway
+EMBEDDING_IMAGE_SIZE = 224
+
+
+def get_embedding_image_file(pil_image: Image, image_name):
+    """
+    Encode an image for the embedding endpoints, downscaled so that its short edge is EMBEDDING_IMAGE_SIZE to make
+    the network call faster. Smaller images are sent as is.
+
+    @return: tuple of (name, file, content type) of a multipart file
+    """
+    content_type, encoding = mimetypes.guess_type(image_name)
+    image_format = pil_image.format or 'PNG'
+
+    scale = EMBEDDING_IMAGE_SIZE / min(pil_image.size)
+    if scale < 1:
+        size = (max(1, round(pil_image.width * scale)), max(1, round(pil_image.height * scale)))
+        pil_image = pil_image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    image_file = BytesIO()
+    pil_image.save(image_file, image_format)
+    image_file.seek(0)
+    return (image_name, image_file, content_type)
+
+
+def get_embedding_client():
+    return get_http_client('embedding', max_connections=settings.FETCH_EMBEDDING_MAX_CONCURRENCY)
+
+
+def get_headers(header_key, header_value):
+    if header_key:
+        return {header_key: header_value}
+    return {}
+
 
 @tracer.wrap()
 def fetch_coca_embedding(pil_image: Image, image_name):
     if not settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL:
         return None
 
-    content_type, encoding = mimetypes.guess_type(image_name)
+    response = get_embedding_client().request(
+        timeout=30,
+        method="post",
+        url=settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL,
+        files={'imageFile': get_embedding_image_file(pil_image, image_name)},
+        headers=get_headers(
+            settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_KEY, settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_VALUE
+        ),
+    )
+    response.raise_for_status()
+    if response.content:
+        return response.json()['imageEmbedding']
+    else:
+        raise ValueError("No content in response")
+
 
-    # resize the image to make the network call faster
-    # the endpoint will resize to 224 anyway
-    pil_image.resize((224, 224), Image.Resampling.LANCZOS)
-
-    with BytesIO() as temp_thumb:
-        pil_image.save(temp_thumb, pil_image.format)
-        temp_thumb.seek(0)
-
-        files = {
-            'imageFile': (image_name, temp_thumb, content_type),
-        }
-        try:
-            with httpx.Client() as client:
-                headers = {}
-                if settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_KEY:
-                    k = settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_KEY
-                    headers[k] = settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_VALUE
-                response = client.request(
-                    timeout=30,
-                    method="post",
-                    url=settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL,
-                    files=files,
-                    headers=headers,
-                )
-                response.raise_for_status()
-        except httpx.HTTPError as e:
-            raise e
-        else:
-            if response.content:
-                return response.json()['imageEmbedding']
-            else:
-                raise ValueError("No content in response")
+@tracer.wrap()
+def fetch_coca_embeddings(images):
+    """
+    Fetch the embeddings of multiple images with one call. The images are sent as multiple "imageFile" parts and the
+    endpoint returns their "imageEmbeddings" in the same order. Only use it with FETCH_EMBEDDING_FOR_IMAGE_BATCH_SIZE
+    > 1, when the endpoint supports batches.
+
+    @param images: list of (PIL image, image name) tuples
+    @return: list of vectors, or None when the embedding API is not configured
+    """
+    if not settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL:
+        return None
+    if len(images) == 1:
+        return [fetch_coca_embedding(*images[0])]
+
+    response = get_embedding_client().request(
+        timeout=30 * len(images),
+        method="post",
+        url=settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL,
+        files=[('imageFile', get_embedding_image_file(pil_image, image_name)) for pil_image, image_name in images],
+        headers=get_headers(
+            settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_KEY, settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_VALUE
+        ),
+    )
+    response.raise_for_status()
+    if not response.content:
+        raise ValueError("No content in response")
+    vectors = response.json()['imageEmbeddings']
+    if len(vectors) != len(images):
+        raise ValueError(f"Got {len(vectors)} embeddings for {len(images)} images")
+    return vectors
 
 
 @tracer.wrap()
@@ -53,40 +102,21 @@ async def fetch_coca_embedding_async(pil_image: Image, image_name):
     if not settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL:
         return None
 
-    content_type, encoding = mimetypes.guess_type(image_name)
-
-    # resize the image to make the network call faster
-    # the endpoint will resize to 224 anyway
-    pil_image.resize((224, 224), Image.Resampling.LANCZOS)
-
-    with BytesIO() as temp_thumb:
-        pil_image.save(temp_thumb, pil_image.format)
-        temp_thumb.seek(0)
-
-        files = {
-            'imageFile': (image_name, temp_thumb, content_type),
-        }
-        try:
-            async with httpx.AsyncClient() as client:
-                headers = {}
-                if settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_KEY:
-                    k = settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_KEY
-                    headers[k] = settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_VALUE
-                response = await client.request(
-                    timeout=30,
-                    method="post",
-                    url=settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL,
-                    files=files,
-                    headers=headers,
-                )
-                response.raise_for_status()
-        except httpx.HTTPError as e:
-            raise e
-        else:
-            if response.content:
-                return response.json()['imageEmbedding']
-            else:
-                raise ValueError("No content in response")
+    async with httpx.AsyncClient() as client:
+        response = await client.request(
+            timeout=30,
+            method="post",
+            url=settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL,
+            files={'imageFile': get_embedding_image_file(pil_image, image_name)},
+            headers=get_headers(
+                settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_KEY, settings.FETCH_EMBEDDING_FOR_IMAGE_HEADER_VALUE
+            ),
+        )
+        response.raise_for_status()
+    if response.content:
+        return response.json()['imageEmbedding']
+    else:
+        raise ValueError("No content in response")
 
 
 @tracer.wrap()
@@ -94,40 +124,18 @@ def fetch_text_for_image(pil_image: Image, image_name):
     if not settings.FETCH_TEXT_FOR_IMAGE_API_URL:
         return None
 
-    content_type, encoding = mimetypes.guess_type(image_name)
-
-    # resize the image to make the network call faster
-    # the endpoint will resize to 224 anyway
-    pil_image.resize((224, 224), Image.Resampling.LANCZOS)
-
-    with BytesIO() as temp_thumb:
-        pil_image.save(temp_thumb, pil_image.format)
-        temp_thumb.seek(0)
-
-        files = {
-            'imageFile': (image_name, temp_thumb, content_type),
-        }
-        try:
-            with httpx.Client() as client:
-                headers = {}
-                if settings.FETCH_TEXT_FOR_IMAGE_HEADER_KEY:
-                    k = settings.FETCH_TEXT_FOR_IMAGE_HEADER_KEY
-                    headers[k] = settings.FETCH_TEXT_FOR_IMAGE_HEADER_VALUE
-                response = client.request(
-                    timeout=30,
-                    method="post",
-                    url=settings.FETCH_TEXT_FOR_IMAGE_API_URL,
-                    files=files,
-                    headers=headers,
-                )
-                response.raise_for_status()
-        except httpx.HTTPError as e:
-            raise e
-        else:
-            if response.content:
-                return response.json()['caption']
-            else:
-                raise ValueError("No content in response")
+    response = get_embedding_client().request(
+        timeout=30,
+        method="post",
+        url=settings.FETCH_TEXT_FOR_IMAGE_API_URL,
+        files={'imageFile': get_embedding_image_file(pil_image, image_name)},
+        headers=get_headers(settings.FETCH_TEXT_FOR_IMAGE_HEADER_KEY, settings.FETCH_TEXT_FOR_IMAGE_HEADER_VALUE),
+    )
+    response.raise_for_status()
+    if response.content:
+        return response.json()['caption']
+    else:
+        raise ValueError("No content in response")
 
 
 @tracer.wrap()
@@ -135,26 +143,19 @@ def fetch_coca_embedding_for_text(text):
     if not settings.FETCH_EMBEDDING_FOR_TEXT_API_URL:
         return None
 
-    try:
-        with httpx.Client() as client:
-            headers = {}
-            if settings.FETCH_EMBEDDING_FOR_TEXT_HEADER_KEY:
-                k = settings.FETCH_EMBEDDING_FOR_TEXT_HEADER_KEY
-                headers[k] = settings.FETCH_EMBEDDING_FOR_TEXT_HEADER_VALUE
-            response = client.request(
-                timeout=30,
-                method="post",
-                url=settings.FETCH_EMBEDDING_FOR_TEXT_API_URL,
-                files={
-                    "caption": (None, text),
-                },
-                headers=headers,
-            )
-            response.raise_for_status()
-    except httpx.HTTPError as e:
-        raise e
+    response = get_embedding_client().request(
+        timeout=30,
+        method="post",
+        url=settings.FETCH_EMBEDDING_FOR_TEXT_API_URL,
+        files={
+            "caption": (None, text),
+        },
+        headers=get_headers(
+            settings.FETCH_EMBEDDING_FOR_TEXT_HEADER_KEY, settings.FETCH_EMBEDDING_FOR_TEXT_HEADER_VALUE
+        ),
+    )
+    response.raise_for_status()
+    if response.content:
+        return response.json()['textEmbedding']
     else:
-        if response.content:
-            return response.json()['textEmbedding']
-        else:
-            raise ValueError("No content in response")
+        raise ValueError("No content in response")
@@ -0,0 +1,35 @@
+import threading
+
+import httpx
+from django.conf import settings
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(name='default', max_connections=None, timeout=None):
+    """
+    Get a process-wide pooled httpx client. Clients are created once per name and reused, so connections (and
+    HTTP/2 streams) are shared between requests and threads.
+
+    @param name: name of the client, to keep separate pools for different services
+    @param max_connections: maximum number of connections in the pool
+    @param timeout: default timeout in seconds
+    """
+    client = _clients.get(name)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        if name not in _clients:
+            max_connections = max_connections or settings.HTTP_CLIENT_MAX_CONNECTIONS
+            _clients[name] = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=httpx.Timeout(timeout or settings.HTTP_CLIENT_TIMEOUT, connect=10),
+                follow_redirects=True,
+            )
+        return _clients[name]
@@ -0,0 +1,160 @@
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from backend.dataroom.choices import DuplicateState
+from backend.dataroom.opensearch import OS
+from backend.dataroom.utils.union_find import UnionFind
+
+# faiss is optional, its flat index is faster than NumPy for the range searches
+FAISS_AVAILABLE = importlib.util.find_spec('faiss') is not None
+
+VECTOR_DIMENSION = 768
+# duplicate_state stored as int8 in the matrix files
+DUPLICATE_STATE_CODES = {DuplicateState.UNPROCESSED: 0, DuplicateState.ORIGINAL: 1, DuplicateState.DUPLICATE: 2}
+
+
+class VectorMatrix:
+    """
+    The embeddings of a set of images in a memory-mapped float16 matrix, with their IDs, pixel counts and duplicate
+    states, so that millions of vectors can be compared without holding them in memory.
+    """
+
+    def __init__(self, path, count):
+        self.count = count
+        self.vectors = np.lib.format.open_memmap(path, mode='w+', dtype=np.float16, shape=(count, VECTOR_DIMENSION))
+        self.ids = [None] * count
+        self.pixel_counts = np.zeros(count, dtype=np.int64)
+        self.duplicate_states = np.zeros(count, dtype=np.int8)
+        self._next_row = 0
+        self._lock = threading.Lock()
+
+    def append(self, hits):
+        """Add a page of hits, from any thread"""
+        with self._lock:
+            start = self._next_row
+            self._next_row += len(hits)
+        if start + len(hits) > self.count:
+            raise ValueError('More images than counted, the images changed while they were loaded')
+        for row, hit in enumerate(hits, start=start):
+            doc = hit['_source']
+            self.vectors[row] = doc['coca_embedding_vector']
+            self.ids[row] = hit['_id']
+            self.pixel_counts[row] = (doc.get('width') or 0) * (doc.get('height') or 0)
+            self.duplicate_states[row] = DUPLICATE_STATE_CODES[DuplicateState(doc.get('duplicate_state'))]
+
+    def truncate(self):
+        """Drop the rows of images that were deleted while they were counted and loaded"""
+        self.count = self._next_row
+        self.vectors = self.vectors[: self.count]
+        self.ids = self.ids[: self.count]
+        self.pixel_counts = self.pixel_counts[: self.count]
+        self.duplicate_states = self.duplicate_states[: self.count]
+
+
+def load_vectors(matrix, index, query, slices=8, page_size=1000, scroll='10m'):
+    """
+    Stream the embeddings of the images matching a query into a VectorMatrix, with one sliced scroll per thread.
+
+    @param matrix: VectorMatrix with enough rows for the images
+    @param index: index of the images
+    @param query: OpenSearch query of the images
+    @param slices: number of partitions read in parallel
+    @param page_size: number of images per page
+    @param scroll: how long the scroll contexts are kept between two pages
+    """
+
+    def load_slice(slice_id):
+        body = {
+            'query': query,
+            'size': page_size,
+            'sort': ['_doc'],
+            '_source': ['coca_embedding_vector', 'width', 'height', 'duplicate_state'],
+        }
+        if slices > 1:
+            body['slice'] = {'id': slice_id, 'max': slices}
+        response = OS.client.search(index=index, body=body, scroll=scroll)
+        scroll_id = response.get('_scroll_id')
+        try:
+            while response['hits']['hits']:
+                matrix.append(response['hits']['hits'])
+                response = OS.client.scroll(scroll_id=scroll_id, scroll=scroll)
+                scroll_id = response.get('_scroll_id', scroll_id)
+        finally:
+            OS.client.clear_scroll(scroll_id=scroll_id, ignore=[404])
+
+    with ThreadPoolExecutor(max_workers=slices) as executor:
+        # raises the errors of the slices
+        list(executor.map(load_slice, range(slices)))
+    matrix.truncate()
+    matrix.vectors.flush()
+
+
+def find_similar_pairs(vectors, threshold, block_size=4096, use_faiss=FAISS_AVAILABLE):
+    """
+    Exact similarity join of normalized vectors: compare every pair of rows block by block, so the memory used is
+    bounded by block_size² similarities whatever the number of vectors.
+
+    @param vectors: matrix of normalized vectors, e.g. a float16 memmap
+    @param threshold: minimum cosine similarity of the pairs
+    @param block_size: number of rows compared at once
+    @param use_faiss: use a faiss flat index for each block instead of NumPy
+    @return: generator of (row, other row) pairs with row < other row
+    """
+    count = len(vectors)
+    for start in range(0, count, block_size):
+        block = np.asarray(vectors[start : start + block_size], dtype=np.float32)
+        for other_start in range(start, count, block_size):
+            other_block = np.asarray(vectors[other_start : other_start + block_size], dtype=np.float32)
+            if use_faiss:
+                rows, other_rows = _faiss_range_search(block, other_block, threshold)
+            else:
+                rows, other_rows = np.nonzero(block @ other_block.T > threshold)
+            rows = rows + start
+            other_rows = other_rows + other_start
+            # each pair once, without the vectors compared to themselves
+            for row, other_row in zip(rows.tolist(), other_rows.tolist(), strict=True):
+                if row < other_row:
+                    yield row, other_row
+
+
+def _faiss_range_search(block, other_block, threshold):
+    import faiss
+
+    index = faiss.IndexFlatIP(other_block.shape[1])
+    index.add(other_block)
+    lims, similarities, other_rows = index.range_search(block, threshold)
+    rows = np.repeat(np.arange(len(block)), np.diff(lims))
+    # range_search includes the similarities equal to the threshold
+    above = similarities > threshold
+    return rows[above], other_rows[above]
+
+
+def get_duplicate_states(matrix, pairs):
+    """
+    Group the images into connected components of similar images, the largest image of each component is the
+    original and the others are duplicates.
+
+    @param matrix: loaded VectorMatrix
+    @param pairs: (row, other row) pairs of similar images, streamed so they are never all in memory
+    @return: tuple of (dict of image ID to the new DuplicateState for the images whose state changes, number of pairs)
+    """
+    union_find = UnionFind()
+    pair_count = 0
+    for row, other_row in pairs:
+        union_find.union(row, other_row)
+        pair_count += 1
+
+    states = np.full(matrix.count, DUPLICATE_STATE_CODES[DuplicateState.ORIGINAL], dtype=np.int8)
+    for group in union_find.groups():
+        original = min(group, key=lambda row: (-matrix.pixel_counts[row], matrix.ids[row]))
+        for row in group:
+            if row != original:
+                states[row] = DUPLICATE_STATE_CODES[DuplicateState.DUPLICATE]
+
+    codes_to_states = {code: state for state, code in DUPLICATE_STATE_CODES.items()}
+    changed = np.nonzero(states != matrix.duplicate_states)[0]
+    new_states = {matrix.ids[row]: codes_to_states[int(states[row])] for row in changed.tolist()}
+    return new_states, pair_count
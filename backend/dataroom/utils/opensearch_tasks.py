@@ -0,0 +1,87 @@
+from backend.dataroom.opensearch import OS
+
+PROGRESS_KEYS = ['created', 'deleted', 'updated', 'noops', 'version_conflicts']
+
+
+def get_opensearch_task(task_id):
+    return OS.client.transport.perform_request(
+        'GET',
+        f'/_tasks/{task_id}',
+        timeout=10,
+    )
+
+
+def get_opensearch_task_status(task_id, main_task=None):
+    """
+    Get the progress of a long running OpenSearch task (reindex, update_by_query, delete_by_query). For sliced
+    tasks the progress is summed over the running child tasks.
+
+    @param task_id: OpenSearch task ID, e.g. "node:123"
+    @param main_task: response of GET /_tasks/<task_id>, fetched when not provided
+    @return: dict with the task status
+    """
+    if main_task is None:
+        main_task = get_opensearch_task(task_id)
+    task_status = main_task.get('task', {}).get('status', {})
+    completed = main_task.get('completed', False)
+
+    # the final counts are in the response once the task is completed
+    counts = main_task.get('response', task_status) if completed else task_status
+    total = counts.get('total', 0)
+    progress = sum([counts.get(key, 0) for key in ['created', 'deleted', 'updated', 'noops']])
+    totals = {key: counts.get(key, 0) for key in PROGRESS_KEYS}
+
+    elapsed_seconds = main_task.get('task', {}).get('running_time_in_nanos', 0) / 1000000000
+
+    if not completed and len(task_status.get('slices', [])) > 0:
+        # use the progress of the child tasks instead
+        child_tasks_response = OS.client.transport.perform_request(
+            'GET',
+            '/_tasks',
+            params={
+                'detailed': 'true',
+                'parent_task_id': task_id,
+            },
+            timeout=10,
+        )
+
+        total = 0
+        progress = 0
+        totals = {key: 0 for key in PROGRESS_KEYS}
+        for node in child_tasks_response['nodes'].values():
+            for child_task in node['tasks'].values():
+                child_status = child_task.get('status', {})
+                total += child_status.get('total', 0)
+                progress += sum([child_status.get(key, 0) for key in ['created', 'deleted', 'updated', 'noops']])
+                for key in PROGRESS_KEYS:
+                    totals[key] += child_status.get(key, 0)
+
+    remaining_seconds = (elapsed_seconds / progress * (total - progress)) if progress and not completed else 0
+    return {
+        'task_id': task_id,
+        'action': main_task.get('task', {}).get('action'),
+        'description': main_task.get('task', {}).get('description'),
+        'completed': completed,
+        'cancelled': bool(
+            task_status.get('canceled')
+            or main_task.get('response', {}).get('canceled')
+            or main_task.get('task', {}).get('cancelled')
+        ),
+        'error': main_task.get('error'),
+        'failures': main_task.get('response', {}).get('failures', []),
+        'total': total,
+        'progress': progress,
+        'percent': progress / total * 100 if total else (100 if completed else 0),
+        **totals,
+        'elapsed_seconds': elapsed_seconds,
+        'remaining_seconds': remaining_seconds,
+    }
+
+
+def cancel_opensearch_task(task_id):
+    """Cancel a running OpenSearch task and its child tasks, the work done so far is kept"""
+    return OS.client.transport.perform_request(
+        'POST',
+        f'/_tasks/{task_id}/_cancel',
+        timeout=10,
+    )
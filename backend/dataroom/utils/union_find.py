@@ -0,0 +1,35 @@
+class UnionFind:
+    """
+    Disjoint sets of hashable items, to group items into connected components.
+
+    Usage:
+
+        union_find = UnionFind()
+        union_find.union('a', 'b')
+        union_find.union('b', 'c')
+        union_find.groups()  # [['a', 'b', 'c']]
+    """
+
+    def __init__(self):
+        self._parents = {}
+
+    def find(self, item):
+        self._parents.setdefault(item, item)
+        root = item
+        while self._parents[root] != root:
+            root = self._parents[root]
+        # path compression
+        while self._parents[item] != root:
+            self._parents[item], item = root, self._parents[item]
+        return root
+
+    def union(self, item, other):
+        root, other_root = self.find(item), self.find(other)
+        if root != other_root:
+            self._parents[other_root] = root
+
+    def groups(self):
+        groups = {}
+        for item in self._parents:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
@@ -0,0 +1,220 @@
+import functools
+import logging
+import math
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger('task_runner')
+
+# number of recent task durations kept for the percentiles
+DURATION_SAMPLES = 1000
+PERCENTILES = (50, 95, 99)
+
+
+def timed(task_function):
+    """Wrap a task function to return its duration in seconds, the runner measures the tasks with their results"""
+
+    @functools.wraps(task_function)
+    def timed_task(*args, **kwargs):
+        start_time = time.perf_counter()
+        task_function(*args, **kwargs)
+        return time.perf_counter() - start_time
+
+    return timed_task
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+class TaskMetrics:
+    """Counters and gauges of a queued task, updated by its scheduler thread and read by the exporters"""
+
+    def __init__(self, name, items_processed=0, failures=0, retries=0):
+        self.name = name
+        self.items_processed = items_processed
+        self.failures = failures
+        self.retries = retries
+        self.items_per_second = 0.0
+        self.feed_seconds = 0.0
+        self.queue_depth = 0
+        self._durations = deque(maxlen=DURATION_SAMPLES)
+        self._lock = threading.Lock()
+
+    def task_done(self, duration, items):
+        with self._lock:
+            self._durations.append(duration)
+            self.items_processed += items
+
+    def task_failed(self, items):
+        with self._lock:
+            self.failures += items
+
+    def task_retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def fed(self, seconds):
+        self.feed_seconds = seconds
+
+    def queue(self, depth, items_per_second):
+        self.queue_depth = depth
+        self.items_per_second = items_per_second
+
+    def snapshot(self):
+        with self._lock:
+            durations = sorted(self._durations)
+            snapshot = {
+                'items_processed': self.items_processed,
+                'items_per_second': self.items_per_second,
+                'failures': self.failures,
+                'retries': self.retries,
+                'feed_seconds': self.feed_seconds,
+                'queue_depth': self.queue_depth,
+            }
+        for percent in PERCENTILES:
+            snapshot[f'duration_p{percent}'] = percentile(durations, percent)
+        return snapshot
+
+
+class MetricsRegistry:
+    """
+    Metrics of all the queued tasks of the runner. They are exported in the Prometheus text format, to statsd and
+    to Stats rows for the admin.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            if name not in self.tasks:
+                self.tasks[name] = TaskMetrics(name)
+            return self.tasks[name]
+
+    def load(self, counters):
+        """Continue the counters saved by a previous run, a dict of task name to counters"""
+        for name, values in counters.items():
+            metrics = self.get(name)
+            metrics.items_processed = values.get('items_processed', 0)
+            metrics.failures = values.get('failures', 0)
+            metrics.retries = values.get('retries', 0)
+
+    def snapshots(self):
+        with self._lock:
+            tasks = list(self.tasks.values())
+        return {metrics.name: metrics.snapshot() for metrics in tasks}
+
+    def to_prometheus(self, prefix='dataroom_task'):
+        snapshots = self.snapshots()
+        lines = []
+
+        def add(name, metric_type, key, help_text):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {metric_type}')
+            for task, snapshot in snapshots.items():
+                lines.append(f'{prefix}_{name}{{task="{task}"}} {snapshot[key]}')
+
+        add('items_total', 'counter', 'items_processed', 'Items processed')
+        add('items_per_second', 'gauge', 'items_per_second', 'Items processed per second, moving average')
+        add('failures_total', 'counter', 'failures', 'Items that failed after all the retries')
+        add('retries_total', 'counter', 'retries', 'Retried tasks')
+        add('feed_seconds', 'gauge', 'feed_seconds', 'Duration of the last queue feed')
+        add('queue_depth', 'gauge', 'queue_depth', 'Items in the queue')
+        lines.append(f'# HELP {prefix}_duration_seconds Duration of the tasks')
+        lines.append(f'# TYPE {prefix}_duration_seconds summary')
+        for task, snapshot in snapshots.items():
+            for percent in PERCENTILES:
+                value = snapshot[f'duration_p{percent}']
+                lines.append(f'{prefix}_duration_seconds{{task="{task}",quantile="{percent / 100}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def to_statsd(self, prefix):
+        """Gauges of all the metrics in the statsd line format"""
+        lines = []
+        for task, snapshot in self.snapshots().items():
+            for key, value in snapshot.items():
+                lines.append(f'{prefix}.{task}.{key}:{value}|g')
+        return lines
+
+
+class StatsdClient:
+    """Fire-and-forget statsd client over UDP"""
+
+    # keep the UDP packets under the usual MTU
+    MAX_PACKET_SIZE = 1400
+
+    def __init__(self, host, port=8125, prefix='dataroom.task_runner'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, registry):
+        packet = b''
+        for line in registry.to_statsd(self.prefix):
+            data = line.encode()
+            if packet and len(packet) + len(data) + 1 > self.MAX_PACKET_SIZE:
+                self._send(packet)
+                packet = b''
+            packet = packet + b'\n' + data if packet else data
+        if packet:
+            self._send(packet)
+
+    def _send(self, packet):
+        try:
+            self.socket.sendto(packet, self.address)
+        except OSError as e:
+            logger.warning(f'Failed to send metrics to statsd: {e}')
+
+
+def start_metrics_server(registry, port, host='0.0.0.0'):
+    """Serve the metrics in the Prometheus text format on /metrics, in a daemon thread"""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            data = registry.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, log_format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f'Task runner metrics available at http://{host}:{server.server_port}/metrics')
+    return server
+
+
+def start_metrics_reporting(registry, interval_seconds, statsd_client=None):
+    """Save the metrics to Stats rows and send them to statsd every interval_seconds, in a daemon thread"""
+    from django.db import close_old_connections
+
+    from backend.dataroom.models.stats import Stats
+
+    def report():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                close_old_connections()
+                Stats.objects.update_task_runner_stats(registry.snapshots())
+            except Exception as e:
+                logger.error(f'Failed to save the task runner stats: {e}')
+            if statsd_client:
+                statsd_client.send(registry)
+
+    thread = threading.Thread(target=report, daemon=True)
+    thread.start()
+    return thread
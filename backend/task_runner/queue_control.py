@@ -0,0 +1,97 @@
+import math
+import time
+
+# weight of the last feed interval in the moving averages
+SMOOTHING = 0.2
+# number of feed intervals of work requested from the adaptive queue feeds
+FEED_LOOKAHEAD = 5
+
+
+def is_overload_error(error):
+    """Whether an error means that OpenSearch rejects requests because it is overloaded"""
+    from opensearchpy import ConnectionTimeout, TransportError
+    from opensearchpy.helpers import BulkIndexError
+
+    if isinstance(error, ConnectionTimeout):
+        return True
+    if isinstance(error, TransportError):
+        return error.status_code in (429, 503)
+    if isinstance(error, BulkIndexError):
+        return any(item.get('status') == 429 for error_item in error.errors for item in error_item.values())
+    return False
+
+
+class QueueController:
+    """
+    Measures the throughput and the latency of a queued task to size its queue, and backs off its queue feed when
+    OpenSearch is overloaded.
+
+    The queue holds target_queue_seconds of work at the measured throughput (Little's law), between min_queue_size
+    and desired_queue_size, so slow tasks don't read items long before they process them and fast tasks don't
+    starve. The feed interval doubles up to max_backoff_seconds when OpenSearch rejects requests or its latency is
+    above max_latency_seconds, and halves back to queue_feed_interval_seconds once it recovers.
+    """
+
+    def __init__(self, task, max_latency_seconds=2.0, max_backoff_seconds=60):
+        self.task = task
+        self.max_latency_seconds = max_latency_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.throughput = 0.0  # completed items per second
+        self.latency = 0.0  # seconds from submission to completion of the items
+        self.feed_interval = task.queue_feed_interval_seconds
+        self.submitted_at = {}  # item key -> submission time
+        self._last_time = time.time()
+
+    @property
+    def backing_off(self):
+        return self.feed_interval > self.task.queue_feed_interval_seconds
+
+    def submitted(self, keys, now=None):
+        now = now or time.time()
+        for key in keys:
+            self.submitted_at[key] = now
+
+    def completed(self, keys, now=None):
+        """Update the moving averages with the items completed since the last call"""
+        now = now or time.time()
+        rate = len(keys) / max(now - self._last_time, 0.001)
+        self.throughput = SMOOTHING * rate + (1 - SMOOTHING) * self.throughput
+        latencies = [now - self.submitted_at.pop(key) for key in keys if key in self.submitted_at]
+        if latencies:
+            self.latency = SMOOTHING * (sum(latencies) / len(latencies)) + (1 - SMOOTHING) * self.latency
+        self._last_time = now
+
+    def get_queue_size(self):
+        """Target number of items in the queue"""
+        task = self.task
+        if not task.target_queue_seconds:
+            return task.desired_queue_size
+        if self.throughput <= 0:
+            # enough to keep every worker busy until the throughput is known
+            size = task.workers * (task.batch_size or 1)
+        else:
+            size = math.ceil(self.throughput * task.target_queue_seconds)
+        return min(task.desired_queue_size, max(size, task.min_queue_size))
+
+    def get_feed_size(self, queue_size):
+        """
+        Number of items to get from the queue feed: enough to keep the workers busy for the next few feeds, without
+        filling the queue with items that are read long before they are processed.
+        """
+        free = self.get_queue_size() - queue_size
+        if self.throughput <= 0:
+            return free
+        expected = math.ceil(self.throughput * self.feed_interval * FEED_LOOKAHEAD)
+        return min(free, max(expected, self.task.min_feed_size))
+
+    def fed(self, duration, error=None):
+        """Adapt the feed interval to the duration or the error of the last queue feed, an OpenSearch search"""
+        if (error is not None and is_overload_error(error)) or duration > self.max_latency_seconds:
+            self.feed_interval = min(self.feed_interval * 2, self.max_backoff_seconds)
+        elif error is None:
+            self.feed_interval = max(self.feed_interval / 2, self.task.queue_feed_interval_seconds)
+
+    def failed(self, error):
+        """Back off when a task failed because OpenSearch rejected its requests"""
+        if is_overload_error(error):
+            self.feed_interval = min(self.feed_interval * 2, self.max_backoff_seconds)
@@ -6,17 +6,28 @@ from threading import Thread
 
 from dask.distributed import Client, LocalCluster, WorkerPlugin
 
+from backend.task_runner.metrics import (
+    MetricsRegistry,
+    StatsdClient,
+    start_metrics_reporting,
+    start_metrics_server,
+    timed,
+)
+from backend.task_runner.queue_control import QueueController
 from backend.task_runner.task_config import PeriodicTaskConfig, QueuedTaskConfig
 from backend.task_runner.tasks import (
+    delete_disabled_latents_task,
     delete_duplicates_task,
     delete_marked_for_deletion_task,
+    ingestion_task,
     mark_duplicates_task,
-    # update_coca_embedding_task,
+    r2_migration_task,
+    update_coca_embedding_task,
     update_count_stats_task,
     update_queue_stats_task,
     update_thumbnail_task,
 )
-from backend.task_runner.tasks.utils import TaskResult
+from backend.task_runner.tasks.utils import TaskResult, chunks
 
 logger = logging.getLogger('task_runner')
 logger.setLevel(logging.INFO)
@@ -144,14 +155,36 @@ def start_periodic_tasks(client, tasks: list[PeriodicTaskConfig] | None = None):
         threads.append(task_thread)
 
 
-def start_queued_tasks(client, tasks: list[QueuedTaskConfig] | None = None):
+def start_queued_tasks(client, tasks: list[QueuedTaskConfig] | None = None, metrics: MetricsRegistry | None = None):
     # Start queue-based tasks
     if tasks is None:
         tasks = []
+    if metrics is None:
+        metrics = MetricsRegistry()
+
+    from django.conf import settings
 
     def start_queued_task(task):
-        futures = []
+        futures = {}  # item key -> future of the items in the queue
+        batches = {}  # future key -> (future, task argument, item keys, attempts)
         next_kwargs = {}
+        progress = None  # told which fed items are queued and done, e.g. the Scan of a scan_page feed
+        controller = QueueController(
+            task,
+            max_latency_seconds=settings.TASK_RUNNER_MAX_OPENSEARCH_LATENCY_SECONDS,
+            max_backoff_seconds=settings.TASK_RUNNER_MAX_BACKOFF_SECONDS,
+        )
+        task_metrics = metrics.get(task.name)
+        # the futures return the duration of the task
+        task_function = timed(task.task_function)
+        suppressed_total = 0
+
+        def submit(arg, item_keys, attempts):
+            future = client.submit(task_function, arg, pure=False, resources=task.resources)
+            batches[future.key] = (future, arg, item_keys, attempts)
+            for key in item_keys:
+                futures[key] = future
+
         while True:
             # Monitor worker status
             n_workers = len(client.scheduler_info()['workers'])
@@ -160,47 +193,94 @@ def start_queued_tasks(client, tasks: list[QueuedTaskConfig] | None = None):
                 time.sleep(5)  # Wait before retrying
                 continue
 
-            # Clean up completed futures and explicitly cancel any failed ones
-            current_futures = []
-            for f in futures:
-                if f.done():
-                    if f.status == 'error':
-                        f.cancel()
+            # Clean up completed futures, retry the failed ones up to task.retries times
+            completed = []
+            for future_key, (f, arg, item_keys, attempts) in list(batches.items()):
+                if not f.done():
+                    continue
+                del batches[future_key]
+                if f.status == 'finished':
+                    task_metrics.task_done(f.result(), len(item_keys))
                 else:
-                    current_futures.append(f)
-            futures = current_futures
+                    error = f.exception() if f.status == 'error' else None
+                    controller.failed(error)
+                    f.cancel()
+                    if error is not None and attempts <= task.retries:
+                        task_metrics.task_retried()
+                        submit(arg, item_keys, attempts + 1)
+                        continue
+                    task_metrics.task_failed(len(item_keys))
+                    logger.error(f'Task {task.name} failed for {len(item_keys)} items: {error}')
+                for key in item_keys:
+                    del futures[key]
+                completed.extend(item_keys)
+            controller.completed(completed)
+            if progress is not None and completed:
+                progress.completed(completed)
 
             queue_size = len(futures)
-            logger.info(f'Queue size for {task.name}: {queue_size} (workers: {n_workers})')
+            desired_queue_size = controller.get_queue_size()
+            task_metrics.queue(queue_size, controller.throughput)
+            logger.info(
+                f'Queue size for {task.name}: {queue_size}/{desired_queue_size} (workers: {n_workers}, '
+                f'throughput: {controller.throughput:.1f}/s, latency: {controller.latency:.1f}s)'
+            )
+            if controller.backing_off:
+                logger.warning(f'OpenSearch is overloaded, feeding {task.name} every {controller.feed_interval:.1f}s')
 
-            if queue_size < task.desired_queue_size:
+            if queue_size < desired_queue_size:
                 # retrieve new items and submit tasks
+                feed_start_time = time.time()
                 try:
-                    task_result = task.queue_feed_function(**next_kwargs)
+                    feed_kwargs = {**task.queue_feed_kwargs, **next_kwargs}
+                    if task.adaptive_feed_size:
+                        feed_kwargs['size'] = controller.get_feed_size(queue_size)
+                    task_result = task.queue_feed_function(**feed_kwargs)
+                    controller.fed(time.time() - feed_start_time)
+                    task_metrics.fed(time.time() - feed_start_time)
                     if isinstance(task_result, TaskResult):
                         items = task_result.result
                         next_kwargs = task_result.next_kwargs
+                        progress = task_result.progress
                     else:
                         items = task_result
-                    logger.info(f'Got {len(items)} items for {task.name}')
-                    if items:
+
+                    # items that are still in the queue are not submitted again
+                    new_items = {}
+                    for item in items:
+                        key = task.item_key(item)
+                        if key not in futures:
+                            new_items[key] = item
+                    suppressed = len(items) - len(new_items)
+                    suppressed_total += suppressed
+                    logger.info(
+                        f'Got {len(items)} items for {task.name}, {suppressed} already queued '
+                        f'({suppressed_total} since start)'
+                    )
+                    if new_items:
                         # task submission
                         try:
-                            new_futures = client.map(
-                                task.task_function,
-                                items,
-                                retries=task.retries,
-                                resources={'MEMORY_GB': 2},
-                            )
-                            futures.extend(new_futures)
+                            keys = list(new_items.keys())
+                            if task.batch_size:
+                                # the items of a batch share its future
+                                for batch_keys in chunks(keys, task.batch_size):
+                                    submit([new_items[key] for key in batch_keys], batch_keys, attempts=1)
+                            else:
+                                for key in keys:
+                                    submit(new_items[key], [key], attempts=1)
+                            controller.submitted(keys)
                         except Exception as e:
                             logger.error(f"Failed to submit tasks for {task.name}: {e!s}")
                     else:
                         logger.info(f'No items to process for {task.name}')
+                    if progress is not None:
+                        # the items already in the queue count as well, they are done once their future is
+                        progress.fed([key for key in map(task.item_key, items) if key in futures])
                 except Exception as e:
+                    controller.fed(time.time() - feed_start_time, error=e)
                     logger.error(f'Error fetching items for {task.name}: {e}')
 
-            time.sleep(task.queue_feed_interval_seconds)
+            time.sleep(controller.feed_interval)
 
     threads = []
     for task in tasks:
@@ -240,17 +320,24 @@ def main():
     args = parser.parse_args()
     init_django(args.settings)
 
+    from django.conf import settings
+
     periodic_tasks = [
         update_count_stats_task,
         update_queue_stats_task,
+        delete_disabled_latents_task,
     ]
     queued_tasks = [
         delete_duplicates_task,
         delete_marked_for_deletion_task,
+        ingestion_task,
         update_thumbnail_task,
-        # update_coca_embedding_task,
         mark_duplicates_task,
     ]
+    if settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL:
+        queued_tasks.append(update_coca_embedding_task)
+    if settings.R2_MIGRATION_PARTITIONS:
+        queued_tasks.extend(r2_migration_task.partitioned(settings.R2_MIGRATION_PARTITIONS))
 
     workers = args.workers or os.getenv("DASK_WORKERS", None)
     if isinstance(workers, str):
@@ -267,8 +354,21 @@ def main():
 
     client = init_dask_client(settings_name=args.settings, workers=workers, threads=threads)
 
+    from backend.dataroom.models.stats import Stats
+
+    metrics = MetricsRegistry()
+    metrics.load(Stats.objects.get_task_runner_stats())
+    if settings.TASK_RUNNER_METRICS_PORT:
+        start_metrics_server(metrics, settings.TASK_RUNNER_METRICS_PORT)
+    statsd_client = None
+    if settings.TASK_RUNNER_STATSD_HOST:
+        statsd_client = StatsdClient(
+            settings.TASK_RUNNER_STATSD_HOST, settings.TASK_RUNNER_STATSD_PORT, settings.TASK_RUNNER_STATSD_PREFIX
+        )
+    start_metrics_reporting(metrics, settings.TASK_RUNNER_METRICS_INTERVAL_SECONDS, statsd_client=statsd_client)
+
     start_periodic_tasks(client, periodic_tasks)
-    start_queued_tasks(client, queued_tasks)
+    start_queued_tasks(client, queued_tasks, metrics=metrics)
 
     # keep the main program running indefinitely
     try:
@@ -1,6 +1,16 @@
+import copy
+
+
+def get_item_key(item):
+    """Identify queued items by their ID (images) or value (IDs, batches of IDs)"""
+    if isinstance(item, list):
+        return tuple(item)
+    return getattr(item, 'id', item)
+
+
 class TaskConfig:
-    def __init__(self, task_function, workers=1):
-        self.name = task_function.__name__
+    def __init__(self, task_function, workers=1, name=None):
+        self.name = name or task_function.__name__
         self.task_function = task_function
         self.workers = workers
 
@@ -26,17 +36,58 @@ class QueuedTaskConfig(TaskConfig):
         workers=1,
         retries=3,
         queue_feed_interval_seconds=1,
+        adaptive_feed_size=False,
+        min_feed_size=10,
+        item_key=get_item_key,
+        batch_size=None,
+        target_queue_seconds=None,
+        min_queue_size=10,
+        resources=None,
+        queue_feed_kwargs=None,
+        name=None,
     ):
         """
         @param task_function: Function that processes items from the queue
         @param queue_feed_function: Function that returns items to be processed by the task
-        @param desired_queue_size: Desired queue size
+        @param desired_queue_size: Desired queue size, the maximum queue size with target_queue_seconds
         @param workers: Number of workers to run the task
         @param retries: Number of retries for the task function
         @param queue_feed_interval_seconds: How often to check the queue size and feed new items to the task
+        @param adaptive_feed_size: Pass a size argument to the queue feed function, adapted to the measured throughput
+        @param min_feed_size: Minimum size passed to the queue feed function
+        @param item_key: Function that identifies an item, items that are already in the queue are not submitted again
+        @param batch_size: Submit the items in lists of up to batch_size items, the task function processes a list
+        @param target_queue_seconds: Size the queue to hold this many seconds of work at the measured throughput
+        @param min_queue_size: Minimum queue size with target_queue_seconds
+        @param resources: Dask resources used by each task, see the resources of the cluster in run.py
+        @param queue_feed_kwargs: Keyword arguments of every call of the queue feed function
+        @param name: Name of the task, the name of the task function by default
         """
-        super().__init__(task_function, workers=workers)
+        super().__init__(task_function, workers=workers, name=name)
         self.queue_feed_function = queue_feed_function
         self.desired_queue_size = desired_queue_size
         self.retries = retries
         self.queue_feed_interval_seconds = queue_feed_interval_seconds
+        self.adaptive_feed_size = adaptive_feed_size
+        self.min_feed_size = min_feed_size
+        self.item_key = item_key
+        self.batch_size = batch_size
+        self.target_queue_seconds = target_queue_seconds
+        self.min_queue_size = min_queue_size
+        self.resources = resources if resources is not None else {'MEMORY_GB': 2}
+        self.queue_feed_kwargs = queue_feed_kwargs or {}
+
+    def partitioned(self, partitions):
+        """
+        Split a task fed by a scan (see scan_page) in partitions that are fed and queued in parallel, the queue feed
+        function gets the partition and partitions arguments.
+
+        @return: list of the tasks of the partitions
+        """
+        tasks = []
+        for partition in range(partitions):
+            task = copy.copy(self)
+            task.name = f'{self.name}_{partition}' if partitions > 1 else self.name
+            task.queue_feed_kwargs = {**self.queue_feed_kwargs, 'partition': partition, 'partitions': partitions}
+            tasks.append(task)
+        return tasks
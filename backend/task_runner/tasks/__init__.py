@@ -2,54 +2,86 @@ from backend.task_runner.task_config import PeriodicTaskConfig, QueuedTaskConfig
 from backend.task_runner.tasks.delete_images import (
     get_images_marked_as_duplicates,
     get_images_marked_for_deletion,
-    image_delete_duplicates,
-    image_delete_marked_for_deletion,
+    image_delete_duplicates_batch,
+    image_delete_marked_for_deletion_batch,
 )
+from backend.task_runner.tasks.delete_latents import delete_disabled_latents
+from backend.task_runner.tasks.ingestion import get_ingestion_batches, ingest_batch
 from backend.task_runner.tasks.r2_migration import r2_migration_fetch_files, r2_migration_get_all_files
 from backend.task_runner.tasks.update_datadog import update_datadog_dashboard
 from backend.task_runner.tasks.update_images import (
     get_images_without_duplicate_state,
     get_images_without_embedding,
     get_images_without_thumbnail,
-    image_mark_duplicates,
-    image_update_coca_embedding,
-    image_update_thumbnail,
+    image_mark_duplicates_batch,
+    image_update_coca_embedding_batch,
+    image_update_thumbnail_batch,
 )
 from backend.task_runner.tasks.update_stats import update_count_stats, update_queue_stats
 
 delete_duplicates_task = QueuedTaskConfig(
-    task_function=image_delete_duplicates,
+    task_function=image_delete_duplicates_batch,
     queue_feed_function=get_images_marked_as_duplicates,
-    desired_queue_size=500,
+    desired_queue_size=5000,
+    target_queue_seconds=30,
+    adaptive_feed_size=True,
     workers=6,
+    batch_size=100,
+    resources={'MEMORY_GB': 1},
 )
 
 delete_marked_for_deletion_task = QueuedTaskConfig(
-    task_function=image_delete_marked_for_deletion,
+    task_function=image_delete_marked_for_deletion_batch,
     queue_feed_function=get_images_marked_for_deletion,
-    desired_queue_size=500,
+    desired_queue_size=5000,
+    target_queue_seconds=30,
+    adaptive_feed_size=True,
+    workers=2,
+    batch_size=100,
+    resources={'MEMORY_GB': 1},
+)
+
+# each item is a batch of INGESTION_BATCH_SIZE queued writes
+ingestion_task = QueuedTaskConfig(
+    task_function=ingest_batch,
+    queue_feed_function=get_ingestion_batches,
+    desired_queue_size=8,
     workers=2,
+    resources={'MEMORY_GB': 1},
 )
 
 update_thumbnail_task = QueuedTaskConfig(
-    task_function=image_update_thumbnail,
+    task_function=image_update_thumbnail_batch,
     queue_feed_function=get_images_without_thumbnail,
     desired_queue_size=500,
+    target_queue_seconds=30,
+    adaptive_feed_size=True,
     workers=6,
+    batch_size=20,
+    # the images of a batch are decoded concurrently
+    resources={'MEMORY_GB': 4},
 )
 
+# only started when FETCH_EMBEDDING_FOR_IMAGE_API_URL is set
 update_coca_embedding_task = QueuedTaskConfig(
-    task_function=image_update_coca_embedding,
+    task_function=image_update_coca_embedding_batch,
     queue_feed_function=get_images_without_embedding,
     desired_queue_size=500,
+    target_queue_seconds=30,
+    adaptive_feed_size=True,
     workers=4,
+    batch_size=32,
 )
 
 mark_duplicates_task = QueuedTaskConfig(
-    task_function=image_mark_duplicates,
+    task_function=image_mark_duplicates_batch,
     queue_feed_function=get_images_without_duplicate_state,
-    desired_queue_size=500,
+    desired_queue_size=2000,
+    target_queue_seconds=30,
+    adaptive_feed_size=True,
     workers=12,
+    batch_size=50,
+    resources={'MEMORY_GB': 1},
 )
 
 update_datadog_dashboard_task = PeriodicTaskConfig(
@@ -67,6 +99,11 @@ update_queue_stats_task = PeriodicTaskConfig(
     interval_seconds=60 * 2,
 )
 
+delete_disabled_latents_task = PeriodicTaskConfig(
+    task_function=delete_disabled_latents,
+    interval_seconds=60 * 15,
+)
+
 r2_migration_task = QueuedTaskConfig(
     task_function=r2_migration_fetch_files,
     queue_feed_function=r2_migration_get_all_files,
@@ -1,11 +1,12 @@
 import logging
 
 from backend.dataroom.choices import DuplicateState
+from backend.task_runner.tasks.utils import TaskResult, search_page
 
 logger = logging.getLogger('task_runner')
 
 
-def get_images_marked_as_duplicates(sources=None):
+def get_images_marked_as_duplicates(sources=None, size=500, pit_id=None, search_after=None):
     from backend.dataroom.models.os_image import OSImage
 
     if not sources:
@@ -13,22 +14,15 @@ def get_images_marked_as_duplicates(sources=None):
 
         sources = settings.DUPLICATE_DELETE_TASK_INCLUDED_SOURCES
 
-    search = (
-        OSImage.objects.search(
-            sort="_doc",
-            fields=["id", "duplicate_state"],
-        )
-        .filter(
-            "bool",
-            must=[
-                {"terms": {"source": sources}},
-                {"term": {"duplicate_state": DuplicateState.DUPLICATE.value}},
-            ],
-        )
-        .extra(size=500)
+    search = OSImage.objects.search(fields=["id", "duplicate_state"]).filter(
+        "bool",
+        must=[
+            {"terms": {"source": sources}},
+            {"term": {"duplicate_state": DuplicateState.DUPLICATE.value}},
+        ],
     )
-    results = search.execute()
-    return [hit.meta.id for hit in results]
+    hits, next_kwargs = search_page(search, OSImage.INDEX, size, pit_id=pit_id, search_after=search_after)
+    return TaskResult(result=[hit['_id'] for hit in hits], next_kwargs=next_kwargs)
 
 
 def image_delete_duplicates(image_id):
@@ -38,24 +32,28 @@ def image_delete_duplicates(image_id):
     image.delete_permanently()
 
 
-def get_images_marked_for_deletion():
+def image_delete_duplicates_batch(image_ids):
     from backend.dataroom.models.os_image import OSImage
 
-    search = (
-        OSImage.all_objects.search(
-            sort="_doc",
-            fields=["id"],
-        )
-        .filter(
-            "bool",
-            must=[
-                {"term": {"is_deleted": True}},
-            ],
-        )
-        .extra(size=500)
+    images = OSImage.objects.get_multiple(
+        image_ids, fields=['id', 'image', 'thumbnail', 'latents'], number=len(image_ids)
     )
-    results = search.execute()
-    return [hit.meta.id for hit in results]
+    result = OSImage.delete_permanently_multiple(images)
+    if result['failed']:
+        logger.error(f"Failed to delete {len(result['failed'])} duplicates")
+
+
+def get_images_marked_for_deletion(size=500, pit_id=None, search_after=None):
+    from backend.dataroom.models.os_image import OSImage
+
+    search = OSImage.all_objects.search(fields=["id"]).filter(
+        "bool",
+        must=[
+            {"term": {"is_deleted": True}},
+        ],
+    )
+    hits, next_kwargs = search_page(search, OSImage.INDEX, size, pit_id=pit_id, search_after=search_after)
+    return TaskResult(result=[hit['_id'] for hit in hits], next_kwargs=next_kwargs)
 
 
 def image_delete_marked_for_deletion(image_id):
@@ -64,3 +62,14 @@ def image_delete_marked_for_deletion(image_id):
     image = OSImage.all_objects.get(image_id, fields=['id', 'image', 'thumbnail', 'latents', 'is_deleted'])
     if image.is_deleted:
         image.delete_permanently()
+
+
+def image_delete_marked_for_deletion_batch(image_ids):
+    from backend.dataroom.models.os_image import OSImage
+
+    images = OSImage.all_objects.get_multiple(
+        image_ids, fields=['id', 'image', 'thumbnail', 'latents', 'is_deleted'], number=len(image_ids)
+    )
+    result = OSImage.delete_permanently_multiple([image for image in images if image.is_deleted])
+    if result['failed']:
+        logger.error(f"Failed to delete {len(result['failed'])} images marked for deletion")
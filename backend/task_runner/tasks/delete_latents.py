@@ -1,4 +1,7 @@
 import logging
+import time
+
+from backend.task_runner.tasks.utils import TaskResult, search_page
 
 logger = logging.getLogger('task_runner')
 
@@ -9,42 +12,83 @@ def get_disabled_latent_types():
     return list(LatentType.objects.filter(is_enabled=False).values_list('name', flat=True))
 
 
-def get_images_with_disabled_latents(latent_types):
+def get_images_with_disabled_latents(latent_types, size=500, pit_id=None, search_after=None):
     from backend.dataroom.models.os_image import OSImage, OSLatent
 
     assert isinstance(latent_types, list)
     if not latent_types:
-        return []
-
-    OSImage.objects.refresh()
+        return TaskResult(result=[])
 
-    search = (
-        OSImage.all_objects.search(
-            sort="_doc",
-            fields=["id"],
-        )
-        .filter(
-            "bool",
-            should=[
-                {"exists": {"field": OSLatent(latent_type=latent_type).os_name_file}} for latent_type in latent_types
-            ],
-            minimum_should_match=1,
-            _expand__to_dot=False,
-        )
-        .extra(size=500)
+    search = OSImage.all_objects.search(fields=["id"]).filter(
+        "bool",
+        should=[{"exists": {"field": OSLatent(latent_type=latent_type).os_name_file}} for latent_type in latent_types],
+        minimum_should_match=1,
+        _expand__to_dot=False,
     )
-    results = search.execute()
-    return [hit.meta.id for hit in results]
+    hits, next_kwargs = search_page(search, OSImage.INDEX, size, pit_id=pit_id, search_after=search_after)
+    return TaskResult(result=[hit['_id'] for hit in hits], next_kwargs=next_kwargs)
 
 
-def image_delete_latents(image_id, latent_types, refresh=False):
+def image_delete_latents(image_id, latent_types, refresh=None):
+    image_delete_latents_batch([image_id], latent_types, refresh=refresh)
+
+
+def image_delete_latents_batch(image_ids, latent_types, refresh=None):
+    """Remove the latents of the given types from a batch of images"""
+    from django.conf import settings
+
     from backend.dataroom.models.os_image import OSImage
 
     assert isinstance(latent_types, list)
+    if not latent_types:
+        return {}
+
+    images = OSImage.all_objects.get_multiple(image_ids, fields=['id', 'latents'], number=len(image_ids))
+    if refresh is None:
+        refresh = settings.OPENSEARCH_BULK_REFRESH
+    return OSImage.remove_latents_multiple(images, latent_types, refresh=refresh)
+
+
+def delete_disabled_latents():
+    """
+    Remove the latents of the disabled latent types from all the images, one batch of
+    DISABLED_LATENTS_CLEANUP_BATCH_SIZE images at a time. The run stops after DISABLED_LATENTS_CLEANUP_MAX_SECONDS,
+    the next run continues with the images that are left. The progress is reported with the
+    IMAGES_WITH_DISABLED_LATENTS stat.
+    """
+    from django.conf import settings
+
+    from backend.dataroom.models.stats import Stats
+    from backend.dataroom.opensearch import OS
+
+    latent_types = get_disabled_latent_types()
     if not latent_types:
         return
 
-    image = OSImage.all_objects.get(image_id, fields=['id', 'latents'])
-    for latent_type in latent_types:
-        if latent_type in image.latents.latents:
-            image.remove_latent(latent_type, refresh=refresh)
+    start_time = time.time()
+    removed = 0
+    failed = 0
+    next_kwargs = {}
+    while time.time() - start_time < settings.DISABLED_LATENTS_CLEANUP_MAX_SECONDS:
+        page = get_images_with_disabled_latents(
+            latent_types, size=settings.DISABLED_LATENTS_CLEANUP_BATCH_SIZE, **next_kwargs
+        )
+        if page.result:
+            results = image_delete_latents_batch(page.result, latent_types)
+            removed += sum(result in ['updated', 'noop'] for result in results.values())
+            failed += sum(result not in ['updated', 'noop'] for result in results.values())
+            Stats.objects.update_stats_images_with_disabled_latents()
+        next_kwargs = page.next_kwargs
+        if not next_kwargs:
+            break
+    else:
+        # the next run starts a new pass with the images that are left
+        if next_kwargs:
+            OS.client.delete_point_in_time(body={'pit_id': [next_kwargs['pit_id']]}, ignore=[404])
+        logger.info('Disabled latents cleanup stopped after DISABLED_LATENTS_CLEANUP_MAX_SECONDS')
+
+    Stats.objects.update_stats_images_with_disabled_latents()
+    logger.info(
+        f'Removed the disabled latents {", ".join(latent_types)} of {removed} images in '
+        f'{time.time() - start_time:.1f}s, {failed} failed'
+    )
@@ -0,0 +1,169 @@
+import logging
+
+logger = logging.getLogger('task_runner')
+
+
+def get_ingestion_batches(max_batches=4):
+    """
+    Claim the oldest queued writes, in batches of about INGESTION_BATCH_SIZE items. The batches are indexed in
+    parallel, so all the writes of an image are kept in the same batch.
+    """
+    from django.conf import settings
+
+    from backend.dataroom.models.ingestion import IngestionItem
+
+    released = IngestionItem.objects.release_stale()
+    if released:
+        logger.warning(f'Released {released} stale ingestion items')
+
+    batch_size = settings.INGESTION_BATCH_SIZE
+    batches = []
+    image_batches = {}  # image ID -> batch of its writes
+    for item_id, image_id in IngestionItem.objects.claim(batch_size * max_batches):
+        if image_id not in image_batches:
+            if not batches or len(batches[-1]) >= batch_size:
+                batches.append([])
+            image_batches[image_id] = batches[-1]
+        image_batches[image_id].append(item_id)
+    return batches
+
+
+def ingest_batch(item_ids):
+    """
+    Index a batch of queued writes with bulk requests. The creates are indexed before the updates are read, so an
+    update of an image created in the same batch finds it. Items that fail because of OpenSearch are queued again
+    until INGESTION_MAX_ATTEMPTS, invalid items (e.g. an update of an image that was deleted) fail right away.
+    """
+    from django.conf import settings
+    from django.utils import timezone
+    from opensearchpy.helpers import BulkIndexError
+
+    from backend.dataroom.audit_log import current_author
+    from backend.dataroom.choices import IngestionOperation, IngestionStatus
+    from backend.dataroom.models.ingestion import IngestionItem, IngestionTicket
+    from backend.dataroom.models.os_image import OSImage
+    from backend.dataroom.models.tag import Tag
+    from backend.dataroom.opensearch import OSBulkIndex
+
+    items = list(IngestionItem.objects.filter(id__in=item_ids, status=IngestionStatus.PROCESSING))
+    if not items:
+        return
+    creates = [item for item in items if item.operation == IngestionOperation.CREATE]
+    updates = [item for item in items if item.operation == IngestionOperation.UPDATE]
+
+    errors = {}  # item ID -> error of items that can't be indexed
+    retry = {}  # item ID -> error of items to queue again
+    done = set()
+
+    def index(images, write, refresh):
+        """Index the images of the items (item ID -> (image, updated fields)) and sort the items by result"""
+        if not images:
+            return
+        Tag.objects.ensure_exist(tag for image, _ in images.values() for tag in image.tags or [])
+        os_bulk = OSBulkIndex(refresh=refresh)
+        try:
+            with os_bulk:
+                for item in items:
+                    if item.id in images:
+                        write(item, *images[item.id], os_bulk)
+        except BulkIndexError:
+            # the errors of each document are in os_bulk.results
+            pass
+        except Exception as e:
+            logger.error(f'Failed to index ingestion batch of {len(images)} items: {e}')
+            retry.update({item_id: str(e) for item_id, (image, _) in images.items() if image.id not in os_bulk.results})
+
+        for item in items:
+            if item.id not in images or item.id in retry:
+                continue
+            result = os_bulk.results.get(images[item.id][0].id)
+            if result in ['created', 'updated', 'noop']:
+                done.add(item.id)
+            elif result == 'not_found':
+                errors[item.id] = f"Image with ID '{item.image_id}' was not found"
+            else:
+                retry[item.id] = str(result)
+
+    if creates:
+        # images created since the writes were accepted
+        latent_types_map = OSImage.get_latent_types_map()
+        existing = OSImage.all_objects.find_existing(
+            ids=[item.image_id for item in creates],
+            image_hashes=[item.payload['doc']['image_hash'] for item in creates],
+            fields=['id', 'image_hash'],
+        )
+        existing_hashes = {image.id: image.image_hash for image in existing['id']}
+        existing_hashes.update({image.id: image.image_hash for image in existing['image_hash']})
+        seen_ids = set(existing_hashes.keys())
+        seen_hashes = set(existing_hashes.values())
+        images = {}
+        for item in creates:
+            image_hash = item.payload['doc']['image_hash']
+            if existing_hashes.get(item.image_id) == image_hash and item.attempts > 0:
+                # indexed by a previous attempt
+                done.add(item.id)
+            elif item.image_id in seen_ids:
+                errors[item.id] = f"Image with ID '{item.image_id}' already exists"
+            elif image_hash in seen_hashes:
+                errors[item.id] = f"Image hash of ID '{item.image_id}' already exists"
+            else:
+                image = OSImage.from_hit({'_id': item.image_id, '_source': item.payload['doc']}, latent_types_map)
+                images[item.id] = (image, None)
+            seen_ids.add(item.image_id)
+            seen_hashes.add(image_hash)
+
+        def create(item, image, _, os_bulk):
+            image.create(bulk_index=os_bulk)
+
+        # the creates must be searchable right away for the duplicate checks of the next writes
+        index(images, create, settings.OPENSEARCH_CREATE_REFRESH)
+
+    if updates:
+        # images deleted since the writes were accepted, read in real time to find the images created above. The
+        # updated images are not read so they are shared by the updates of the same image, which are applied in order.
+        existing = OSImage.all_objects.find_existing(ids={item.image_id for item in updates}, fields=['id'])
+        images_by_id = {image.id: image for image in existing['id']}
+        retried_creates = {item.image_id for item in creates if item.id in retry}
+        images = {}
+        for item in updates:
+            image = images_by_id.get(item.image_id)
+            if image is None and item.image_id in retried_creates:
+                # queued again with the create of the image
+                retry[item.id] = f"Image with ID '{item.image_id}' is not created yet"
+                continue
+            if image is None:
+                errors[item.id] = f"Image with ID '{item.image_id}' was not found"
+                continue
+            updated_fields = image.set_update_fields(item.payload['data'], author=item.payload.get('author'))
+            images[item.id] = (image, updated_fields)
+
+        def save(item, image, updated_fields, os_bulk):
+            # blind partial updates, like the synchronous bulk update, by the author of the request
+            token = current_author.set(item.payload.get('author'))
+            try:
+                image.save(fields=updated_fields, bulk_index=os_bulk, if_unchanged=False)
+            finally:
+                current_author.reset(token)
+
+        index(images, save, settings.OPENSEARCH_BULK_REFRESH)
+
+    now = timezone.now()
+    for item in items:
+        item.date_updated = now
+        if item.id in done:
+            item.status = IngestionStatus.DONE
+            item.error = ''
+        elif item.id in errors:
+            item.status = IngestionStatus.FAILED
+            item.error = errors[item.id]
+        else:
+            item.attempts += 1
+            item.error = retry.get(item.id, '')
+            max_attempts_reached = item.attempts >= settings.INGESTION_MAX_ATTEMPTS
+            item.status = IngestionStatus.FAILED if max_attempts_reached else IngestionStatus.PENDING
+    IngestionItem.objects.bulk_update(items, ['status', 'attempts', 'error', 'date_updated'])
+
+    for ticket in IngestionTicket.objects.filter(id__in={item.ticket_id for item in items}):
+        ticket.update_status()
+
+    logger.info(f'Ingested {len(done)} items, {len(errors)} failed and {len(retry)} to retry')
@@ -2,26 +2,24 @@ import contextlib
 
 import requests
 
-from backend.task_runner.tasks.utils import TaskResult
+from backend.task_runner.tasks.utils import TaskResult, scan_page
 
 
-def r2_migration_get_all_files(search_after=None):
+def r2_migration_get_all_files(size=200, partition=0, partitions=1, scan=None):
+    """
+    Get the URLs of all the files of the next page of images. The position of the scan is saved once the files of its
+    pages are fetched, a restart of the task runner continues the migration where it stopped.
+    """
     from backend.dataroom.models.os_image import OSImage
 
     fields = ["id", "image", "thumbnail", "latents"]
-    search = OSImage.all_objects.search(search_after=search_after, fields=fields).extra(size=200)
-
-    response = search.execute()
-
-    if len(response.hits) > 0:
-        last_hit = response.hits[-1]
-        search_after = last_hit.meta.sort
-    else:
-        # no more items
-        return []
+    search = OSImage.all_objects.search(fields=fields)
+    hits, next_kwargs = scan_page(
+        'r2_migration', search, OSImage.INDEX, size, partition=partition, partitions=partitions, scan=scan
+    )
 
     file_urls = []
-    for image in OSImage.list_from_hits(response.hits):
+    for image in OSImage.list_from_hits(hits):
         if image.image_direct_url:
             file_urls.append(image.image_direct_url)
         if image.thumbnail_direct_url:
@@ -30,10 +28,7 @@ def r2_migration_get_all_files(search_after=None):
             if latent.file_direct_url:
                 file_urls.append(latent.file_direct_url)
 
-    return TaskResult(
-        result=file_urls,
-        next_kwargs={'search_after': search_after},
-    )
+    return TaskResult(result=file_urls, next_kwargs=next_kwargs, progress=next_kwargs['scan'])
 
 
 def r2_migration_fetch_files(file_url):
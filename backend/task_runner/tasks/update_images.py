@@ -1,50 +1,68 @@
 import logging
+import time
+
+from backend.task_runner.tasks.utils import TaskResult, search_page
 
 logger = logging.getLogger('task_runner')
 
 
-def get_images_without_thumbnail():
+def get_images_without_thumbnail(size=500, pit_id=None, search_after=None):
     from backend.dataroom.models.os_image import OSImage
 
-    search = (
-        OSImage.objects.search(sort="_doc", fields=["id", "image", "thumbnail", "date_updated"])
-        .filter(
-            "bool",
-            must_not=[
-                {"exists": {"field": "thumbnail"}},
-                {"term": {"thumbnail_error": True}},  # skip previously failed thumbnails
-            ],
-        )
-        .extra(size=500)
+    search = OSImage.objects.search(fields=["id", "image", "thumbnail", "date_updated"]).filter(
+        "bool",
+        must_not=[
+            {"exists": {"field": "thumbnail"}},
+            {"term": {"thumbnail_error": True}},  # skip previously failed thumbnails
+        ],
     )
-    results = search.execute()
-    return OSImage.list_from_hits(results)
+    hits, next_kwargs = search_page(search, OSImage.INDEX, size, pit_id=pit_id, search_after=search_after)
+    return TaskResult(result=OSImage.list_from_hits(hits), next_kwargs=next_kwargs)
 
 
 def image_update_thumbnail(image):
     image.update_thumbnail()
 
 
-def get_images_without_embedding():
+def image_update_thumbnail_batch(images):
     from backend.dataroom.models.os_image import OSImage
 
-    search = (
-        OSImage.objects.search(sort="_doc", fields=["id", "image", "coca_embedding", "date_updated"])
-        .filter(
-            "term",
-            coca_embedding_exists=False,
-        )
-        .extra(size=500)
+    # the images were read by the queue feed
+    start_time = time.time()
+    start_cpu_time = time.process_time()
+    OSImage.update_thumbnails(images)
+    duration = time.time() - start_time
+    cpu_time = time.process_time() - start_cpu_time
+    logger.info(
+        f'Updated {len(images)} thumbnails in {duration:.2f}s, '
+        f'{len(images) / max(cpu_time, 0.001):.1f} images per CPU second'
     )
-    results = search.execute()
-    return OSImage.list_from_hits(results)
+
+
+def get_images_without_embedding(size=500, pit_id=None, search_after=None):
+    from backend.dataroom.models.os_image import OSImage
+
+    search = OSImage.objects.search(fields=["id", "image", "coca_embedding", "date_updated"]).filter(
+        "term",
+        coca_embedding_exists=False,
+    )
+    hits, next_kwargs = search_page(search, OSImage.INDEX, size, pit_id=pit_id, search_after=search_after)
+    return TaskResult(result=OSImage.list_from_hits(hits), next_kwargs=next_kwargs)
 
 
 def image_update_coca_embedding(image):
     image.update_coca_embedding()
 
 
-def get_images_without_duplicate_state(exclude_sources=None):
+def image_update_coca_embedding_batch(images):
+    from backend.dataroom.models.os_image import OSImage
+
+    failed = OSImage.update_coca_embeddings(images)
+    if failed:
+        logger.warning(f'Failed to update the embeddings of {len(failed)} of {len(images)} images')
+
+
+def get_images_without_duplicate_state(exclude_sources=None, size=500, pit_id=None, search_after=None):
     from backend.dataroom.models.os_image import OSImage
 
     if not exclude_sources:
@@ -52,29 +70,28 @@ def get_images_without_duplicate_state(exclude_sources=None):
 
         exclude_sources = settings.DUPLICATE_FINDER_EXCLUDED_SOURCES
 
-    search = (
-        OSImage.objects.search(
-            sort="_doc",
-            fields=["id", "duplicate_state", "coca_embedding", "width", "height"],
-        )
-        .filter(
-            "bool",
-            must_not=[
-                {"exists": {"field": "duplicate_state"}},
-                {"terms": {"source": exclude_sources}},
-            ],
-            must=[
-                {"term": {"coca_embedding_exists": True}},
-                {"term": {"is_deleted": False}},
-            ],
-        )
-        .extra(size=500)
+    search = OSImage.objects.search(fields=["id", "duplicate_state", "coca_embedding", "width", "height"]).filter(
+        "bool",
+        must_not=[
+            {"exists": {"field": "duplicate_state"}},
+            {"terms": {"source": exclude_sources}},
+        ],
+        must=[
+            {"term": {"coca_embedding_exists": True}},
+            {"term": {"is_deleted": False}},
+        ],
     )
-    results = search.execute()
-    return [hit.meta.id for hit in results]
+    hits, next_kwargs = search_page(search, OSImage.INDEX, size, pit_id=pit_id, search_after=search_after)
+    return TaskResult(result=[hit['_id'] for hit in hits], next_kwargs=next_kwargs)
 
 
 def image_mark_duplicates(image_id):
     from backend.dataroom.models.os_image import OSImage
 
     OSImage.mark_duplicates(image_id=image_id)
+
+
+def image_mark_duplicates_batch(image_ids):
+    from backend.dataroom.models.os_image import OSImage
+
+    OSImage.mark_duplicates_batch(image_ids)
@@ -1,3 +1,10 @@
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger('task_runner')
+
+
 def chunks(iterable, chunk_size):
     if iterable is None:
         return
@@ -6,8 +13,222 @@ def chunks(iterable, chunk_size):
 
 
 class TaskResult:
-    def __init__(self, result, next_kwargs=None):
+    def __init__(self, result, next_kwargs=None, progress=None):
         self.result = result
         if next_kwargs is None:
             next_kwargs = {}
         self.next_kwargs = next_kwargs
+        # told by the task runner which items of the feed were queued and which are done, e.g. a Scan
+        self.progress = progress
+
+
+def search_page(search, index, size, pit_id=None, search_after=None):
+    """
+    Get the next page of a search through a point in time (PIT), so that a pass over the results neither repeats nor
+    skips documents while the documents behind the cursor are updated. The returned next_kwargs are passed to the next
+    call, they are empty once the pass is over and the next call starts a new pass with a new PIT.
+
+    @param search: Search sorted on a unique field
+    @param index: index of the search
+    @param size: number of hits to return
+    @param pit_id: ID of the PIT of the current pass
+    @param search_after: sort values of the last hit of the previous page
+    @return: tuple of the hits (as dicts) and the kwargs of the next page
+    """
+    from django.conf import settings
+    from opensearchpy import NotFoundError
+
+    from backend.dataroom.opensearch import OS
+
+    if pit_id is None:
+        response = OS.client.create_point_in_time(index=index, keep_alive=settings.TASK_RUNNER_PIT_KEEP_ALIVE)
+        pit_id = response['pit_id']
+
+    body = search.extra(size=size).to_dict()
+    body['pit'] = {'id': pit_id, 'keep_alive': settings.TASK_RUNNER_PIT_KEEP_ALIVE}
+    if search_after:
+        body['search_after'] = search_after
+    try:
+        hits = OS.client.search(body=body)['hits']['hits']
+    except NotFoundError:
+        # the PIT expired while the queue was full, start a new pass
+        return [], {}
+
+    if len(hits) < size:
+        OS.client.delete_point_in_time(body={'pit_id': [pit_id]}, ignore=[404])
+        return hits, {}
+    return hits, {'pit_id': pit_id, 'search_after': hits[-1]['sort']}
+
+
+class Scan:
+    """
+    Position of a partition of a scan, saved in its ScanCursor once the items of the scanned pages are done. The task
+    runner tells the scan which items of each page were queued (fed) and which are done (completed): the saved
+    position only advances past a page once its items and the ones of the previous pages are done, at most every
+    TASK_RUNNER_SCAN_CHECKPOINT_SECONDS, so the items still in the queue are scanned again after a restart rather than
+    skipped. The scan is completed once the items of its last page are done.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.position = self.get_cursor_position()
+        self.exhausted = self.cursor.is_completed
+        # (position after the page, keys of its items still in the queue, last page of the pass) of the fed pages
+        self.pages = deque()
+        self.checkpoint_time = time.time()
+
+    def get_cursor_position(self):
+        return {
+            'pit_id': self.cursor.pit_id,
+            'search_after': self.cursor.search_after,
+            'items_scanned': self.cursor.items_scanned,
+            'date_pass_started': self.cursor.date_pass_started,
+        }
+
+    def next_page(self, search, index, size):
+        from django.conf import settings
+        from django.utils import timezone
+        from opensearchpy import NotFoundError
+
+        from backend.dataroom.opensearch import OS
+
+        if self.exhausted:
+            # the scan is started over by resetting its cursors
+            if (
+                self.cursor.is_completed
+                and time.time() - self.checkpoint_time >= settings.TASK_RUNNER_SCAN_CHECKPOINT_SECONDS
+            ):
+                self.reload()
+            if self.exhausted:
+                return []
+
+        body = search.extra(size=size).to_dict()
+        if self.cursor.partitions > 1:
+            body['slice'] = {'id': self.cursor.partition, 'max': self.cursor.partitions}
+        if self.position['search_after']:
+            body['search_after'] = self.position['search_after']
+
+        hits = None
+        if self.position['pit_id']:
+            body['pit'] = {'id': self.position['pit_id'], 'keep_alive': settings.TASK_RUNNER_PIT_KEEP_ALIVE}
+            try:
+                hits = OS.client.search(body=body)['hits']['hits']
+            except NotFoundError:
+                # the PIT expired while the runner was stopped, the sort values are still valid with a new one
+                logger.info(f'The point in time of the scan {self.cursor} expired, continuing with a new one')
+        if hits is None:
+            response = OS.client.create_point_in_time(index=index, keep_alive=settings.TASK_RUNNER_PIT_KEEP_ALIVE)
+            self.position['pit_id'] = response['pit_id']
+            self.position['date_pass_started'] = self.position['date_pass_started'] or timezone.now()
+            body['pit'] = {'id': self.position['pit_id'], 'keep_alive': settings.TASK_RUNNER_PIT_KEEP_ALIVE}
+            hits = OS.client.search(body=body)['hits']['hits']
+
+        self.position['items_scanned'] += len(hits)
+        if len(hits) < size:
+            OS.client.delete_point_in_time(body={'pit_id': [self.position['pit_id']]}, ignore=[404])
+            self.exhausted = True
+        else:
+            self.position['search_after'] = hits[-1]['sort']
+        return hits
+
+    def fed(self, keys):
+        """
+        Record the position after the last page with the keys of its items that were queued
+
+        @param keys: keys of the queued items of the page
+        """
+        self.pages.append((dict(self.position), set(keys), self.exhausted))
+        self.advance()
+
+    def completed(self, keys):
+        """
+        Mark items as done, the saved position advances past the pages whose items are all done
+
+        @param keys: keys of the done items
+        """
+        keys = set(keys)
+        for _, pending_keys, _ in self.pages:
+            pending_keys -= keys
+        self.advance()
+
+    def advance(self):
+        from django.conf import settings
+
+        position = None
+        while self.pages and not self.pages[0][1]:
+            position, _, last = self.pages.popleft()
+            if last:
+                self.checkpoint_time = time.time()
+                self.complete(position)
+                return
+        if position is None or time.time() - self.checkpoint_time < settings.TASK_RUNNER_SCAN_CHECKPOINT_SECONDS:
+            return
+        self.checkpoint_time = time.time()
+        self.save(position)
+
+    def complete(self, position):
+        from django.utils import timezone
+
+        self.save(
+            {
+                'pit_id': '',
+                'search_after': None,
+                'items_scanned': position['items_scanned'],
+                'date_pass_started': position['date_pass_started'],
+                'pass_count': self.cursor.pass_count + 1,
+                'date_completed': timezone.now(),
+            }
+        )
+        logger.info(f'The scan {self.cursor} is completed, {self.cursor.items_scanned} items scanned')
+
+    def save(self, fields):
+        """Save the fields unless the cursor was changed elsewhere, e.g. reset from the admin"""
+        from django.utils import timezone
+
+        from backend.dataroom.models.scan_cursor import ScanCursor
+
+        fields = {**fields, 'date_updated': timezone.now()}
+        cursors = ScanCursor.objects.filter(id=self.cursor.id, date_updated=self.cursor.date_updated)
+        if not cursors.update(**fields):
+            logger.warning(f'The cursor of the scan {self.cursor} was changed, continuing from the saved position')
+            self.reload()
+            return
+        for key, value in fields.items():
+            setattr(self.cursor, key, value)
+
+    def reload(self):
+        from backend.dataroom.models.scan_cursor import ScanCursor
+
+        self.cursor = ScanCursor.objects.get_partition(
+            self.cursor.name, partition=self.cursor.partition, partitions=self.cursor.partitions
+        )
+        self.position = self.get_cursor_position()
+        self.exhausted = self.cursor.is_completed
+        self.pages.clear()
+        self.checkpoint_time = time.time()
+
+
+def scan_page(name, search, index, size, partition=0, partitions=1, scan=None):
+    """
+    Get the next page of a long scan over all the documents of a search, e.g. a migration. Unlike search_page, the
+    position of the scan is saved in Postgres (see ScanCursor), so a restart of the task runner continues the scan
+    where it stopped instead of starting it over. The scan can be split in partitions, slices of the documents that
+    are fed in parallel. Once the pass is over, the scan returns no hits until it is started over from the admin.
+    The position is saved once the task runner reports the items of the pages as done (see Scan), so the returned
+    Scan is also the progress of the TaskResult of the feed.
+
+    @param name: name of the scan
+    @param search: Search sorted on a unique field, the sort values stay valid when the PIT expires
+    @param index: index of the search
+    @param size: number of hits to return
+    @param partition: index of the partition, from 0 to partitions - 1
+    @param partitions: number of partitions of the scan
+    @param scan: Scan of the partition returned by the previous call, loaded from its ScanCursor on the first call
+    @return: tuple of the hits (as dicts) and the kwargs of the next page
+    """
+    from backend.dataroom.models.scan_cursor import ScanCursor
+
+    if scan is None:
+        scan = Scan(ScanCursor.objects.get_partition(name, partition=partition, partitions=partitions))
+    hits = scan.next_page(search, index, size)
+    return hits, {'partition': partition, 'partitions': partitions, 'scan': scan}
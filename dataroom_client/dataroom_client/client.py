@@ -1,5 +1,6 @@
 import asyncio
 import functools
+import hashlib
 import inspect
 import threading
 import atexit
@@ -105,6 +106,12 @@ class LatentType(TypedDict, total=False):
     file: DataRoomFile
 
 
+class ImageLatent(TypedDict, total=False):
+    image_id: str
+    latent_type: str
+    file: DataRoomFile
+
+
 class ImageUpdate(TypedDict, total=False):
     id: str  # noqa: A003
     source: Optional[str]
@@ -135,11 +142,14 @@ class DataRoomClient:
     The official client of the DataRoom API. See notebooks for usage examples.
     """
 
-    def __init__(self, api_key=None, api_url=None, timeout=120) -> None:
+    def __init__(self, api_key=None, api_url=None, timeout=120, refresh=None) -> None:
         """
         @param api_key: API key for DataRoom API
         @param api_url: URL of the DataRoom backend API
         @param timeout: Timeout for the API requests
+        @param refresh: Default refresh policy of the writes: "true", "false", "wait_for" or "coalesce". Use "true"
+            or "wait_for" when the writes must be searchable as soon as the requests return. Defaults to the server
+            default.
         """
         self.api_key = api_key or os.environ.get("DATAROOM_API_KEY")
         self.api_url = (
@@ -150,6 +160,7 @@ class DataRoomClient:
             raise DataRoomError("DataRoom api_url is not set")
         self.client = httpx.AsyncClient()
         self.timeout = timeout
+        self.refresh = refresh
 
     # -------------------- Private methods --------------------
 
@@ -182,6 +193,20 @@ class DataRoomClient:
             if response.content:
                 return response.json()
 
+    def _get_refresh_params(self, refresh=None):
+        refresh = refresh if refresh is not None else self.refresh
+        if refresh is None:
+            return None
+        if isinstance(refresh, bool):
+            refresh = "true" if refresh else "false"
+        return {"refresh": refresh}
+
+    def _get_write_params(self, refresh=None, asynchronous=False):
+        params = self._get_refresh_params(refresh) or {}
+        if asynchronous:
+            params["async"] = "true"
+        return params or None
+
     async def _make_paginated_request(
         self, url, limit=1000, params=None, method="GET", json=None, headers=None,
     ) -> list[dict]:
@@ -265,6 +290,64 @@ class DataRoomClient:
         if len(vector[1:-1].split(',')) != 768:
             raise DataRoomError(f"{err_msg} Incorrect length.")
 
+    def _get_create_images_files(self, images: list[ImageCreate]) -> list[tuple]:
+        files = []
+        for i, image in enumerate(images):
+            if 'id' not in image:
+                raise DataRoomError("Missing 'id' field in image")
+            if 'source' not in image:
+                raise DataRoomError("Missing 'source' field in image")
+            if 'image_file' not in image and 'image_url' not in image:
+                raise DataRoomError('Please provide either an "image_file" or "image_url" field')
+
+            image_file = image.get('image_file')
+            if image_file and not isinstance(image_file, DataRoomFile):
+                raise DataRoomError("Argument image_file must be a DataRoomFile")
+
+            if image_file:
+                files.append((
+                    f"image_{i}",
+                    (
+                        image_file.filename,
+                        image_file.bytes_io,
+                        image_file.content_type,
+                    ),
+                ))
+
+            json_data = self._dict_filter_none({
+                "id": image['id'],
+                "source": image['source'],
+                "image_url": image.get('image_url'),
+                "attributes": image.get('attributes'),
+                "tags": image.get('tags'),
+                "related_images": image.get('related_images'),
+                "datasets": image.get('datasets'),
+            })
+            files.append((
+                f"json_{i}",
+                (None, json_module.dumps(json_data), "text/plain")
+            ))
+
+        return files
+
+    def _get_mutation_filters(self, filters: dict) -> dict:
+        query_params = {}
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name == "attributes":
+                value = self._get_attributes_filter(value)
+            elif isinstance(value, (list, tuple)):
+                value = ",".join(value)
+            elif isinstance(value, bool):
+                value = "true" if value else "false"
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, Enum):
+                value = value.value
+            query_params[name] = str(value)
+        return query_params
+
     # -------------------- Utils --------------------
 
     @classmethod
@@ -915,6 +998,7 @@ class DataRoomClient:
         tags: list[str] = None,
         related_images: dict[str, str] | None = None,
         datasets: list[str] = None,
+        refresh: str = None,
     ) -> dict:
         """
         Creates a new image from a local file or a URL.
@@ -933,6 +1017,7 @@ class DataRoomClient:
             }`.
         @param datasets: A list of versioned dataset slugs identifying the datasets to add the image to. E.g.
             `["my-dataset/1", "my-dataset/2", "another-dataset/1"]`.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the newly created image.
         """
         if not image_file and not image_url:
@@ -969,63 +1054,175 @@ class DataRoomClient:
                 ),
                 "json": (None, json_module.dumps(json_data), "text/plain"),
             }
-            return await self._make_request(url="images/", method="POST", files=files)
+            return await self._make_request(
+                url="images/",
+                method="POST",
+                files=files,
+                params=self._get_refresh_params(refresh),
+            )
         else:
             # application/json request
             return await self._make_request(
                 url="images/",
                 method="POST",
+                params=self._get_refresh_params(refresh),
                 json=json_data,
             )
 
     async def create_images(
         self,
         images: list[ImageCreate],
+        refresh: str = None,
+        asynchronous: bool = False,
     ) -> list[dict]:
         """
         Creates multiple images in a single bulk request.
 
         @param images: A list of ImageCreate dictionaries, each defining an image to create.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
+        @param asynchronous: Optional. Return as soon as the images are stored and queued, they are indexed in the
+            background. Use `wait_for_ingestion_ticket` with the returned "ticket_id" to wait for them.
         @return: A list of dictionaries representing the newly created images.
         """
-        files = []
-        for i, image in enumerate(images):
+        files = self._get_create_images_files(images)
+        return await self._make_request(
+            url="images/",
+            method="POST",
+            files=files,
+            params=self._get_write_params(refresh, asynchronous),
+        )
+
+    async def create_images_stream(
+        self,
+        images: list[ImageCreate],
+        refresh: str = None,
+    ) -> dict:
+        """
+        Creates a large number of images (up to 5000) in a single streamed request. The server processes the images
+        while they are being uploaded. Images that fail validation or already exist don't fail the whole request.
+
+        @param images: A list of ImageCreate dictionaries, each defining an image to create.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
+        @return: A dictionary with the IDs of the created images and the images that failed with their errors.
+        """
+        files = self._get_create_images_files(images)
+        return await self._make_request(
+            url="images/bulk_create_stream/",
+            method="POST",
+            files=files,
+            params=self._get_refresh_params(refresh),
+        )
+
+    async def create_images_direct(
+        self,
+        images: list[ImageCreate],
+        max_concurrency: int = 16,
+        refresh: str = None,
+    ) -> dict:
+        """
+        Creates multiple images by uploading their files directly to storage with presigned URLs, so the files don't
+        go through the API. Needs an S3 compatible storage on the server.
+
+        Each image can have a "latents" list of {"latent_type": ..., "file": DataRoomFile} dictionaries.
+
+        @param images: A list of ImageCreate dictionaries, each defining an image to create. "image_url" is not
+            supported, use "image_file".
+        @param max_concurrency: Number of files uploaded in parallel.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
+        @return: A dictionary with the IDs of the created images and the images that failed with their errors.
+        """
+        for image in images:
             if 'id' not in image:
                 raise DataRoomError("Missing 'id' field in image")
             if 'source' not in image:
                 raise DataRoomError("Missing 'source' field in image")
-            if 'image_file' not in image and 'image_url' not in image:
-                raise DataRoomError('Please provide either an "image_file" or "image_url" field')
-
-            image_file = image.get('image_file')
-            if image_file and not isinstance(image_file, DataRoomFile):
+            if not isinstance(image.get('image_file'), DataRoomFile):
                 raise DataRoomError("Argument image_file must be a DataRoomFile")
+            for latent in image.get('latents') or []:
+                if 'latent_type' not in latent:
+                    raise DataRoomError("Missing 'latent_type' field in latent")
+                if not isinstance(latent.get('file'), DataRoomFile):
+                    raise DataRoomError("Property 'file' must be a DataRoomFile")
 
-            if image_file:
-                files.append((
-                    f"image_{i}",
-                    (
-                        image_file.filename,
-                        image_file.bytes_io,
-                        image_file.content_type,
-                    ),
-                ))
-
-            json_data = self._dict_filter_none({
+        # 1. get the presigned upload URLs
+        response = await self._make_request(
+            url="images/direct_upload/",
+            method="POST",
+            json={"images": [
+                {
+                    "id": image['id'],
+                    "filename": image['image_file'].filename,
+                    "content_type": image['image_file'].content_type or "",
+                    "latents": [
+                        {
+                            "latent_type": latent['latent_type'],
+                            "filename": latent['file'].filename,
+                            "content_type": latent['file'].content_type or "",
+                        }
+                        for latent in image.get('latents') or []
+                    ],
+                }
+                for image in images
+            ]},
+        )
+        uploads = {item['id']: item for item in response['images']}
+
+        # 2. upload the files straight to storage
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def upload(file: DataRoomFile, upload_data: dict) -> dict:
+            file.bytes_io.seek(0)
+            content = file.bytes_io.read()
+            async with semaphore:
+                try:
+                    upload_response = await self.client.request(
+                        method=upload_data['method'],
+                        url=upload_data['url'],
+                        content=content,
+                        headers=upload_data['headers'],
+                        timeout=self.timeout,
+                    )
+                    upload_response.raise_for_status()
+                except httpx.HTTPError as e:
+                    raise DataRoomError(e, response=getattr(e, "response", None)) from e
+            return {"size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+
+        upload_tasks = []
+        for image in images:
+            upload_tasks.append(upload(image['image_file'], uploads[image['id']]['upload']))
+            latent_uploads = {latent['latent_type']: latent['upload'] for latent in uploads[image['id']]['latents']}
+            for latent in image.get('latents') or []:
+                upload_tasks.append(upload(latent['file'], latent_uploads[latent['latent_type']]))
+        checksums = iter(await asyncio.gather(*upload_tasks))
+
+        # 3. register all images with a single request
+        commit_images = []
+        for image in images:
+            commit_images.append(self._dict_filter_none({
                 "id": image['id'],
+                "upload_id": uploads[image['id']]['upload_id'],
                 "source": image['source'],
-                "image_url": image.get('image_url'),
+                "filename": image['image_file'].filename,
+                **next(checksums),
                 "attributes": image.get('attributes'),
                 "tags": image.get('tags'),
                 "related_images": image.get('related_images'),
                 "datasets": image.get('datasets'),
-            })
-            files.append((
-                f"json_{i}",
-                (None, json_module.dumps(json_data), "text/plain")
-            ))
-
-        return await self._make_request(url="images/", method="POST", files=files)
+                "latents": [
+                    {
+                        "latent_type": latent['latent_type'],
+                        "filename": latent['file'].filename,
+                        **next(checksums),
+                    }
+                    for latent in image.get('latents') or []
+                ],
+            }))
+        return await self._make_request(
+            url="images/direct_upload_commit/",
+            method="POST",
+            params=self._get_refresh_params(refresh),
+            json={"images": commit_images},
+        )
 
     async def update_image(
         self,
@@ -1037,6 +1234,7 @@ class DataRoomClient:
         coca_embedding: str = None,
         related_images: dict[str, str] | None = None,
         datasets: list[str] = None,
+        refresh: str = None,
     ) -> dict:
         """
         Update the image.
@@ -1061,6 +1259,7 @@ class DataRoomClient:
             }`.
         @param datasets: A list of versioned dataset slugs identifying the datasets to add the image to. E.g.
             `["my-dataset/1", "my-dataset/2", "another-dataset/1"]`.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the updated image.
         """
 
@@ -1107,11 +1306,17 @@ class DataRoomClient:
                 "json",
                 (None, json_module.dumps(image_data), "text/plain")
             ))
-            return await self._make_request(url=f"images/{image_id}/", method="PUT", files=files)
+            return await self._make_request(
+                url=f"images/{image_id}/",
+                method="PUT",
+                files=files,
+                params=self._get_refresh_params(refresh),
+            )
         else:
             return await self._make_request(
                 url=f"images/{image_id}/",
                 method="PUT",
+                params=self._get_refresh_params(refresh),
                 json=self._dict_filter_none({
                     "source": source,
                     "attributes": attributes,
@@ -1125,6 +1330,8 @@ class DataRoomClient:
     async def update_images(
         self,
         images: list[ImageUpdate],
+        refresh: str = None,
+        asynchronous: bool = False,
     ) -> list[dict]:
         """
         Bulk update images.
@@ -1136,6 +1343,9 @@ class DataRoomClient:
          * merge datasets
 
         @param images: A list of ImageUpdate dictionaries, each defining an image to update.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
+        @param asynchronous: Optional. Return as soon as the updates are queued, they are indexed in the background.
+            Use `wait_for_ingestion_ticket` with the returned "ticket_id" to wait for them.
         @return: A list of dictionaries representing the updated images.
         """
         for image in images:
@@ -1151,6 +1361,7 @@ class DataRoomClient:
         return await self._make_request(
             url=f"images/bulk_update/",
             method="PUT",
+            params=self._get_write_params(refresh, asynchronous),
             json=[
                 self._dict_filter_none({
                     "id": image['id'],
@@ -1169,6 +1380,7 @@ class DataRoomClient:
         self,
         image_id: str,
         attributes: dict,
+        refresh: str = None,
     ) -> dict:
         """
         DEPRECATED: Adds or updates attributes for a single image. Please use `update_image` instead.
@@ -1177,6 +1389,7 @@ class DataRoomClient:
 
         @param image_id: The UUID of the image to update.
         @param attributes: A dictionary of attributes to associate with the image.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the updated image.
         """
         logger.warning(
@@ -1187,6 +1400,7 @@ class DataRoomClient:
         return await self._make_request(
             url=f"images/{image_id}/add_attributes/",
             method="PUT",
+            params=self._get_refresh_params(refresh),
             json={
                 "attributes": attributes,
             },
@@ -1195,6 +1409,7 @@ class DataRoomClient:
     async def add_image_attributes_in_bulk(
         self,
         ids_to_attributes: dict[str, dict],
+        refresh: str = None,
     ) -> list[dict]:
         """
         DEPRECATED: Adds or updates attributes for multiple images in bulk. Please use `update_images` instead.
@@ -1202,6 +1417,7 @@ class DataRoomClient:
         Update attributes of a list of images, merging them with the existing attributes.
 
         @param ids_to_attributes: A dictionary mapping image IDs to dictionaries of attributes.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A list of dictionaries representing the updated images.
         """
         logger.warning(
@@ -1212,32 +1428,40 @@ class DataRoomClient:
         return await self._make_request(
             url=f"images/add_attributes_bulk/",
             method="POST",
+            params=self._get_refresh_params(refresh),
             json=[
                 {"image_id": key, "attributes": val}
                 for key, val in ids_to_attributes.items()
             ],
         )
 
-    async def delete_image(self, image_id: str) -> dict:
+    async def delete_image(self, image_id: str, refresh: str = None) -> dict:
         """
         Deletes a single image by its ID.
 
         @param image_id: The UUID of the image to delete.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         """
         return await self._make_request(
             url=f"images/{image_id}/",
             method="DELETE",
+            params=self._get_refresh_params(refresh),
         )
 
-    async def get_image_audit_logs(self, image_id: str) -> list[dict]:
+    async def get_image_audit_logs(self, image_id: str, limit: int | None = 1000, page_size: int = None) -> list[dict]:
         """
-        Retrieves the audit logs for a single image.
+        Retrieves the audit logs for a single image, most recent first. The latest writes can take a few seconds to
+        appear.
 
         @param image_id: The UUID of the image.
+        @param limit: The maximum number of entries to return.
+        @param page_size: The number of entries to return per page.
         @return: A list of audit log entries.
         """
-        return await self._make_request(
+        return await self._make_paginated_request(
             url=f"images/{image_id}/audit_logs/",
+            limit=limit,
+            params=self._dict_filter_none({"page_size": page_size}),
         )
 
     async def get_image_similarity(self, image_id_1: str, image_id_2: str) -> dict:
@@ -1493,6 +1717,7 @@ class DataRoomClient:
         latent_file: DataRoomFile,
         latent_type: str,
         is_mask=None,
+        refresh: str = None,
     ) -> dict:
         """
         DEPRECATED: Attaches a latent representation file to an image. Please use `update_image` instead.
@@ -1501,6 +1726,7 @@ class DataRoomClient:
         @param latent_file: A DataRoomFile object containing the latent data.
         @param latent_type: A string identifying the type of latent.
         @param is_mask: Deprecated parameter.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the updated image.
         """
         logger.warning(
@@ -1528,31 +1754,92 @@ class DataRoomClient:
         return await self._make_request(
             url=f"images/{image_id}/set_latent/",
             method="POST",
+            params=self._get_refresh_params(refresh),
             files=files,
         )
 
-    async def delete_image_latent(self, image_id: str, latent_type: str) -> dict:
+    async def set_images_latents(
+        self,
+        latents: list[ImageLatent],
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        refresh: str = None,
+    ) -> dict:
+        """
+        Sets many latents of many images. The latents are sent in batches, with several batches in parallel.
+
+        @param latents: A list of ImageLatent dictionaries, each with an image_id, latent_type and file.
+        @param batch_size: Number of latents sent per request (max 1000).
+        @param max_concurrency: Number of requests sent in parallel.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
+        @return: A dictionary with the IDs of the updated images and the latents that failed with their errors.
+        """
+        for latent in latents:
+            if 'image_id' not in latent or 'latent_type' not in latent:
+                raise DataRoomError("Missing 'image_id' or 'latent_type' field in latent")
+            if not isinstance(latent.get('file'), DataRoomFile):
+                raise DataRoomError("Latent file must be a DataRoomFile")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def send_batch(batch):
+            files = []
+            for i, latent in enumerate(batch):
+                json_data = {
+                    "image_id": latent['image_id'],
+                    "latent_type": latent['latent_type'],
+                }
+                files.append((
+                    f"latent_json_{i}",
+                    (None, json_module.dumps(json_data), "text/plain"),
+                ))
+                files.append((
+                    f"latent_{i}",
+                    (latent['file'].filename, latent['file'].bytes_io, latent['file'].content_type),
+                ))
+            async with semaphore:
+                return await self._make_request(
+                    url="images/bulk_set_latents/",
+                    method="POST",
+                    files=files,
+                    params=self._get_refresh_params(refresh),
+                )
+
+        responses = await asyncio.gather(*[
+            send_batch(latents[i:i + batch_size]) for i in range(0, len(latents), batch_size)
+        ])
+
+        result = {"updated": [], "failed": []}
+        for response in responses:
+            result["updated"] += [image_id for image_id in response["updated"] if image_id not in result["updated"]]
+            result["failed"] += response["failed"]
+        return result
+
+    async def delete_image_latent(self, image_id: str, latent_type: str, refresh: str = None) -> dict:
         """
         Deletes a latent representation from an image.
 
         @param image_id: The UUID of the image to update.
         @param latent_type: The type of the latent to delete.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the updated image.
         """
         return await self._make_request(
             url=f"images/{image_id}/delete_latent/",
             method="POST",
+            params=self._get_refresh_params(refresh),
             json={
                 "latent_type": latent_type,
             },
         )
 
-    async def set_image_coca_embedding(self, image_id: str, vector: str) -> dict:
+    async def set_image_coca_embedding(self, image_id: str, vector: str, refresh: str = None) -> dict:
         """
         DEPRECATED: Sets the CoCa embedding vector for an image. Please use `update_image` instead.
 
         @param image_id: The UUID of the image to update.
         @param vector: A string representation of the 768-float embedding vector.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the updated image.
         """
         logger.warning(
@@ -1563,6 +1850,7 @@ class DataRoomClient:
         return await self._make_request(
             url=f"images/{image_id}/",
             method="PUT",
+            params=self._get_refresh_params(refresh),
             json={
                 "coca_embedding": vector,
             },
@@ -1646,17 +1934,19 @@ class DataRoomClient:
             ),
         )
 
-    async def tag_images(self, image_ids: list[str], tag_names: list[str]) -> list[dict]:
+    async def tag_images(self, image_ids: list[str], tag_names: list[str], refresh: str = None) -> list[dict]:
         """
         Associates a list of tags with a list of images.
 
         @param image_ids: A list of image UUIDs to tag.
         @param tag_names: A list of tag names to apply to the images.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A list of dictionaries representing the tagged images.
         """
         return await self._make_request(
             url="tags/tag_images/",
             method="PUT",
+            params=self._get_refresh_params(refresh),
             json={
                 "image_ids": image_ids,
                 "tag_names": tag_names,
@@ -1735,38 +2025,137 @@ class DataRoomClient:
             method="POST",
         )
 
-    async def dataset_add_images(self, slug_version: str, image_ids: list[str]) -> dict:
+    async def dataset_add_images(self, slug_version: str, image_ids: list[str], refresh: str = None) -> dict:
         """
         Adds a list of images to a dataset version.
 
         @param slug_version: The identifier for the dataset version, e.g. "my-dataset/1".
         @param image_ids: A list of image UUIDs to add to the dataset.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the updated dataset.
         """
         return await self._make_request(
             url=f"datasets/{slug_version}/images/",
             method="POST",
+            params=self._get_refresh_params(refresh),
             json={
                 "image_ids": image_ids,
             },
         )
 
-    async def dataset_remove_images(self, slug_version: str, image_ids: list[str]) -> dict:
+    async def dataset_remove_images(self, slug_version: str, image_ids: list[str], refresh: str = None) -> dict:
         """
         Removes a list of images from a dataset version.
 
         @param slug_version: The identifier for the dataset version, e.g. "my-dataset/1".
         @param image_ids: A list of image UUIDs to remove from the dataset.
+        @param refresh: Optional. Refresh policy of the write, e.g. "true" to search the changes right away.
         @return: A dictionary representing the updated dataset.
         """
         return await self._make_request(
             url=f"datasets/{slug_version}/images/",
             method="DELETE",
+            params=self._get_refresh_params(refresh),
             json={
                 "image_ids": image_ids,
             },
         )
 
+    # -------------------- Mutation API methods --------------------
+
+    async def create_mutation(
+        self,
+        operation: str,
+        filters: dict,
+        tags: list[str] = None,
+        datasets: list[str] = None,
+        attributes: dict = None,
+        requests_per_second: float = None,
+    ) -> dict:
+        """
+        Starts a background mutation of all images matching the filters. Much faster than paging through the images
+        and updating them in batches.
+
+        @param operation: One of "add_tags", "remove_tags", "add_to_datasets", "remove_from_datasets",
+            "set_attributes" or "delete".
+        @param filters: The image filters, with the same names and values as the filter arguments of `get_images`.
+            E.g. `{"sources": ["my-source"], "tags__empty": True}`.
+        @param tags: The tags to add or remove.
+        @param datasets: The versioned dataset slugs to add the images to or remove them from.
+        @param attributes: The attributes to set.
+        @param requests_per_second: Throttle of the mutation, in images per second.
+        @return: A dictionary with the status of the mutation, including its "task_id".
+        """
+        return await self._make_request(
+            url="mutations/",
+            method="POST",
+            json=self._dict_filter_none({
+                "operation": operation,
+                "filters": self._get_mutation_filters(filters),
+                "tags": tags,
+                "datasets": datasets,
+                "attributes": attributes,
+                "requests_per_second": requests_per_second,
+            }),
+        )
+
+    async def get_mutation(self, task_id: str) -> dict:
+        """
+        Gets the status and progress of a mutation.
+
+        @param task_id: The task ID of the mutation.
+        @return: A dictionary with the status of the mutation.
+        """
+        return await self._make_request(url=f"mutations/{task_id}/")
+
+    async def cancel_mutation(self, task_id: str) -> dict:
+        """
+        Cancels a running mutation. Images that were already updated keep the changes.
+
+        @param task_id: The task ID of the mutation.
+        @return: A dictionary with the status of the mutation.
+        """
+        return await self._make_request(url=f"mutations/{task_id}/", method="DELETE")
+
+    async def wait_for_mutation(self, task_id: str, poll_interval: float = 5) -> dict:
+        """
+        Waits until a mutation is completed.
+
+        @param task_id: The task ID of the mutation.
+        @param poll_interval: Seconds between status checks.
+        @return: A dictionary with the final status of the mutation.
+        """
+        while True:
+            mutation = await self.get_mutation(task_id)
+            if mutation["completed"]:
+                return mutation
+            await asyncio.sleep(poll_interval)
+
+    # -------------------- Ingestion API methods --------------------
+
+    async def get_ingestion_ticket(self, ticket_id: str) -> dict:
+        """
+        Gets the status of writes sent with `asynchronous=True`.
+
+        @param ticket_id: The ID of the ingestion ticket returned by the write.
+        @return: A dictionary with the status of the ticket, the counts of items by status and the failed items.
+        """
+        return await self._make_request(url=f"ingestion_tickets/{ticket_id}/")
+
+    async def wait_for_ingestion_ticket(self, ticket_id: str, poll_interval: float = 2) -> dict:
+        """
+        Waits until all the writes of an ingestion ticket are indexed or failed.
+
+        @param ticket_id: The ID of the ingestion ticket returned by the write.
+        @param poll_interval: Seconds between status checks.
+        @return: A dictionary with the final status of the ticket.
+        """
+        while True:
+            ticket = await self.get_ingestion_ticket(ticket_id)
+            if ticket["is_completed"]:
+                return ticket
+            await asyncio.sleep(poll_interval)
+
 
 
 class AsyncRunner:
@@ -1839,11 +2228,12 @@ class DataRoomClientSync:
     The official client of the DataRoom API using synchronous method and requests.
     """
 
-    def __init__(self, api_key=None, api_url=None, timeout=120) -> None:
+    def __init__(self, api_key=None, api_url=None, timeout=120, refresh=None) -> None:
         """
         @param api_key: API key for DataRoom API.
         @param api_url: URL of the DataRoom backend API
         @param timeout: Timeout for the requests to the DataRoom backend API
+        @param refresh: Default refresh policy of the writes, see DataRoomClient
         """
         self.api_key = api_key or os.environ.get("DATAROOM_API_KEY")
         self.api_url = (
@@ -1852,7 +2242,9 @@ class DataRoomClientSync:
         )
         if not self.api_url:
             raise DataRoomError("DataRoom api_url is not set")
-        self._async_client = DataRoomClient(api_key=self.api_key, api_url=self.api_url, timeout=timeout)
+        self._async_client = DataRoomClient(
+            api_key=self.api_key, api_url=self.api_url, timeout=timeout, refresh=refresh,
+        )
 
     def __getattr__(self, name) -> Any:
         # Dynamically create sync methods for all methods of the async client.
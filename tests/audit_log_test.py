@@ -0,0 +1,80 @@
+import pytest
+from asgiref.sync import sync_to_async
+
+from backend.dataroom.audit_log import audit_log, current_author, get_audit_log_index_pattern
+from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.opensearch import OS, OSBulkIndex
+
+
+def flush_audit_log():
+    audit_log.flush()
+    OS.client.indices.refresh(index=get_audit_log_index_pattern())
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_image_audit_logs(DataRoom, image_logo, image_girl):
+    await DataRoom.update_image(image_logo.id, source='updated')
+    await DataRoom.tag_images([image_logo.id], ['audited'])
+    await DataRoom.delete_image(image_girl.id)
+    await sync_to_async(flush_audit_log)()
+
+    entries = await DataRoom.get_image_audit_logs(image_logo.id)
+    assert [entry['action'] for entry in entries] == ['update', 'update', 'create']
+    assert entries[0]['fields'] == ['tags']
+    assert entries[0]['changes'] == {'tags': {'add': ['audited']}}
+    assert entries[0]['author'] == DataRoom._test_user.email
+    assert entries[1]['fields'] == ['source']
+    assert entries[1]['changes']['source'] == 'updated'
+
+    # the deleted image keeps its audit log
+    entries = await DataRoom.get_image_audit_logs(image_girl.id)
+    assert [entry['action'] for entry in entries] == ['delete', 'create']
+
+    # pages of one entry
+    entries = await DataRoom.get_image_audit_logs(image_logo.id, page_size=1)
+    assert [entry['action'] for entry in entries] == ['update', 'update', 'create']
+    entries = await DataRoom.get_image_audit_logs(image_logo.id, limit=1, page_size=1)
+    assert [entry['action'] for entry in entries] == ['update']
+
+
+@pytest.mark.django_db
+def test_bulk_writes_audit_logs(image_logo, image_girl):
+    with OSBulkIndex() as os_bulk:
+        # already exists, the create conflicts
+        OSImage.objects.get(id=image_logo.id).create(bulk_index=os_bulk)
+        image_girl.source = 'bulk'
+        token = current_author.set('bulk@example.com')
+        try:
+            image_girl.save(fields=['source'], bulk_index=os_bulk)
+        finally:
+            current_author.reset(token)
+    assert os_bulk.results == {image_logo.id: 'conflict', image_girl.id: 'updated'}
+    flush_audit_log()
+
+    entries = audit_log.search(image_logo.id)
+    assert [entry['action'] for entry in entries] == ['create']
+    entries = audit_log.search(image_girl.id)
+    assert [entry['action'] for entry in entries] == ['update', 'create']
+    assert entries[0]['author'] == 'bulk@example.com'
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_mutation_audit_log(DataRoom, image_logo):
+    mutation = await DataRoom.create_mutation(operation='add_tags', filters={'short_edge__gte': 150}, tags=['big'])
+    await DataRoom.wait_for_mutation(mutation['task_id'], poll_interval=0.1)
+    await sync_to_async(flush_audit_log)()
+
+    response = await sync_to_async(OS.client.search)(
+        index=get_audit_log_index_pattern(),
+        body={'query': {'term': {'action': 'mutation'}}},
+    )
+    entries = [hit['_source'] for hit in response['hits']['hits']]
+    assert len(entries) == 1
+    assert entries[0]['image_id'] is None
+    assert entries[0]['fields'] == ['tags']
+    assert entries[0]['author'] == DataRoom._test_user.email
+    assert entries[0]['changes']['task_id'] == mutation['task_id']
+    assert entries[0]['changes']['filters'] == {'short_edge__gte': '150'}
+    assert entries[0]['changes']['operation'] == 'add_tags'
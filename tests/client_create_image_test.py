@@ -1,12 +1,17 @@
+import hashlib
 import uuid
 
 import pytest
 from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.test import override_settings
+from opensearchpy import TransportError
 
 from backend.dataroom.models import Tag
 from backend.dataroom.models.attributes import AttributesField, AttributesSchema
+from backend.dataroom.models.latents import LatentType
 from backend.dataroom.models.os_image import OSImage, OSImageMeta, OSAttributes, OSLatents
 from dataroom_client import DataRoomFile, DataRoomError
 
@@ -125,6 +130,47 @@ async def test_create_image_from_url_avoids_duplicates(DataRoom):
     assert OSImage.all_objects.search().count() == 1
 
 
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_create_image_from_url_not_an_image(DataRoom):
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.create_image(image_id='not-an-image', image_url='https://www.example.com/', source='test')
+    assert 'Unable to download image from URL: Unsupported content type "text/html"' in str(excinfo.value)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+@override_settings(IMAGE_DOWNLOAD_MAX_SIZE=1000)
+async def test_create_image_from_url_too_large(DataRoom):
+    image_url = 'https://storyblok-cdn.photoroom.com/f/191576/1200x800/4e54b928ef/remove_background.webp'
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.create_image(image_id='too-large', image_url=image_url, source='test')
+    assert 'Unable to download image from URL: Image is larger than 1000 bytes' in str(excinfo.value)
+
+    response = await DataRoom.get_images()
+    assert len(response) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_create_images_in_bulk_from_urls(DataRoom, tests_path):
+    file_logo = DataRoomFile.from_path(tests_path / 'images/logo.png')
+    image_url = 'https://storyblok-cdn.photoroom.com/f/191576/1200x800/4e54b928ef/remove_background.webp'
+
+    response = await DataRoom.create_images([
+        {'id': 'logo', 'source': 'test', 'image_file': file_logo},
+        {'id': 'from-url', 'source': 'test', 'image_url': image_url},
+    ])
+    assert response == {
+        'created': ['logo', 'from-url'],
+        'failed': [],
+    }
+
+    instance = await sync_to_async(OSImage.objects.get)(id='from-url')
+    assert instance.original_url == image_url
+    assert instance.image == 'images/from-url/original.webp'
+
+
 @pytest.mark.asyncio
 @pytest.mark.django_db
 async def test_create_image_source_is_required(DataRoom, tests_path):
@@ -443,6 +489,7 @@ async def test_create_images_in_bulk(DataRoom, tests_path):
 
     assert response == {
         'created': ['logo', 'girl', 'perfume'],
+        'failed': [],
     }
 
     images = await DataRoom.get_images()
@@ -458,3 +505,206 @@ async def test_create_images_in_bulk(DataRoom, tests_path):
             assert image['source'] == 'test3'
             assert image['tags'] == ['three']
             assert image['attributes'] == {'color': 'red'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_create_images_in_bulk_with_failed_upload(DataRoom, tests_path, mocker):
+    file_logo = DataRoomFile.from_path(tests_path / 'images/logo.png')
+    file_girl = DataRoomFile.from_path(tests_path / 'images/girl.jpg')
+
+    original_save = default_storage.save
+
+    def failing_save(name, content, *args, **kwargs):
+        if name.startswith('images/girl/'):
+            raise OSError('Storage unavailable')
+        return original_save(name, content, *args, **kwargs)
+
+    mocker.patch.object(default_storage, 'save', side_effect=failing_save)
+
+    response = await DataRoom.create_images([
+        {'id': 'logo', 'source': 'test', 'image_file': file_logo},
+        {'id': 'girl', 'source': 'test', 'image_file': file_girl},
+    ])
+
+    assert response == {
+        'created': ['logo'],
+        'failed': [{'id': 'girl', 'error': 'Storage unavailable'}],
+    }
+
+    images = await DataRoom.get_images()
+    assert [image['id'] for image in images] == ['logo']
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_create_images_stream(DataRoom, tests_path, image_logo, mocker):
+    mocker.patch('backend.api.images.views.BULK_STREAM_BATCH_SIZE', 2)
+
+    file_logo = DataRoomFile.from_path(tests_path / 'images/logo.png')
+    file_logo_alt = DataRoomFile.from_path(tests_path / 'images/logo_alt.png')
+    file_girl = DataRoomFile.from_path(tests_path / 'images/girl.jpg')
+    file_perfume = DataRoomFile.from_path(tests_path / 'images/perfume.jpg')
+
+    response = await DataRoom.create_images_stream([
+        {'id': 'girl', 'source': 'test', 'image_file': file_girl},
+        # same ID as the previous image
+        {'id': 'girl', 'source': 'test', 'image_file': file_perfume},
+        {'id': 'logo_alt', 'source': 'test', 'image_file': file_logo_alt, 'tags': ['one']},
+        # same hash as an existing image
+        {'id': 'logo_copy', 'source': 'test', 'image_file': file_logo},
+        # invalid ID
+        {'id': 'in valid', 'source': 'test', 'image_file': file_perfume},
+        {'id': 'perfume', 'source': 'test', 'image_file': file_perfume},
+    ])
+
+    assert sorted(response['created']) == ['girl', 'logo_alt', 'perfume']
+    failed = {item['id']: item['error'] for item in response['failed']}
+    assert failed['logo_copy'] == 'Image with the same hash already exists'
+    assert failed['girl'] == "Image with ID 'girl' appears multiple times in bulk"
+    assert 'in valid' in failed
+
+    images = {image['id']: image for image in await DataRoom.get_images()}
+    assert sorted(images.keys()) == sorted(['girl', image_logo.id, 'logo_alt', 'perfume'])
+    assert images['logo_alt']['tags'] == ['one']
+    assert images['girl']['width'] == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_create_images_stream_failed_batch(DataRoom, tests_path, mocker):
+    mocker.patch('backend.api.images.views.BULK_STREAM_BATCH_SIZE', 1)
+    original_find_existing = OSImage.all_objects.find_existing
+
+    def find_existing(ids=None, **kwargs):
+        if 'perfume' in ids:
+            raise TransportError(500, 'OpenSearch unavailable')
+        return original_find_existing(ids=ids, **kwargs)
+
+    mocker.patch.object(OSImage.all_objects, 'find_existing', side_effect=find_existing)
+
+    response = await DataRoom.create_images_stream([
+        {'id': 'girl', 'source': 'test', 'image_file': DataRoomFile.from_path(tests_path / 'images/girl.jpg')},
+        {'id': 'perfume', 'source': 'test', 'image_file': DataRoomFile.from_path(tests_path / 'images/perfume.jpg')},
+    ])
+
+    # the error of a batch only fails its own images
+    assert response['created'] == ['girl']
+    assert [item['id'] for item in response['failed']] == ['perfume']
+    images = await DataRoom.get_images()
+    assert [image['id'] for image in images] == ['girl']
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_create_images_direct_not_supported(DataRoom, tests_path):
+    # the test storage is a local file system, which has no presigned URLs
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.create_images_direct([
+            {'id': 'direct1', 'source': 'test', 'image_file': DataRoomFile.from_path(tests_path / 'images/logo.png')},
+        ])
+    assert 'Direct uploads are not supported by the configured storage' in str(excinfo.value)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_direct_upload_commit(DataRoom, tests_path):
+    await sync_to_async(LatentType.objects.create)(name='mask', is_mask=True)
+    logo_bytes = (tests_path / 'images/logo.png').read_bytes()
+    girl_bytes = (tests_path / 'images/girl.jpg').read_bytes()
+    mask_bytes = (tests_path / 'images/logo_mask.png').read_bytes()
+
+    # simulate the uploads to the presigned URLs
+    upload_ids = {image_id: uuid.uuid4().hex for image_id in ['direct1', 'direct2', 'direct3']}
+    logo_path = OSImage.get_direct_upload_storage_path(upload_ids['direct1'], 'logo.png', 'original')
+    mask_path = OSImage.get_direct_upload_storage_path(upload_ids['direct1'], 'mask.png', 'latent_mask')
+    girl_path = OSImage.get_direct_upload_storage_path(upload_ids['direct2'], 'girl.jpg', 'original')
+    default_storage.save(logo_path, ContentFile(logo_bytes))
+    default_storage.save(mask_path, ContentFile(mask_bytes))
+    default_storage.save(girl_path, ContentFile(girl_bytes))
+
+    response = await DataRoom._make_request(
+        url='images/direct_upload_commit/',
+        method='POST',
+        json={'images': [
+            {
+                'id': 'direct1',
+                'upload_id': upload_ids['direct1'],
+                'source': 'test',
+                'filename': 'logo.png',
+                'size': len(logo_bytes),
+                'sha256': hashlib.sha256(logo_bytes).hexdigest(),
+                'latents': [{'latent_type': 'mask', 'filename': 'mask.png', 'size': len(mask_bytes)}],
+            },
+            {
+                'id': 'direct2',
+                'upload_id': upload_ids['direct2'],
+                'source': 'test',
+                'filename': 'girl.jpg',
+                'size': len(girl_bytes) + 1,
+            },
+            {
+                'id': 'direct3',
+                'upload_id': upload_ids['direct3'],
+                'source': 'test',
+                'filename': 'missing.png',
+                'size': 10,
+            },
+        ]},
+    )
+    assert response['created'] == ['direct1']
+    assert sorted(response['failed'], key=lambda f: f['id']) == [
+        {'id': 'direct2', 'error': f'File "{girl_path}" has {len(girl_bytes)} bytes, expected {len(girl_bytes) + 1}'},
+        {'id': 'direct3', 'error': f'File "uploads/{upload_ids["direct3"]}/original.png" was not uploaded'},
+    ]
+
+    instance = await sync_to_async(OSImage.objects.get)(id='direct1')
+    assert instance.image == 'images/direct1/original.png'
+    assert instance.width == 180
+    assert instance.height == 180
+    assert instance.image_hash == OSImage.get_image_hash(ContentFile(logo_bytes))
+    assert instance.latents.latents['mask'].file == 'images/direct1/latent_mask.png'
+    assert default_storage.exists('images/direct1/original.png')
+    assert default_storage.exists('images/direct1/latent_mask.png')
+    # the uploads are moved, or deleted when rejected
+    assert not default_storage.exists(logo_path)
+    assert not default_storage.exists(mask_path)
+    assert not default_storage.exists(girl_path)
+
+    # committing again conflicts, and the upload is deleted
+    upload_id = uuid.uuid4().hex
+    upload_path = OSImage.get_direct_upload_storage_path(upload_id, 'logo.png', 'original')
+    default_storage.save(upload_path, ContentFile(logo_bytes))
+    response = await DataRoom._make_request(
+        url='images/direct_upload_commit/',
+        method='POST',
+        json={'images': [
+            {'id': 'direct1', 'upload_id': upload_id, 'source': 'test', 'filename': 'logo.png', 'size': len(logo_bytes)},
+        ]},
+    )
+    assert response == {'created': [], 'failed': [{'id': 'direct1', 'error': "Image with ID 'direct1' already exists"}]}
+    assert not default_storage.exists(upload_path)
+    assert default_storage.exists('images/direct1/original.png')
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+@override_settings(OPENSEARCH_DEFAULT_REFRESH='false', OPENSEARCH_BULK_REFRESH='false')
+async def test_create_image_refresh(DataRoom, tests_path):
+    image_file = DataRoomFile.from_path(tests_path / 'images/logo.png')
+
+    # read-your-writes when asked for
+    await DataRoom.create_image(image_id='refresh', image_file=image_file, source='test', refresh='wait_for')
+    images = await DataRoom.get_images(fields=['id'])
+    assert [image['id'] for image in images] == ['refresh']
+
+    # creates are refreshed by default, the duplicate checks of the next creates search them
+    girl_file = DataRoomFile.from_path(tests_path / 'images/girl.jpg')
+    await DataRoom.create_image(image_id='refresh_create', image_file=girl_file, source='test')
+    images = await DataRoom.get_images(fields=['id'])
+    assert sorted(image['id'] for image in images) == ['refresh', 'refresh_create']
+
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.update_image('refresh', source='other', refresh='sometimes')
+    assert excinfo.value.response.status_code == 400
+    assert 'Invalid refresh policy' in str(excinfo.value)
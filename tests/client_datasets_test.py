@@ -191,6 +191,17 @@ async def test_dataset_add_images(DataRoom, image_logo, image_girl, image_perfum
     images = await DataRoom.get_images(datasets=['test/1'])
     assert [img['id'] for img in images] == [image_girl.id, image_logo.id]
 
+    # images already in the dataset and missing images are not updated
+    response = await DataRoom.dataset_add_images(slug_version='test/1', image_ids=[image_logo.id, 'missing'])
+    assert response['updated_count'] == 0
+
+    # deleted images are not updated
+    await DataRoom.delete_image(image_perfume.id)
+    response = await DataRoom.dataset_add_images(slug_version='test/1', image_ids=[image_perfume.id])
+    assert response['updated_count'] == 0
+    instance = await sync_to_async(OSImage.all_objects.get)(id=image_perfume.id)
+    assert instance.datasets.datasets == []
+
 
 @pytest.mark.asyncio
 @pytest.mark.django_db
@@ -4,6 +4,7 @@ from django.core.files.storage import default_storage
 
 from backend.dataroom.models.latents import LatentType
 from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.opensearch import OS
 from dataroom_client import DataRoomFile, DataRoomError
 
 
@@ -265,3 +266,67 @@ async def test_get_images_return_latents(DataRoom, tests_path, image_logo):
     image = await DataRoom.get_image(image_logo.id, all_fields=True, return_latents=['example'])
     assert len(image['latents']) == 1
     assert image['latents'][0]['latent_type'] == 'example'
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_set_images_latents(DataRoom, tests_path, image_logo, image_girl):
+    latent_file = DataRoomFile.from_path(tests_path / 'images/logo_latent.txt')
+    mask_file = DataRoomFile.from_path(tests_path / 'images/logo_mask.png')
+
+    await sync_to_async(LatentType.objects.create)(name='example', is_mask=False)
+    await sync_to_async(LatentType.objects.create)(name='mask', is_mask=True)
+
+    response = await DataRoom.set_images_latents(
+        latents=[
+            {'image_id': image_logo.id, 'latent_type': 'example', 'file': latent_file},
+            {'image_id': image_logo.id, 'latent_type': 'mask', 'file': mask_file},
+            {'image_id': image_girl.id, 'latent_type': 'example', 'file': latent_file},
+            {'image_id': image_girl.id, 'latent_type': 'mask', 'file': mask_file},
+            {'image_id': image_girl.id, 'latent_type': 'missing', 'file': latent_file},
+            {'image_id': 'does-not-exist', 'latent_type': 'example', 'file': latent_file},
+        ],
+        batch_size=4,
+    )
+    assert sorted(response['updated']) == sorted([image_logo.id, image_girl.id])
+    assert sorted((f['image_id'], f['latent_type']) for f in response['failed']) == [
+        ('does-not-exist', 'example'),
+        (image_girl.id, 'missing'),
+    ]
+
+    for image_id in [image_logo.id, image_girl.id]:
+        image = await DataRoom.get_image(image_id, fields=['latents'])
+        assert sorted(latent['latent_type'] for latent in image['latents']) == ['example', 'mask']
+
+    image_instance = await sync_to_async(OSImage.objects.get)(id=image_girl.id)
+    file_path = default_storage.base_location / image_instance.latents.latents['mask'].file
+    assert default_storage.exists(file_path) is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_set_images_latents_deleted_image(DataRoom, tests_path, image_logo, image_girl, mocker):
+    latent_file = DataRoomFile.from_path(tests_path / 'images/logo_latent.txt')
+    await sync_to_async(LatentType.objects.create)(name='example', is_mask=False)
+
+    original_get_multiple = OSImage.objects.get_multiple
+
+    def get_multiple(*args, **kwargs):
+        images = original_get_multiple(*args, **kwargs)
+        # the image is deleted between the read and the write
+        OS.client.delete(index=OSImage.INDEX, id=image_girl.id, refresh=True)
+        return images
+
+    mocker.patch.object(OSImage.objects, 'get_multiple', side_effect=get_multiple)
+
+    response = await DataRoom.set_images_latents(
+        latents=[
+            {'image_id': image_logo.id, 'latent_type': 'example', 'file': latent_file},
+            {'image_id': image_girl.id, 'latent_type': 'example', 'file': latent_file},
+        ],
+    )
+    assert response['updated'] == [image_logo.id]
+    error = f'Image with ID "{image_girl.id}" does not exist'
+    assert response['failed'] == [{'image_id': image_girl.id, 'latent_type': 'example', 'error': error}]
+    # the deleted image is not created again
+    assert not OS.client.exists(index=OSImage.INDEX, id=image_girl.id)
@@ -279,6 +279,16 @@ async def test_add_image_attributes_in_bulk(DataRoom, image_logo, image_girl, im
         image_perfume.id: {},
     }
 
+    # a missing image fails the whole batch
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.add_image_attributes_in_bulk({
+            image_perfume.id: {'color': 'green'},
+            'missing': {'color': 'blue'},
+        })
+    assert "One or more images do not exist: 'missing'" in str(excinfo.value)
+    image_perfume_dict = await DataRoom.get_image(image_perfume.id)
+    assert image_perfume_dict['attributes'] == {}
+
 
 @pytest.mark.asyncio
 @pytest.mark.django_db
@@ -0,0 +1,98 @@
+import pytest
+from asgiref.sync import sync_to_async
+
+from backend.dataroom.models.attributes import AttributesField, AttributesSchema
+from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.models.tag import Tag
+from dataroom_client import DataRoomError
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_mutation_add_and_remove_tags(DataRoom, image_logo, image_girl, image_perfume):
+    mutation = await DataRoom.create_mutation(
+        operation='add_tags',
+        filters={'short_edge__gte': 150},
+        tags=['big', 'checked'],
+    )
+    assert mutation['task_id']
+    mutation = await DataRoom.wait_for_mutation(mutation['task_id'], poll_interval=0.1)
+    assert mutation['completed'] is True
+    assert mutation['updated'] == 2
+    assert await sync_to_async(Tag.objects.filter(name__in=['big', 'checked']).count)() == 2
+
+    images = {image['id']: image['tags'] for image in await DataRoom.get_images(fields=['id', 'tags'])}
+    assert images == {
+        image_logo.id: ['big', 'checked'],
+        image_girl.id: ['big', 'checked'],
+        image_perfume.id: [],
+    }
+
+    # remove a tag from all tagged images
+    mutation = await DataRoom.create_mutation(operation='remove_tags', filters={'tags': ['big']}, tags=['big'])
+    mutation = await DataRoom.wait_for_mutation(mutation['task_id'], poll_interval=0.1)
+    assert mutation['updated'] == 2
+
+    images = {image['id']: image['tags'] for image in await DataRoom.get_images(fields=['id', 'tags'])}
+    assert images == {
+        image_logo.id: ['checked'],
+        image_girl.id: ['checked'],
+        image_perfume.id: [],
+    }
+
+    # cancelling a completed mutation does nothing
+    mutation = await DataRoom.cancel_mutation(mutation['task_id'])
+    assert mutation['completed'] is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_mutation_datasets_attributes_and_delete(DataRoom, image_logo, image_girl, image_perfume):
+    AttributesSchema.invalidate_cache()
+    await sync_to_async(AttributesField.objects.create)(name='color', field_type='string')
+    await DataRoom.create_dataset(name='Test', slug='test')
+
+    mutation = await DataRoom.create_mutation(
+        operation='add_to_datasets',
+        filters={'aspect_ratio__gt': 1.2},
+        datasets=['test/1'],
+    )
+    await DataRoom.wait_for_mutation(mutation['task_id'], poll_interval=0.1)
+    images = await DataRoom.get_images(datasets=['test/1'])
+    assert [image['id'] for image in images] == [image_girl.id]
+
+    mutation = await DataRoom.create_mutation(
+        operation='set_attributes',
+        filters={'datasets': ['test/1']},
+        attributes={'color': 'red'},
+    )
+    await DataRoom.wait_for_mutation(mutation['task_id'], poll_interval=0.1)
+    image = await DataRoom.get_image(image_girl.id)
+    assert image['attributes'] == {'color': 'red'}
+
+    mutation = await DataRoom.create_mutation(operation='delete', filters={'aspect_ratio__lt': 1})
+    mutation = await DataRoom.wait_for_mutation(mutation['task_id'], poll_interval=0.1)
+    assert mutation['updated'] == 1
+    active = await sync_to_async(OSImage.objects.all)()
+    assert sorted(image.id for image in active) == sorted([image_logo.id, image_girl.id])
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_mutation_invalid(DataRoom, image_logo):
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.create_mutation(operation='add_tags', filters={'sources': ['test']})
+    assert excinfo.value.response.status_code == 400
+    assert 'add_tags' in str(excinfo.value)
+
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.create_mutation(operation='add_tags', filters={}, tags=['example'])
+    assert 'This dictionary may not be empty' in str(excinfo.value)
+
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.create_mutation(operation='add_to_datasets', filters={'sources': ['test']}, datasets=['no/1'])
+    assert 'Invalid datasets: no/1' in str(excinfo.value)
+
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.get_mutation('unknown:1')
+    assert excinfo.value.response.status_code == 404
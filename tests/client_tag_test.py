@@ -1,4 +1,6 @@
 import pytest
+
+from backend.dataroom.models.tag import Tag, TagManager
 from dataroom_client import DataRoomError
 
 
@@ -96,6 +98,10 @@ async def test_tag_images(DataRoom, image_logo, image_girl, image_perfume):
     image_perfume_dict = await DataRoom.get_image(image_perfume.id)
     assert image_perfume_dict['tags'] == ['blue']
 
+    # images that already have the tags are not counted
+    response = await DataRoom.tag_images(image_ids=[image_girl.id, image_perfume.id], tag_names=['blue'])
+    assert response == {'tags_created': 0, 'images_tagged': 0}
+
 
 @pytest.mark.asyncio
 @pytest.mark.django_db
@@ -104,3 +110,37 @@ async def test_tag_images_on_wrong_image_id_raises(DataRoom, image_logo):
     with pytest.raises(DataRoomError) as excinfo:
         await DataRoom.tag_images(image_ids=[image_logo.id, 'fail', '2'], tag_names=['example'])
     assert "One or more images do not exist" in str(excinfo.value)
+    # nothing is written
+    image_logo_dict = await DataRoom.get_image(image_logo.id)
+    assert 'example' not in image_logo_dict['tags']
+
+
+@pytest.mark.django_db
+def test_tags_ensure_exist_queries(django_assert_num_queries, monkeypatch, image_logo):
+    Tag.objects.create(name='existing')
+    # the tags of a bulk request of 50 images with 5 tags each
+    tags = [f'tag{i % 6}' if i % 6 else 'existing' for i in range(50 * 5)]
+
+    # one query to find the existing tags, one to insert the missing ones
+    with django_assert_num_queries(2):
+        assert Tag.objects.ensure_exist(tags) == 5
+    assert Tag.objects.count() == 6
+
+    # known tags don't query the database anymore
+    with django_assert_num_queries(0):
+        assert Tag.objects.ensure_exist(tags) == 0
+        image_logo.tags = ['tag1', 'tag2']
+        image_logo._update_tag_objects()
+
+    # deleted tags are created again
+    Tag.objects.get(name='tag1').delete()
+    with django_assert_num_queries(2):
+        assert Tag.objects.ensure_exist(['tag1', 'tag2']) == 1
+
+    # tags deleted by another process are created again once the known tags expire
+    Tag.objects.filter(name='tag2').delete()
+    with django_assert_num_queries(0):
+        assert Tag.objects.ensure_exist(['tag2']) == 0
+    monkeypatch.setattr(TagManager, '_known_names_expiration_seconds', 0)
+    with django_assert_num_queries(2):
+        assert Tag.objects.ensure_exist(['tag2']) == 1
@@ -5,7 +5,9 @@ from django.core.files.base import ContentFile
 
 from backend.users.models.token import Token
 
+from backend.dataroom.audit_log import audit_log, get_audit_log_index_pattern
 from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.models.tag import Tag
 from backend.dataroom.opensearch import OS
 from backend.dataroom.utils.disable_signals import DisableSignals
 from backend.users.models.user import User
@@ -25,6 +27,11 @@ def setup():
         index=OSImage.INDEX,
         body=OSImage.INDEX_SETTINGS,
     )
+    # the database is rolled back after each test, the known tags are not
+    Tag.objects.forget()
+    # drop the audit log of the previous test
+    audit_log.flush()
+    OS.client.indices.delete(index=get_audit_log_index_pattern(), ignore_unavailable=True)
 
 
 @pytest.fixture
@@ -0,0 +1,87 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from backend.dataroom.models.os_image import OSImage
+from backend.task_runner.tasks.update_images import get_images_without_embedding
+
+VECTOR = [1.0] + [0.0] * 767
+
+
+class EmbeddingHandler(BaseHTTPRequestHandler):
+    """Stub of the embedding API, records the sizes of the images of each call"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        boundary = b'--' + self.headers.get_param('boundary').encode()
+        sizes = []
+        for part in body.split(boundary)[1:-1]:
+            _, _, content = part.partition(b'\r\n\r\n')
+            sizes.append(Image.open(BytesIO(content[: -len(b'\r\n')])).size)
+        self.server.calls.append(sizes)
+
+        if len(sizes) == 1:
+            response = {'imageEmbedding': VECTOR}
+        else:
+            response = {'imageEmbeddings': [VECTOR] * len(sizes)}
+        data = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def embedding_server(settings):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EmbeddingHandler)
+    server.calls = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.FETCH_EMBEDDING_FOR_IMAGE_API_URL = f'http://127.0.0.1:{server.server_port}/embedding'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.django_db
+def test_update_coca_embeddings(embedding_server, settings, image_logo, image_girl, image_perfume):
+    settings.FETCH_EMBEDDING_FOR_IMAGE_BATCH_SIZE = 2
+    images = [image_logo, image_girl, image_perfume]
+    for image in images:
+        image.coca_embedding_exists = False
+        image.coca_embedding_vector = None
+        image.save(fields=['coca_embedding'])
+    assert len(get_images_without_embedding().result) == 3
+
+    failed = OSImage.update_coca_embeddings(images, author='backfill@example.com')
+    assert failed == {}
+
+    # 2 images per call, downscaled to a short edge of 224px
+    assert sorted(len(sizes) for sizes in embedding_server.calls) == [1, 2]
+    originals = {image.pil_image.size for image in images}
+    sent = {size for sizes in embedding_server.calls for size in sizes}
+    for width, height in originals:
+        scale = min(1, 224 / min(width, height))
+        assert (max(1, round(width * scale)), max(1, round(height * scale))) in sent
+
+    assert get_images_without_embedding().result == []
+    image = OSImage.objects.get(image_girl.id, fields=['coca_embedding'])
+    assert image.coca_embedding_author == 'backfill@example.com'
+    assert image.coca_embedding_vector == pytest.approx(VECTOR)
+
+
+@pytest.mark.django_db
+def test_update_coca_embeddings_error(embedding_server, image_logo):
+    # answers 501 to every call
+    embedding_server.RequestHandlerClass = BaseHTTPRequestHandler
+
+    failed = OSImage.update_coca_embeddings([image_logo])
+    assert list(failed.keys()) == [image_logo.id]
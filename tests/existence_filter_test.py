@@ -0,0 +1,110 @@
+import pytest
+from django.test import override_settings
+
+from backend.dataroom.exceptions import SaveConflictError
+from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.utils.existence_filter import BloomFilter, ImageExistenceFilter
+
+
+def test_bloom_filter():
+    bloom_filter = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom_filter.add(f'value-{i}')
+
+    # no false negatives
+    assert all(f'value-{i}' in bloom_filter for i in range(1000))
+
+    # false positives stay around the error rate
+    false_positives = sum(f'other-{i}' in bloom_filter for i in range(10000))
+    assert false_positives < 300
+
+    # adding a value twice doesn't count it twice
+    bloom_filter.add('value-0')
+    assert bloom_filter.count <= 1000
+
+
+@pytest.mark.django_db
+def test_find_existing(image_logo, image_girl):
+    existing = OSImage.all_objects.find_existing(
+        ids=[image_logo.id, 'does-not-exist'],
+        image_hashes=[image_girl.image_hash, 'sha256:does-not-exist'],
+        fields=['id'],
+    )
+    assert [image.id for image in existing['id']] == [image_logo.id]
+    assert [image.id for image in existing['image_hash']] == [image_girl.id]
+    assert existing['original_url'] == []
+
+    assert OSImage.all_objects.find_existing() == {'id': [], 'image_hash': [], 'original_url': []}
+
+
+@pytest.mark.django_db
+def test_find_existing_same_hash(os_image):
+    # a hash collision, every image with the hash is returned
+    for image_id in ['test-image-2', 'test-image-3']:
+        image = OSImage(
+            id=image_id,
+            author=os_image.author,
+            source='test',
+            image=f'images/{image_id}/original.png',
+            image_hash=os_image.image_hash,
+            width=10,
+            height=10,
+            short_edge=10,
+            pixel_count=100,
+            aspect_ratio=1.0,
+            aspect_ratio_fraction="1:1",
+        )
+        image.create()
+    existing = OSImage.all_objects.find_existing(image_hashes=[os_image.image_hash], fields=['id'])
+    assert [image.id for image in existing['image_hash']] == ['test-image', 'test-image-2', 'test-image-3']
+
+
+@pytest.mark.django_db
+def test_find_existing_before_refresh(os_image):
+    image = OSImage(
+        id='test-image-2',
+        author=os_image.author,
+        source='test',
+        image='images/test-image-2/original.png',
+        image_hash='sha256:456test',
+        width=10,
+        height=10,
+        short_edge=10,
+        pixel_count=100,
+        aspect_ratio=1.0,
+        aspect_ratio_fraction="1:1",
+    )
+    image.create(refresh=False)
+    # the IDs are looked up in real time
+    assert [image.id for image in OSImage.all_objects.find_existing(ids=[image.id])['id']] == [image.id]
+
+    # the create of an existing ID doesn't overwrite it
+    image.image_hash = 'sha256:789test'
+    with pytest.raises(SaveConflictError):
+        image.create(refresh=False)
+    assert OSImage.all_objects.get(image.id).image_hash == 'sha256:456test'
+
+
+@pytest.mark.django_db
+@override_settings(IMAGE_EXISTENCE_FILTER_ENABLED=True, IMAGE_EXISTENCE_FILTER_CAPACITY=10000)
+def test_image_existence_filter(image_logo, mocker):
+    existence_filter = ImageExistenceFilter()
+    # don't start the background thread, refresh manually
+    mocker.patch.object(existence_filter, 'start')
+
+    # not loaded yet, can't tell
+    assert existence_filter.might_exist(image_ids=['new-image']) is True
+
+    existence_filter._refresh()
+    assert existence_filter.might_exist(image_ids=[image_logo.id]) is True
+    assert existence_filter.might_exist(image_hashes=[image_logo.image_hash]) is True
+    assert existence_filter.might_exist(image_ids=['new-image'], image_hashes=['sha256:new']) is False
+
+    # images created in this process are added right away
+    existence_filter.add('new-image', 'sha256:new')
+    assert existence_filter.might_exist(image_ids=['new-image']) is True
+    assert existence_filter.might_exist(image_hashes=['sha256:new']) is True
+
+    # a stale filter isn't trusted
+    existence_filter._last_refresh -= 3600
+    assert existence_filter.might_exist(image_ids=['other-new-image']) is True
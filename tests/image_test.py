@@ -1,20 +1,32 @@
 import os
+from io import StringIO
 from django.conf import settings
+from django.core.files import File
+from django.core.management import call_command
 import pytest
 from asgiref.sync import sync_to_async
 
 from backend.dataroom.choices import DuplicateState
+from backend.dataroom.exceptions import SaveConflictError
 from backend.dataroom.models.latents import LatentType
 from backend.dataroom.models.os_image import OSImage, OSAttributes, OSLatents
+from backend.dataroom.models.stats import Stats
 from backend.task_runner.tasks.delete_images import (
     get_images_marked_as_duplicates,
     image_delete_duplicates,
     get_images_marked_for_deletion,
     image_delete_marked_for_deletion,
 )
-from backend.task_runner.tasks.delete_latents import get_disabled_latent_types, get_images_with_disabled_latents, image_delete_latents
+from backend.task_runner.tasks.delete_latents import (
+    delete_disabled_latents,
+    get_disabled_latent_types,
+    get_images_with_disabled_latents,
+    image_delete_latents,
+)
 from backend.task_runner.tasks.update_images import (
     get_images_without_duplicate_state,
+    get_images_without_thumbnail,
+    image_update_thumbnail_batch,
 )
 from dataroom_client.dataroom_client.client import DataRoomFile
 
@@ -71,6 +83,20 @@ def test_update_thumbnail(image_logo, tests_path):
     assert image_logo.thumbnail_direct_url == '/media/images/test-logo/thumbnail.png'
 
 
+@pytest.mark.django_db
+def test_update_thumbnail_batch(image_logo, image_girl):
+    for image in [image_logo, image_girl]:
+        image.thumbnail = None
+        image.save(fields=['thumbnail'])
+
+    images = get_images_without_thumbnail().result
+    assert [image.id for image in images] == [image_girl.id, image_logo.id]
+    image_update_thumbnail_batch(images)
+
+    assert get_images_without_thumbnail().result == []
+    assert OSImage.objects.get(id=image_logo.id).thumbnail == 'images/test-logo/thumbnail.png'
+
+
 @pytest.mark.django_db
 def test_update_coca_embedding(image_logo, mocker):
     # remove existing embedding
@@ -142,10 +168,21 @@ def test_embedding_find_similar(
     assert len(similar) == 2
     assert [s.id for s in similar] == [i.id for i in [image_logo_alt, image_logo_small]]
 
+    # multiple vectors with one request
+    similars = OSImage.objects.find_similar_multiple(
+        [image_logo.coca_embedding_vector, image_girl.coca_embedding_vector],
+        number=2,
+        exclude_ids=[image_logo.id, image_girl.id],
+    )
+    assert [[s.id for s in similar] for similar in similars] == [
+        [s.id for s in image_logo.find_similar(number=2)],
+        [s.id for s in image_girl.find_similar(number=2)],
+    ]
+
 
 @pytest.mark.django_db
 def test_mark_duplicates(image_logo, image_logo_alt, image_logo_small, image_girl, image_perfume):
-    images = get_images_without_duplicate_state()
+    images = get_images_without_duplicate_state().result
     assert len(images) == 5
 
     # duplicates are marked
@@ -179,6 +216,94 @@ def test_mark_duplicates(image_logo, image_logo_alt, image_logo_small, image_gir
     assert image_perfume.duplicate_state is DuplicateState.ORIGINAL
 
 
+@pytest.mark.django_db
+@pytest.mark.parametrize('exact_rescore', [False, True])
+def test_mark_duplicates_batch(image_logo, image_logo_alt, image_logo_small, image_girl, image_perfume, exact_rescore):
+    image_ids = get_images_without_duplicate_state().result
+    marked = OSImage.mark_duplicates_batch(image_ids, threshold=0.8, exact_rescore=exact_rescore)
+    assert sorted(marked) == sorted(image_ids)
+
+    states = {image.id: image.duplicate_state for image in OSImage.objects.get_multiple(image_ids)}
+    assert states == {
+        image_logo.id: DuplicateState.ORIGINAL,
+        image_logo_alt.id: DuplicateState.DUPLICATE,
+        image_logo_small.id: DuplicateState.DUPLICATE,
+        image_girl.id: DuplicateState.ORIGINAL,
+        image_perfume.id: DuplicateState.ORIGINAL,
+    }
+    assert get_images_without_duplicate_state().result == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('block_size', [2, 4096])
+def test_find_duplicates_command(
+    monkeypatch, image_logo, image_logo_alt, image_logo_small, image_girl, image_perfume, block_size
+):
+    monkeypatch.setattr('builtins.input', lambda message: 'y')
+    call_command('find_duplicates', source=['test'], threshold=0.8, block_size=block_size, slices=2, stdout=StringIO())
+
+    image_ids = [image_logo.id, image_logo_alt.id, image_logo_small.id, image_girl.id, image_perfume.id]
+    states = {image.id: image.duplicate_state for image in OSImage.objects.get_multiple(image_ids)}
+    assert states == {
+        image_logo.id: DuplicateState.ORIGINAL,
+        image_logo_alt.id: DuplicateState.DUPLICATE,
+        image_logo_small.id: DuplicateState.DUPLICATE,
+        image_girl.id: DuplicateState.ORIGINAL,
+        image_perfume.id: DuplicateState.ORIGINAL,
+    }
+
+    # nothing left to update on the next run
+    stdout = StringIO()
+    call_command('find_duplicates', source=['test'], threshold=0.8, dry_run=True, stdout=stdout)
+    assert '0 images to update' in stdout.getvalue()
+
+
+@pytest.mark.django_db
+def test_purge_images_command(monkeypatch, image_logo, image_logo_alt, image_logo_small, image_girl):
+    for image in [image_logo_alt, image_logo_small]:
+        image.duplicate_state = DuplicateState.DUPLICATE
+        image.save(fields=['duplicate_state'])
+    paths = [
+        settings.MEDIA_ROOT / path
+        for image in [image_logo_alt, image_logo_small]
+        for path in OSImage.objects.get(id=image.id).get_file_paths()
+    ]
+    assert len(paths) == 4
+    size = sum(os.path.getsize(path) for path in paths)
+
+    # nothing is deleted with --dry-run
+    stdout = StringIO()
+    call_command('purge_images', duplicates=True, source=['test'], dry_run=True, stdout=stdout)
+    assert f'2 duplicates to delete with 4 files, {size / 1024:.1f} KB would be reclaimed' in stdout.getvalue()
+    assert all(os.path.exists(path) for path in paths)
+
+    monkeypatch.setattr('builtins.input', lambda message: 'y')
+    stdout = StringIO()
+    call_command('purge_images', duplicates=True, source=['test'], batch_size=1, stdout=stdout)
+    assert 'Deleted 2 duplicates and 4 files' in stdout.getvalue()
+    assert not any(os.path.exists(path) for path in paths)
+    assert get_images_marked_as_duplicates(sources=['test']).result == []
+    assert sorted(image.id for image in OSImage.all_objects.all()) == [image_girl.id, image_logo.id]
+    assert os.path.exists(settings.MEDIA_ROOT / image_logo.image)
+
+
+@pytest.mark.django_db
+def test_queue_feed_pages(image_logo, image_logo_alt, image_logo_small, image_girl, image_perfume):
+    page = get_images_without_duplicate_state(size=2)
+    image_ids = page.result
+    assert page.next_kwargs['pit_id']
+
+    # images updated during the pass are neither repeated nor do they shift the next pages
+    OSImage.mark_duplicates(image_id=image_logo.id, threshold=0.8)
+    while page.next_kwargs:
+        page = get_images_without_duplicate_state(size=2, **page.next_kwargs)
+        image_ids += page.result
+    assert image_ids == sorted(image.id for image in [image_logo, image_logo_alt, image_logo_small, image_girl, image_perfume])
+
+    # the next pass starts over with the images that are left
+    assert get_images_without_duplicate_state().result == [image_girl.id, image_perfume.id]
+
+
 @pytest.mark.asyncio
 @pytest.mark.django_db
 async def test_delete_duplicates(tests_path, DataRoom, image_logo, image_logo_alt, image_logo_small, image_girl, image_perfume):
@@ -203,7 +328,7 @@ async def test_delete_duplicates(tests_path, DataRoom, image_logo, image_logo_al
     await sync_to_async(image_girl.save)(fields=['duplicate_state'])
     await sync_to_async(image_perfume.save)(fields=['duplicate_state'])
 
-    image_ids = await sync_to_async(get_images_marked_as_duplicates)(sources=['test'])
+    image_ids = (await sync_to_async(get_images_marked_as_duplicates)(sources=['test'])).result
     assert image_ids == ['test-logo_alt', 'test-logo_small']
 
     # reload from os
@@ -238,7 +363,7 @@ async def test_delete_duplicates(tests_path, DataRoom, image_logo, image_logo_al
         await sync_to_async(image_delete_duplicates)(image_id=image_id)
 
     # check that the duplicates are deleted
-    duplicate_image_ids = await sync_to_async(get_images_marked_as_duplicates)(sources=['test'])
+    duplicate_image_ids = (await sync_to_async(get_images_marked_as_duplicates)(sources=['test'])).result
     assert len(duplicate_image_ids) == 0
 
     all_images = await sync_to_async(OSImage.objects.all)()
@@ -284,7 +409,7 @@ async def test_permanent_deletion(tests_path, DataRoom, image_logo, image_girl):
     image_logo.is_deleted = True
     await sync_to_async(image_logo.save)(fields=['is_deleted'])
 
-    to_delete_image_ids = await sync_to_async(get_images_marked_for_deletion)()
+    to_delete_image_ids = (await sync_to_async(get_images_marked_for_deletion)()).result
     assert to_delete_image_ids == ['test-logo']
 
     # reload from os
@@ -308,7 +433,7 @@ async def test_permanent_deletion(tests_path, DataRoom, image_logo, image_girl):
         await sync_to_async(image_delete_marked_for_deletion)(image_id=image_id)
 
     # check they are deleted
-    to_delete_image_ids = await sync_to_async(get_images_marked_for_deletion)()
+    to_delete_image_ids = (await sync_to_async(get_images_marked_for_deletion)()).result
     assert to_delete_image_ids == []
 
     all_images = await sync_to_async(OSImage.objects.all)()
@@ -353,7 +478,7 @@ async def test_delete_disabled_latents(tests_path, DataRoom, image_logo):
     mask_2_latent_path = settings.MEDIA_ROOT / image_logo.latents.latents['mask_2'].file
     disabled_latents = await sync_to_async(get_disabled_latent_types)()
     assert disabled_latents == []
-    image_ids = await sync_to_async(get_images_with_disabled_latents)(disabled_latents)
+    image_ids = (await sync_to_async(get_images_with_disabled_latents)(disabled_latents)).result
     assert image_ids == []
 
     assert os.path.exists(example_latent_path)
@@ -364,7 +489,7 @@ async def test_delete_disabled_latents(tests_path, DataRoom, image_logo):
 
     disabled_latents = await sync_to_async(get_disabled_latent_types)()
     assert disabled_latents == ['example', 'mask_2']
-    image_ids = await sync_to_async(get_images_with_disabled_latents)(disabled_latents)
+    image_ids = (await sync_to_async(get_images_with_disabled_latents)(disabled_latents)).result
     assert image_ids == [image_logo.id]
 
     # delete example and mask_2 latents
@@ -374,5 +499,72 @@ async def test_delete_disabled_latents(tests_path, DataRoom, image_logo):
     assert os.path.exists(mask_latent_path)  # mask is still enabled
     assert not os.path.exists(mask_2_latent_path)
 
-    image_ids = await sync_to_async(get_images_with_disabled_latents)(disabled_latents)
+    image_ids = (await sync_to_async(get_images_with_disabled_latents)(disabled_latents)).result
     assert image_ids == []
+
+
+@pytest.mark.django_db
+def test_delete_disabled_latents_task(tests_path, settings, image_logo, image_girl, image_perfume):
+    settings.DISABLED_LATENTS_CLEANUP_BATCH_SIZE = 2
+    LatentType.objects.create(name='example', is_mask=False)
+    LatentType.objects.create(name='mask', is_mask=True)
+    latent_paths = {}
+    for image in [image_logo, image_girl, image_perfume]:
+        image.latents = OSLatents.from_json([
+            {'latent_type': 'example', 'file': File(open(tests_path / 'images/logo_latent.txt', 'rb'), name='latent.txt')},
+            {'latent_type': 'mask', 'file': File(open(tests_path / 'images/logo_mask.png', 'rb'), name='mask.png')},
+        ])
+        image.save(fields=['latents'], latent_types=['example', 'mask'])
+        image = OSImage.objects.get(id=image.id, fields=['id', 'latents'])
+        latent_paths[image.id] = {name: settings.MEDIA_ROOT / latent.file for name, latent in image.latents.latents.items()}
+    # images marked for deletion are cleaned up too
+    image_perfume.is_deleted = True
+    image_perfume.save(fields=['is_deleted'])
+
+    # nothing to do while the latent types are enabled
+    delete_disabled_latents()
+    assert all(os.path.exists(path) for paths in latent_paths.values() for path in paths.values())
+
+    LatentType.objects.filter(name='example').update(is_enabled=False)
+    Stats.objects.update_stats_images_with_disabled_latents()
+    assert Stats.objects.get_images_with_disabled_latents()['current'] == 3
+
+    delete_disabled_latents()
+    assert Stats.objects.get_images_with_disabled_latents()['current'] == 0
+    assert get_images_with_disabled_latents(['example']).result == []
+    for image_id, paths in latent_paths.items():
+        assert not os.path.exists(paths['example'])
+        assert os.path.exists(paths['mask'])
+        image = OSImage.all_objects.get(id=image_id, fields=['id', 'latents'])
+        assert list(image.latents.latents.keys()) == ['mask']
+
+
+@pytest.mark.django_db
+def test_save_conflict_and_update_with_retry(image_logo):
+    first = OSImage.objects.get(image_logo.id)
+    second = OSImage.objects.get(image_logo.id)
+    assert first.meta.seq_no is not None
+
+    first.tags = ['first']
+    first.save(fields=['tags'])
+    # the second instance is stale, its write would overwrite the first one
+    second.tags = ['second']
+    with pytest.raises(SaveConflictError):
+        second.save(fields=['tags'])
+
+    reads = []
+
+    def update(image):
+        reads.append(list(image.tags))
+        if len(reads) == 1:
+            # another process changes the image between the read and the write
+            other = OSImage.objects.get(image_logo.id)
+            other.tags = other.tags + ['concurrent']
+            other.save(fields=['tags'])
+        image.tags = image.tags + ['retried']
+        return ['tags']
+
+    image = OSImage.update_with_retry(image_logo.id, update)
+    assert reads == [['first'], ['first', 'concurrent']]
+    assert image.tags == ['first', 'concurrent', 'retried']
+    assert OSImage.objects.get(image_logo.id).tags == ['first', 'concurrent', 'retried']
@@ -0,0 +1,133 @@
+import pytest
+from asgiref.sync import sync_to_async
+
+from backend.dataroom.choices import IngestionOperation, IngestionStatus
+from backend.dataroom.models.ingestion import IngestionItem, IngestionTicket
+from backend.dataroom.models.os_image import OSImage
+from backend.task_runner.tasks.ingestion import get_ingestion_batches, ingest_batch
+from dataroom_client import DataRoomError, DataRoomFile
+
+
+async def run_ingestion():
+    batches = await sync_to_async(get_ingestion_batches)()
+    for batch in batches:
+        await sync_to_async(ingest_batch)(batch)
+    return batches
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_async_create_images(DataRoom, tests_path):
+    file_logo = DataRoomFile.from_path(tests_path / 'images/logo.png')
+
+    response = await DataRoom.create_images(
+        [{'id': 'logo', 'source': 'test', 'image_file': file_logo, 'tags': ['queued']}],
+        asynchronous=True,
+    )
+    assert response['accepted'] == ['logo']
+    assert response['failed'] == []
+    assert response['status'] == 'pending'
+    assert response['counts']['pending'] == 1
+
+    # the image is stored but not indexed until the queue is processed
+    assert await sync_to_async(OSImage.all_objects.get_multiple)(['logo']) == []
+
+    batches = await run_ingestion()
+    assert len(batches) == 1
+    ticket = await DataRoom.wait_for_ingestion_ticket(response['ticket_id'], poll_interval=0.1)
+    assert ticket['status'] == 'done'
+    assert ticket['counts']['done'] == 1
+    assert ticket['date_completed']
+
+    instance = await sync_to_async(OSImage.objects.get)(id='logo')
+    assert instance.tags == ['queued']
+    assert instance.image == 'images/logo/original.png'
+
+    # nothing left to process
+    assert await run_ingestion() == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_async_update_images(DataRoom, image_logo, image_girl):
+    response = await DataRoom.update_images(
+        [
+            {'id': image_logo.id, 'source': 'updated', 'tags': ['queued']},
+            {'id': image_girl.id, 'source': 'updated'},
+        ],
+        asynchronous=True,
+    )
+    assert response['accepted'] == [image_logo.id, image_girl.id]
+    assert response['item_count'] == 2
+
+    # deleted after the update was accepted
+    await sync_to_async(image_girl.delete_permanently)(refresh=True)
+
+    await run_ingestion()
+    ticket = await DataRoom.wait_for_ingestion_ticket(response['ticket_id'], poll_interval=0.1)
+    assert ticket['status'] == 'done'
+    assert ticket['counts']['done'] == 1
+    assert ticket['counts']['failed'] == 1
+    assert ticket['failed_items'] == [
+        {'image_id': image_girl.id, 'error': f"Image with ID '{image_girl.id}' was not found"},
+    ]
+
+    image = await DataRoom.get_image(image_logo.id)
+    assert image['source'] == 'updated'
+    assert image['tags'] == ['queued']
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_ingestion_ticket_not_found(DataRoom):
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.get_ingestion_ticket('00000000-0000-0000-0000-000000000000')
+    assert excinfo.value.response.status_code == 404
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_async_create_reserves_ids_and_hashes(DataRoom, tests_path):
+    file_logo = DataRoomFile.from_path(tests_path / 'images/logo.png')
+    await DataRoom.create_images([{'id': 'logo', 'source': 'test', 'image_file': file_logo}], asynchronous=True)
+
+    # the queued image is not indexed yet, but its ID and hash are taken
+    for image_id in ['logo', 'other']:
+        with pytest.raises(DataRoomError) as excinfo:
+            await DataRoom.create_images([{'id': image_id, 'source': 'test', 'image_file': file_logo}])
+        assert excinfo.value.response.status_code == 409
+        assert f"Images with IDs '{image_id}' are already queued to be created" in str(excinfo.value)
+    # and by the other create paths, before the file of the queued image is overwritten
+    with pytest.raises(DataRoomError) as excinfo:
+        await DataRoom.create_image(image_id='logo', image_file=file_logo, source='test')
+    assert excinfo.value.response.status_code == 409
+    response = await DataRoom.create_images_stream([{'id': 'logo', 'source': 'test', 'image_file': file_logo}])
+    assert response == {
+        'created': [],
+        'failed': [{'id': 'logo', 'error': "Image with ID 'logo' is already queued to be created"}],
+    }
+
+    # an update queued after the create is indexed after it
+    response = await DataRoom.update_images([{'id': 'logo', 'source': 'updated'}], asynchronous=True)
+    assert response['accepted'] == ['logo']
+    await run_ingestion()
+    ticket = await DataRoom.wait_for_ingestion_ticket(response['ticket_id'], poll_interval=0.1)
+    assert ticket['status'] == 'done'
+    image = await DataRoom.get_image('logo')
+    assert image['source'] == 'updated'
+
+
+@pytest.mark.django_db
+def test_claim_keeps_the_writes_of_an_image_in_order():
+    IngestionTicket.objects.enqueue(IngestionOperation.UPDATE, [('image1', {'data': {'source': 'first'}})])
+    IngestionTicket.objects.enqueue(
+        IngestionOperation.UPDATE,
+        [('image1', {'data': {'source': 'second'}}), ('image2', {'data': {'source': 'second'}})],
+    )
+    first = IngestionItem.objects.get(payload__data__source='first')
+
+    # the second update of image1 waits until the first one is indexed
+    assert IngestionItem.objects.claim(1) == [(first.id, 'image1')]
+    assert [image_id for _, image_id in IngestionItem.objects.claim(10)] == ['image2']
+    IngestionItem.objects.filter(id=first.id).update(status=IngestionStatus.DONE)
+    assert [image_id for _, image_id in IngestionItem.objects.claim(10)] == ['image1']
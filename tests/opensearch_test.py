@@ -2,7 +2,8 @@ import pytest
 from asgiref.sync import sync_to_async
 
 from backend.dataroom.models import AttributesField, AttributesSchema, LatentType
-from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.models.os_image import MERGE_FIELDS_SCRIPT, OSImage
+from backend.dataroom.opensearch import OSBulkIndex, RefreshCoalescer, get_refresh_param, get_refresh_policy
 from dataroom_client import DataRoomFile
 
 
@@ -340,3 +341,69 @@ async def test_os_image_serialized_complex(DataRoom, tests_path, image_logo):
         "attr_some_number_double": 2,
         "attr_numbers_double": [1, 2, 3],
     }
+
+
+@pytest.mark.django_db
+def test_os_bulk_index_batches_and_results(image_logo, image_girl):
+    # a tiny max_bytes sends every document in its own request
+    with OSBulkIndex(bulk_size=100, max_bytes=1) as os_bulk:
+        os_bulk.index(index=OSImage.INDEX, doc_id=image_logo.id, body={'source': 'bulk'})
+        os_bulk.update_script(
+            index=OSImage.INDEX, doc_id=image_girl.id, script=MERGE_FIELDS_SCRIPT, params={'fields': {'source': 'bulk'}}
+        )
+        os_bulk.update_script(
+            index=OSImage.INDEX, doc_id='missing', script=MERGE_FIELDS_SCRIPT, params={'fields': {'source': 'bulk'}}
+        )
+        assert len(os_bulk.results) == 3
+
+    assert os_bulk.results == {
+        image_logo.id: 'updated',
+        image_girl.id: 'updated',
+        'missing': 'not_found',
+    }
+    assert os_bulk.errors == []
+    assert OSImage.objects.get(id=image_logo.id).source == 'bulk'
+    assert OSImage.objects.get(id=image_girl.id).source == 'bulk'
+
+
+@pytest.mark.django_db
+def test_os_bulk_index_delete(image_logo):
+    with OSBulkIndex() as os_bulk:
+        os_bulk.delete(index=OSImage.INDEX, doc_id=image_logo.id)
+        os_bulk.delete(index=OSImage.INDEX, doc_id='missing')
+
+    assert os_bulk.results == {image_logo.id: 'deleted', 'missing': 'not_found'}
+    assert os_bulk.errors == []
+    assert OSImage.objects.get_multiple([image_logo.id]) == []
+
+
+@pytest.mark.django_db
+def test_os_bulk_index_parallel(image_logo, image_girl, image_perfume):
+    image_ids = [image_logo.id, image_girl.id, image_perfume.id]
+    with OSBulkIndex(bulk_size=1, max_in_flight=2) as os_bulk:
+        for image_id in image_ids:
+            os_bulk.index(index=OSImage.INDEX, doc_id=image_id, body={'source': 'parallel'})
+
+    assert os_bulk.results == {image_id: 'updated' for image_id in image_ids}
+    assert all(image.source == 'parallel' for image in OSImage.objects.all())
+
+
+def test_refresh_policies():
+    assert get_refresh_policy(True) == 'true'
+    assert get_refresh_policy(False) == 'false'
+    assert get_refresh_policy('WAIT_FOR') == 'wait_for'
+    assert get_refresh_param('coalesce') == 'false'
+    with pytest.raises(ValueError):
+        get_refresh_policy('sometimes')
+
+
+@pytest.mark.django_db
+def test_refresh_coalescer(image_logo):
+    coalescer = RefreshCoalescer(interval=60)
+    coalescer.request(OSImage.INDEX)
+    coalescer.request(OSImage.INDEX)
+    # a single refresh is scheduled for both writes
+    assert list(coalescer._scheduled.keys()) == [OSImage.INDEX]
+
+    coalescer.flush()
+    assert coalescer._scheduled == {}
@@ -0,0 +1,77 @@
+from opensearchpy import TransportError
+
+from backend.task_runner.queue_control import QueueController
+from backend.task_runner.task_config import QueuedTaskConfig
+
+
+def get_controller(**kwargs):
+    task = QueuedTaskConfig(
+        task_function=lambda items: None,
+        queue_feed_function=lambda size: [],
+        desired_queue_size=1000,
+        workers=2,
+        batch_size=10,
+        target_queue_seconds=10,
+        adaptive_feed_size=True,
+        **kwargs,
+    )
+    return QueueController(task, max_latency_seconds=2.0, max_backoff_seconds=8)
+
+
+def test_queue_size():
+    controller = get_controller()
+    # one batch per worker until the throughput is known
+    assert controller.get_queue_size() == 20
+
+    # slow task: 10 seconds of work
+    controller.throughput = 3.0
+    assert controller.get_queue_size() == 30
+    # fast task: up to desired_queue_size
+    controller.throughput = 500.0
+    assert controller.get_queue_size() == 1000
+    # at least min_queue_size
+    controller.throughput = 0.1
+    assert controller.get_queue_size() == 10
+
+    # fixed size without target_queue_seconds
+    controller.task.target_queue_seconds = None
+    assert controller.get_queue_size() == 1000
+
+
+def test_throughput_and_latency():
+    controller = get_controller()
+    controller._last_time = 100.0
+    controller.submitted(['a', 'b', 'c'], now=100.0)
+    controller.completed(['a', 'b'], now=102.0)
+    assert controller.throughput == 0.2 * 1.0
+    assert controller.latency == 0.2 * 2.0
+    assert list(controller.submitted_at) == ['c']
+
+    controller.feed_interval = 1
+    assert controller.get_feed_size(queue_size=0) == 10  # min_feed_size
+
+
+def test_backoff():
+    controller = get_controller()
+    assert not controller.backing_off
+
+    # rejected requests and slow searches double the feed interval, up to max_backoff_seconds
+    controller.fed(0.1, error=TransportError(429, 'es_rejected_execution_exception', {}))
+    assert controller.feed_interval == 2
+    controller.fed(5.0)
+    assert controller.feed_interval == 4
+    controller.failed(TransportError(503, 'unavailable', {}))
+    controller.fed(5.0)
+    assert controller.feed_interval == 8
+    assert controller.backing_off
+
+    # other errors don't change it
+    controller.fed(0.1, error=ValueError())
+    controller.failed(ValueError())
+    assert controller.feed_interval == 8
+
+    # fast searches bring it back
+    for _ in range(5):
+        controller.fed(0.1)
+    assert controller.feed_interval == 1
+    assert not controller.backing_off
@@ -0,0 +1,112 @@
+import pytest
+
+from backend.dataroom.models.os_image import OSImage
+from backend.dataroom.models.scan_cursor import ScanCursor
+from backend.dataroom.opensearch import OS
+from backend.task_runner.task_config import QueuedTaskConfig
+from backend.task_runner.tasks.r2_migration import r2_migration_fetch_files, r2_migration_get_all_files
+from backend.task_runner.tasks.utils import scan_page
+
+
+def get_page(size=2, **kwargs):
+    search = OSImage.all_objects.search(fields=['id'])
+    hits, next_kwargs = scan_page('test', search, OSImage.INDEX, size, **kwargs)
+    return [hit['_id'] for hit in hits], next_kwargs
+
+
+def feed(page, next_kwargs):
+    # the task runner queues the items of the page, they are done once their future is
+    next_kwargs['scan'].fed(page)
+
+
+@pytest.mark.django_db
+def test_scan_page_resumes_after_restart(settings, all_images):
+    settings.TASK_RUNNER_SCAN_CHECKPOINT_SECONDS = 0
+    image_ids = sorted(image.id for image in all_images)
+
+    first_page, next_kwargs = get_page()
+    assert first_page == image_ids[:2]
+    feed(first_page, next_kwargs)
+    page, next_kwargs = get_page(**next_kwargs)
+    assert page == image_ids[2:4]
+    feed(page, next_kwargs)
+    cursor = ScanCursor.objects.get(name='test')
+    # nothing is saved while the items of the first page are in the queue
+    assert cursor.search_after is None
+    assert cursor.items_scanned == 0
+
+    next_kwargs['scan'].completed(first_page)
+    cursor.refresh_from_db()
+    # the second page is still in the queue
+    assert cursor.search_after == [image_ids[1]]
+    assert cursor.items_scanned == 2
+    assert cursor.pit_id
+    assert not cursor.is_completed
+
+    # a restart continues from the saved position, even once the point in time expired
+    OS.client.delete_point_in_time(body={'pit_id': [cursor.pit_id]})
+    page, next_kwargs = get_page()
+    assert page == image_ids[2:4]
+    feed(page, next_kwargs)
+    last_page, next_kwargs = get_page(**next_kwargs)
+    assert last_page == image_ids[4:]
+    feed(last_page, next_kwargs)
+    # the pass is over but the scan is completed once the items of its last page are done
+    assert get_page(**next_kwargs)[0] == []
+    next_kwargs['scan'].completed(last_page)
+    cursor.refresh_from_db()
+    assert not cursor.is_completed
+    assert cursor.search_after == [image_ids[1]]
+    next_kwargs['scan'].completed(page)
+    cursor.refresh_from_db()
+    assert cursor.is_completed
+    assert cursor.pass_count == 1
+    assert cursor.items_scanned == 5
+    assert not cursor.pit_id
+
+    # a completed scan returns nothing until it is started over
+    assert get_page(**next_kwargs)[0] == []
+    assert get_page()[0] == []
+    cursor.reset()
+    assert get_page(**next_kwargs)[0] == image_ids[:2]
+    assert get_page()[0] == image_ids[:2]
+
+
+@pytest.mark.django_db
+def test_scan_page_partitions(settings, all_images):
+    settings.TASK_RUNNER_SCAN_CHECKPOINT_SECONDS = 0
+
+    partitions = []
+    for partition in range(2):
+        image_ids = []
+        next_kwargs = {'partition': partition, 'partitions': 2}
+        while not ScanCursor.objects.filter(name='test', partition=partition, date_completed__isnull=False).exists():
+            page, next_kwargs = get_page(size=1, **next_kwargs)
+            feed(page, next_kwargs)
+            next_kwargs['scan'].completed(page)
+            image_ids += page
+        partitions.append(image_ids)
+    assert not set(partitions[0]) & set(partitions[1])
+    assert sorted(partitions[0] + partitions[1]) == sorted(image.id for image in all_images)
+
+    # another number of partitions starts the scan over
+    assert get_page(size=5)[0] == sorted(image.id for image in all_images)
+    assert list(ScanCursor.objects.values_list('partition', 'partitions')) == [(0, 1)]
+
+
+@pytest.mark.django_db
+def test_r2_migration_partitions(settings, all_images):
+    settings.TASK_RUNNER_SCAN_CHECKPOINT_SECONDS = 0
+    task = QueuedTaskConfig(task_function=r2_migration_fetch_files, queue_feed_function=r2_migration_get_all_files)
+    tasks = task.partitioned(3)
+    assert [task.name for task in tasks] == [f'r2_migration_fetch_files_{partition}' for partition in range(3)]
+
+    file_urls = []
+    for task in tasks:
+        task_result = task.queue_feed_function(**task.queue_feed_kwargs)
+        task_result.progress.fed(task_result.result)
+        task_result.progress.completed(task_result.result)
+        file_urls += task_result.result
+    # the original and the thumbnail of every image
+    assert len(file_urls) == len(set(file_urls)) == 10
+    assert ScanCursor.objects.filter(name='r2_migration', date_completed__isnull=False).count() == 3
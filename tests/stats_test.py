@@ -226,3 +226,53 @@ def test_stats_api(user, tests_path, image_logo, image_logo_alt, image_logo_smal
         'change_per_second': -0.5,  # after 2 seconds 1 was removed
         'time_left': datetime.timedelta(seconds=2),
     }
+
+
+@pytest.mark.django_db
+def test_task_runner_stats_api(user):
+    from backend.task_runner.metrics import MetricsRegistry
+
+    client = Client()
+    client.login(username=user.email, password='123')
+
+    metrics = MetricsRegistry()
+    thumbnails = metrics.get('image_update_thumbnail_batch')
+    thumbnails.task_done(0.5, items=20)
+    thumbnails.fed(0.012)
+    thumbnails.queue(40, items_per_second=10.0)
+
+    date_updated = datetime.datetime(2024, 11, 21, 12, 0, 0, tzinfo=datetime.timezone.utc)
+    with freeze_time(date_updated):
+        Stats.objects.update_task_runner_stats(metrics.snapshots())
+
+    # 40 more items in 2 seconds, one failed and retried
+    thumbnails.task_done(1.5, items=20)
+    thumbnails.task_done(2.5, items=20)
+    thumbnails.task_retried()
+    thumbnails.task_failed(items=1)
+    new_date_updated = datetime.datetime(2024, 11, 21, 12, 0, 2, tzinfo=datetime.timezone.utc)
+    with freeze_time(new_date_updated):
+        Stats.objects.update_task_runner_stats(metrics.snapshots())
+
+    response = client.get(reverse('api:stats-task_runner'))
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            'name': 'image_update_thumbnail_batch',
+            'items_processed': 60,
+            'items_per_second': 20.0,
+            'failures': 1,
+            'retries': 1,
+            'duration_p50': 1500,
+            'duration_p95': 2500,
+            'duration_p99': 2500,
+            'feed_time': 12,
+            'queue_depth': 40,
+            'date_updated': new_date_updated.isoformat().replace('+00:00', 'Z'),
+        },
+    ]
+
+    # the counters of the next run continue from the saved ones
+    next_run = MetricsRegistry()
+    next_run.load(Stats.objects.get_task_runner_stats())
+    assert next_run.get('image_update_thumbnail_batch').items_processed == 60
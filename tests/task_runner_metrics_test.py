@@ -0,0 +1,72 @@
+import socket
+import urllib.request
+
+from backend.task_runner.metrics import MetricsRegistry, StatsdClient, start_metrics_server, timed
+
+
+def get_registry():
+    registry = MetricsRegistry()
+    metrics = registry.get('image_mark_duplicates_batch')
+    for duration in range(1, 101):
+        metrics.task_done(duration / 100, items=50)
+    metrics.task_retried()
+    metrics.task_failed(items=50)
+    metrics.fed(0.25)
+    metrics.queue(150, items_per_second=42.5)
+    return registry
+
+
+def test_timed():
+    def add(a, b):
+        return a + b
+
+    timed_add = timed(add)
+    assert timed_add.__name__ == 'add'
+    assert 0 <= timed_add(1, 2) < 1
+
+
+def test_snapshot():
+    snapshot = get_registry().get('image_mark_duplicates_batch').snapshot()
+    assert snapshot == {
+        'items_processed': 5000,
+        'items_per_second': 42.5,
+        'failures': 50,
+        'retries': 1,
+        'feed_seconds': 0.25,
+        'queue_depth': 150,
+        'duration_p50': 0.5,
+        'duration_p95': 0.95,
+        'duration_p99': 0.99,
+    }
+
+
+def test_prometheus_endpoint():
+    server = start_metrics_server(get_registry(), port=0, host='127.0.0.1')
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{server.server_port}/metrics') as response:
+            text = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert '# TYPE dataroom_task_items_total counter' in text
+    assert 'dataroom_task_items_total{task="image_mark_duplicates_batch"} 5000' in text
+    assert 'dataroom_task_duration_seconds{task="image_mark_duplicates_batch",quantile="0.95"} 0.95' in text
+    assert 'dataroom_task_queue_depth{task="image_mark_duplicates_batch"} 150' in text
+
+
+def test_statsd():
+    # local stand-in of the statsd server
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    receiver.settimeout(5)
+    try:
+        client = StatsdClient('127.0.0.1', receiver.getsockname()[1], prefix='dataroom.test')
+        client.send(get_registry())
+        lines = receiver.recv(65536).decode().split('\n')
+    finally:
+        receiver.close()
+
+    assert 'dataroom.test.image_mark_duplicates_batch.items_processed:5000|g' in lines
+    assert 'dataroom.test.image_mark_duplicates_batch.duration_p99:0.99|g' in lines
+    assert len(lines) == 9